@@ -13,11 +13,41 @@ class Settings:
     # Channel Configuration
     FREE_CHANNEL_ID: int = int(os.getenv("FREE_CHANNEL_ID", "0"))
     VIP_CHANNEL_ID: int = int(os.getenv("VIP_CHANNEL_ID", "0"))
+    MEDIA_STORAGE_CHAT_ID: int = int(os.getenv("MEDIA_STORAGE_CHAT_ID", "0"))  # chat para pre-subir contenido
+    MEDIA_UPLOAD_DELAY: float = float(os.getenv("MEDIA_UPLOAD_DELAY", "3"))  # segundos entre subidas en lote
     
     # Economy Configuration
     INITIAL_BESITOS: int = int(os.getenv("INITIAL_BESITOS", "100"))
     DAILY_GIFT_BASE: int = int(os.getenv("DAILY_GIFT_BASE", "50"))
     PURCHASE_CASHBACK_RATE: float = float(os.getenv("PURCHASE_CASHBACK_RATE", "0.1"))
+    ACTIVITY_REWARD_WINDOW: int = int(os.getenv("ACTIVITY_REWARD_WINDOW", "60"))  # segundos
+    FLASH_SALE_BATCH_SIZE: int = int(os.getenv("FLASH_SALE_BATCH_SIZE", "50"))
+    AUCTION_BID_BATCH_SIZE: int = int(os.getenv("AUCTION_BID_BATCH_SIZE", "50"))
+    AUCTION_WATCH_INTERVAL: float = float(os.getenv("AUCTION_WATCH_INTERVAL", "3"))  # segundos entre ediciones de un mensaje
+    AUCTION_WATCH_TTL: int = int(os.getenv("AUCTION_WATCH_TTL", "300"))  # segundos sin actividad antes de dejar de editar
+    AUCTION_EDITS_PER_SECOND: float = float(os.getenv("AUCTION_EDITS_PER_SECOND", "20"))
+    STORE_PAGE_SIZE: int = int(os.getenv("STORE_PAGE_SIZE", "8"))
+    RECOMMENDATIONS_REFRESH_INTERVAL: int = int(os.getenv("RECOMMENDATIONS_REFRESH_INTERVAL", "3600"))  # segundos
+    
+    # Ledger Compaction Configuration
+    LEDGER_COMPACTION_AGE_DAYS: int = int(os.getenv("LEDGER_COMPACTION_AGE_DAYS", "90"))
+    LEDGER_COMPACTION_BATCH_SIZE: int = int(os.getenv("LEDGER_COMPACTION_BATCH_SIZE", "1000"))
+    LEDGER_COMPACTION_INTERVAL: int = int(os.getenv("LEDGER_COMPACTION_INTERVAL", "3600"))  # segundos
+    
+    # User Cache Configuration
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "300"))  # segundos
+    USER_ACTIVITY_FLUSH_INTERVAL: int = int(os.getenv("USER_ACTIVITY_FLUSH_INTERVAL", "30"))  # segundos
+    
+    # Analytics Configuration
+    ANALYTICS_QUEUE_SIZE: int = int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000"))
+    ANALYTICS_BATCH_SIZE: int = int(os.getenv("ANALYTICS_BATCH_SIZE", "500"))
+    ANALYTICS_FLUSH_INTERVAL: float = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "2"))  # segundos
+    ANALYTICS_OVERFLOW_POLICY: str = os.getenv("ANALYTICS_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest, block, sample
+    ANALYTICS_SAMPLE_RATE: float = float(os.getenv("ANALYTICS_SAMPLE_RATE", "0.1"))
+    
+    # Leaderboard Configuration
+    LEADERBOARD_FLUSH_INTERVAL: int = int(os.getenv("LEADERBOARD_FLUSH_INTERVAL", "30"))  # segundos
     
     # Narrative Configuration
     MAX_NARRATIVE_LEVEL: int = int(os.getenv("MAX_NARRATIVE_LEVEL", "6"))
@@ -0,0 +1,67 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from config.database import get_db
+
+@asynccontextmanager
+async def session_scope(db: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """Usar la sesión de la actualización o abrir una propia.
+
+    Con una sesión prestada (la de DatabaseMiddleware) solo se hace flush:
+    el commit lo hace quien la abrió. Con una sesión propia se hace commit
+    al salir, o rollback si hubo un error.
+    """
+    if db is not None:
+        yield db
+        await db.flush()
+        return
+
+    sessions = get_db()
+    session = await sessions.__anext__()
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        await sessions.aclose()
+
+def upsert(db: AsyncSession, model):
+    """INSERT del dialecto de la sesión (admite on_conflict_do_update)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def after_commit(db: AsyncSession, callback: Callable, *args):
+    """Ejecutar callback cuando la transacción de la sesión se confirme"""
+    db.info.setdefault("after_commit", []).append((callback, args))
+
+@asynccontextmanager
+async def savepoint(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """Aislar una operación dentro de una transacción más larga (SAVEPOINT).
+
+    Si falla, se deshacen solo sus cambios y se descartan los callbacks
+    after_commit que registró; el resto de la transacción sigue intacto.
+    """
+    pending = len(db.info.get("after_commit", []))
+    try:
+        async with db.begin_nested():
+            yield db
+    except BaseException:
+        del db.info.get("after_commit", [])[pending:]
+        raise
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session):
+    for callback, args in session.info.pop("after_commit", []):
+        callback(*args)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_commit(session: Session, previous_transaction):
+    if session.in_transaction():
+        return
+    session.info.pop("after_commit", None)
@@ -0,0 +1,97 @@
+import logging
+from typing import Awaitable, Callable, List, NamedTuple, Union
+from sqlalchemy import text, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import session_scope
+
+logger = logging.getLogger(__name__)
+
+Statement = Union[str, Callable[[AsyncSession], Awaitable[None]]]
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: List[Statement]
+
+def add_column(table: str, column: str, definition: str) -> Statement:
+    """Paso de migración que agrega una columna si la tabla aún no la tiene.
+
+    create_all ya crea las columnas nuevas en bases recién creadas y SQLite
+    no soporta ADD COLUMN IF NOT EXISTS, así que se revisa el esquema antes.
+    """
+    async def step(db: AsyncSession):
+        columns = await db.run_sync(
+            lambda session: {c["name"] for c in inspect(session.connection()).get_columns(table)}
+        )
+        if column not in columns:
+            await db.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return step
+
+# Cambios de esquema en orden; nunca editar una migración ya publicada,
+# siempre agregar una nueva con la versión siguiente.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Índices compuestos de consultas frecuentes", [
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_type_created "
+        "ON transactions (user_id, type, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_auction_bids_auction_amount "
+        "ON auction_bids (auction_id, amount)",
+        "CREATE INDEX IF NOT EXISTS ix_auction_bids_auction_user_created "
+        "ON auction_bids (auction_id, user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_purchases_user "
+        "ON purchases (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_store_items_active_category_created "
+        "ON store_items (is_active, category, created_at)",
+    ]),
+    Migration(2, "Índice para paginar el historial por (created_at, id)", [
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_created_id "
+        "ON transactions (user_id, created_at, id)",
+    ]),
+    Migration(3, "Índice para paginar el inventario por (created_at, id)", [
+        "CREATE INDEX IF NOT EXISTS ix_purchases_user_created_id "
+        "ON purchases (user_id, created_at, id)",
+    ]),
+    Migration(4, "file_id de Telegram por item de la tienda", [
+        add_column("store_items", "telegram_file_id", "VARCHAR(255)"),
+    ]),
+]
+
+async def get_applied_versions(db: AsyncSession = None) -> set:
+    """Obtener versiones de migración ya aplicadas"""
+    async with session_scope(db) as db:
+        await db.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(255) NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        result = await db.execute(text("SELECT version FROM schema_migrations"))
+        return set(result.scalars())
+
+async def run_migrations() -> int:
+    """Aplicar las migraciones pendientes, cada una en su propia transacción.
+
+    No acepta una sesión prestada: si una migración falla, las anteriores
+    ya quedaron confirmadas y la siguiente ejecución retoma desde ahí.
+    """
+    applied = await get_applied_versions()
+    count = 0
+
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+
+        async with session_scope() as session:
+            for statement in migration.statements:
+                if callable(statement):
+                    await statement(session)
+                else:
+                    await session.execute(text(statement))
+            await session.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": migration.version, "name": migration.name}
+            )
+
+        count += 1
+        logger.info(f"🗄️ Migración {migration.version} aplicada: {migration.name}")
+
+    return count
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, Float, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
 from datetime import datetime
+from enum import Enum
+
+class UserRole(str, Enum):
+    FREE = "free"
+    VIP = "vip"
+    ADMIN = "admin"
 
 class User(Base):
     __tablename__ = "users"
@@ -72,6 +78,18 @@ class Transaction(Base):
     reference_id = Column(String(100), nullable=True)
     created_at = Column(DateTime, default=func.now())
 
+class TransactionArchive(Base):
+    __tablename__ = "transactions_archive"
+    
+    id = Column(Integer, primary_key=True)  # mismo id que tenía en transactions
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    type = Column(String(50), nullable=False)
+    amount = Column(Integer, nullable=False)
+    description = Column(String(500))
+    reference_id = Column(String(100), nullable=True)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=func.now())
+
 class StoreItem(Base):
     __tablename__ = "store_items"
     
@@ -82,7 +100,86 @@ class StoreItem(Base):
     category = Column(String(100))
     content_url = Column(String(500), nullable=True)
     content_type = Column(String(50))  # video, image, text, subscription
+    telegram_file_id = Column(String(255), nullable=True)  # file_id tras la primera subida
     is_active = Column(Boolean, default=True)
     stock = Column(Integer, default=-1)  # -1 = unlimited
     created_at = Column(DateTime, default=func.now())
+
+class Purchase(Base):
+    __tablename__ = "purchases"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    item_id = Column(Integer, ForeignKey("store_items.id"), nullable=False)
+    price_paid = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+class Auction(Base):
+    __tablename__ = "auctions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String(255), nullable=False)
+    description = Column(Text)
+    starting_price = Column(Integer, nullable=False)
+    current_price = Column(Integer, nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    is_active = Column(Boolean, default=True)
+    winner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+class AuctionBid(Base):
+    __tablename__ = "auction_bids"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+class StoryScene(Base):
+    __tablename__ = "story_scenes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    level = Column(Integer, nullable=False)
+    scene_key = Column(String(100), nullable=False)
+    title = Column(String(255), nullable=False)
+    content = Column(Text)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=func.now())
+
+class AnalyticsEvent(Base):
+    __tablename__ = "analytics_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    event_type = Column(String(50), nullable=False)  # message, callback
+    data = Column(String(500), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+class LeaderboardScore(Base):
+    __tablename__ = "leaderboard_scores"
+    __table_args__ = (
+        UniqueConstraint("metric", "period", "period_start", "user_id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String(20), nullable=False)  # xp, besitos
+    period = Column(String(20), nullable=False)  # weekly, monthly
+    period_start = Column(Date, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(Integer, default=0)
+
+class UserEconomyDaily(Base):
+    __tablename__ = "user_economy_daily"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    earned = Column(Integer, default=0)
+    spent = Column(Integer, default=0)
+    transactions = Column(Integer, default=0)
     
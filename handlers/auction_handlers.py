@@ -0,0 +1,171 @@
+from datetime import datetime
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.auction_service import AuctionService
+from services.auction_watchers import auction_watchers
+from utils.keyboards import create_auction_keyboard, create_auction_list_keyboard, create_auction_history_keyboard
+
+class AuctionHandlers:
+    def __init__(self):
+        self.router = Router()
+        self.auction_service = AuctionService()
+
+    def register(self, dp):
+        """Registrar handlers"""
+        dp.include_router(self.router)
+        auction_watchers.configure(self.auction_service.get_auction, self._render_auction)
+        dp.startup.register(auction_watchers.start)
+        dp.shutdown.register(auction_watchers.stop)
+
+        self.router.callback_query.register(
+            self.handle_auction_main,
+            F.data == "auction_main"
+        )
+        self.router.callback_query.register(
+            self.handle_auction_details,
+            F.data.regexp(r"^auction_\d+$")
+        )
+        self.router.callback_query.register(
+            self.handle_auction_history,
+            F.data.regexp(r"^auction_history_\d+$")
+        )
+        self.router.callback_query.register(
+            self.handle_bid,
+            F.data.regexp(r"^bid_\d+_\d+$")
+        )
+
+    async def handle_auction_main(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Mostrar subastas activas y próximas"""
+        await callback.answer()
+
+        active = await self.auction_service.get_active_auctions(db=db)
+        upcoming = await self.auction_service.get_upcoming_auctions(db=db)
+
+        auctions_text = f"""🏆 *Subastas de Diana*
+
+*Lucien anuncia con solemnidad...*
+
+"Algunas piezas no tienen precio fijo. Solo las consigue quien más las desea."
+
+💰 **Tus besitos:** {user.besitos}
+
+🔥 **En curso:**"""
+
+        for auction in active:
+            auctions_text += f"\n• {auction.title} - {auction.current_price} 💰 (cierra {auction.ends_at:%d/%m %H:%M})"
+        if not active:
+            auctions_text += "\nNo hay subastas en curso."
+
+        if upcoming:
+            auctions_text += "\n\n⏳ **Próximamente:**"
+            for auction in upcoming:
+                auctions_text += f"\n• {auction.title} (empieza {auction.starts_at:%d/%m %H:%M})"
+
+        keyboard = create_auction_list_keyboard(active)
+
+        await callback.message.edit_text(
+            auctions_text,
+            reply_markup=keyboard,
+            parse_mode="Markdown"
+        )
+
+    async def handle_auction_details(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Mostrar una subasta; el mensaje se actualiza solo mientras esté abierto"""
+        auction_id = int(callback.data.replace("auction_", ""))
+        auction = await self.auction_service.get_auction(auction_id, db=db)
+
+        if not auction:
+            await callback.answer("Subasta no encontrada", show_alert=True)
+            return
+
+        await callback.answer()
+        await self._show_auction(callback, auction, user)
+
+    async def handle_auction_history(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Mostrar las pujas más altas de una subasta"""
+        auction_id = int(callback.data.replace("auction_history_", ""))
+        auction = await self.auction_service.get_auction(auction_id, db=db)
+
+        if not auction:
+            await callback.answer("Subasta no encontrada", show_alert=True)
+            return
+
+        await callback.answer()
+        bids = await self.auction_service.get_auction_bids(auction_id, limit=10, db=db)
+
+        history_text = f"""📊 *Historial de pujas*
+🏆 {auction.title}
+"""
+        for bid in bids:
+            mine = " (tú)" if bid.user_id == user.id else ""
+            history_text += f"\n{bid.created_at:%d/%m %H:%M} — {bid.amount} 💰{mine}"
+        if not bids:
+            history_text += "\nTodavía no hay pujas."
+
+        await callback.message.edit_text(
+            history_text,
+            reply_markup=create_auction_history_keyboard(auction_id),
+            parse_mode="Markdown"
+        )
+
+    async def handle_bid(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Pujar desde el mensaje de la subasta"""
+        _, auction_id, amount = callback.data.split("_")
+        auction_id, amount = int(auction_id), int(amount)
+
+        result = await self.auction_service.place_bid(auction_id, user.id, amount, db=db)
+        await callback.answer(result["message"], show_alert=not result["success"])
+
+        auction = await self.auction_service.get_auction(auction_id, db=db)
+        if auction:
+            await self._show_auction(callback, auction, user)
+
+    async def _show_auction(self, callback: CallbackQuery, auction, user):
+        text, keyboard = self._render_auction(auction, user.id)
+        if auction.is_active:
+            auction_watchers.watch(
+                auction.id, callback.message.chat.id, callback.message.message_id, user.id, text
+            )
+
+        try:
+            await callback.message.edit_text(
+                text,
+                reply_markup=keyboard,
+                parse_mode="Markdown"
+            )
+        except TelegramBadRequest as e:
+            # Una puja rechazada no cambia el mensaje
+            if "not modified" not in str(e):
+                raise
+
+    def _render_auction(self, auction, user_id: int) -> tuple:
+        """Texto y teclado de una subasta para un usuario"""
+        auction_text = f"""🏆 *{auction.title}*
+
+{auction.description or ''}
+
+💰 **Precio actual:** {auction.current_price} besitos"""
+
+        if not auction.is_active:
+            auction_text += "\n\n🏁 **Subasta finalizada**"
+            if auction.winner_id == user_id:
+                auction_text += "\n🎉 ¡La ganaste!"
+            return auction_text, create_auction_keyboard(auction)
+
+        now = datetime.now()
+        if now < auction.starts_at:
+            auction_text += f"\n⏳ **Empieza:** {auction.starts_at:%d/%m %H:%M}"
+        else:
+            auction_text += f"\n⏰ **Cierra:** {auction.ends_at:%d/%m %H:%M}"
+
+        leader_id = self.auction_service.get_leader_id(auction.id)
+        if leader_id == user_id:
+            auction_text += "\n\n🥇 **Vas ganando**"
+        elif leader_id:
+            auction_text += "\n\n⚔️ Alguien más va ganando"
+        else:
+            auction_text += "\n\nTodavía no hay pujas"
+
+        return auction_text, create_auction_keyboard(auction)
@@ -1,5 +1,6 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.channel_service import ChannelService
 from services.user_service import UserService
 from services.economy_service import EconomyService
@@ -34,7 +35,7 @@ class ChannelHandlers:
             F.data == "channel_create_post"
         )
 
-    async def handle_channel_reaction(self, callback: CallbackQuery, user: dict):
+    async def handle_channel_reaction(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Manejar reacciones en posts de canal"""
         await callback.answer()
         
@@ -57,7 +58,7 @@ class ChannelHandlers:
         
         if points_earned > 0:
             await self.user_service.add_besitos(
-                user.id, points_earned, f"Reacción en canal: {reaction_type}"
+                user.id, points_earned, f"Reacción en canal: {reaction_type}", db=db
             )
             
             await callback.answer(f"¡+{points_earned} besitos por tu reacción!", show_alert=True)
@@ -0,0 +1,69 @@
+from aiogram import Router
+from aiogram.types import Message
+from aiogram.filters import Command
+from services.store_service import StoreService
+from services.economy_service import EconomyService
+from services.media_service import media_service
+from utils.decorators import admin_required, super_admin_required
+
+class MaintenanceHandlers:
+    """Comandos de operación para administradores (no dependen del panel)"""
+
+    def __init__(self):
+        self.router = Router()
+        self.store_service = StoreService()
+        self.economy_service = EconomyService()
+
+    def register(self, dp):
+        """Registrar handlers"""
+        dp.include_router(self.router)
+
+        self.router.message.register(
+            self.handle_flash_sale,
+            Command("flash_sale")
+        )
+        self.router.message.register(
+            self.handle_preupload_media,
+            Command("preupload_media")
+        )
+        self.router.message.register(
+            self.handle_rebuild_rollups,
+            Command("rebuild_rollups")
+        )
+
+    @admin_required
+    async def handle_flash_sale(self, message: Message, user: dict, admin: dict):
+        """Activar o terminar venta flash: /flash_sale <item_id> [stop]"""
+        args = message.text.split()[1:]
+        if not args or not args[0].isdigit():
+            await message.answer("Uso: /flash_sale <item_id> [stop]")
+            return
+        
+        item_id = int(args[0])
+        if len(args) > 1 and args[1] == "stop":
+            result = await self.store_service.stop_flash_sale(item_id)
+        else:
+            result = await self.store_service.start_flash_sale(item_id)
+        await message.answer(result["message"])
+
+    @admin_required
+    async def handle_preupload_media(self, message: Message, user: dict, admin: dict):
+        """Pre-subir el contenido de la tienda para enviarlo por file_id: /preupload_media [force]"""
+        if not media_service.storage_chat_id:
+            await message.answer("❌ Configura MEDIA_STORAGE_CHAT_ID para pre-subir contenido")
+            return
+        
+        force = message.text.split()[1:2] == ["force"]
+        await message.answer("⏳ Subiendo contenido de la tienda...")
+        result = await media_service.preupload(message.bot, force=force)
+        await message.answer(
+            f"✅ Pre-subida terminada: {result['uploaded']} de {result['pending']} subidos, "
+            f"{result['failed']} fallidos"
+        )
+
+    @super_admin_required
+    async def handle_rebuild_rollups(self, message: Message, user: dict, admin: dict):
+        """Recalcular el resumen económico diario desde el libro mayor"""
+        await message.answer("⏳ Recalculando resumen económico diario...")
+        rows = await self.economy_service.rebuild_daily_rollups()
+        await message.answer(f"✅ Resumen diario recalculado: {rows} filas")
@@ -1,6 +1,7 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.narrative_service import NarrativeService
 from services.user_service import UserService
 from utils.keyboards import create_narrative_keyboard, create_trivia_keyboard
@@ -29,7 +30,7 @@ class NarrativeHandlers:
             F.data.startswith("scene_")
         )
 
-    async def handle_narrative_scene(self, callback: CallbackQuery, user: dict):
+    async def handle_narrative_scene(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Manejar progresión de escenas narrativas"""
         await callback.answer()
         
@@ -54,7 +55,7 @@ class NarrativeHandlers:
             return
         
         # Obtener contenido de la escena
-        scene_content = await self.narrative_service.get_scene_content(level, scene, user.id)
+        scene_content = await self.narrative_service.get_scene_content(level, scene, user.id, db=db)
         
         if not scene_content:
             await callback.message.edit_text(
@@ -69,10 +70,10 @@ class NarrativeHandlers:
             if "besitos" in rewards:
                 await self.user_service.add_besitos(
                     user.id, rewards["besitos"], 
-                    f"Escena narrativa {level}-{scene}"
+                    f"Escena narrativa {level}-{scene}", db=db
                 )
             if "xp" in rewards:
-                await self.user_service.add_experience(user.id, rewards["xp"])
+                await self.user_service.add_experience(user.id, rewards["xp"], db=db)
         
         # Preparar texto con personalización
         content_text = scene_content["content"]
@@ -101,9 +102,9 @@ class NarrativeHandlers:
             "level": level,
             "scene": scene,
             "state_data": {"completed_at": str(callback.message.date)}
-        })
+        }, db=db)
 
-    async def handle_trivia_answer(self, callback: CallbackQuery, user: dict):
+    async def handle_trivia_answer(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Manejar respuestas de trivia narrativa"""
         await callback.answer()
         
@@ -129,9 +130,9 @@ class NarrativeHandlers:
             
             # Otorgar recompensas
             await self.user_service.add_besitos(
-                user.id, result['rewards']['besitos'], "Trivia narrativa correcta"
+                user.id, result['rewards']['besitos'], "Trivia narrativa correcta", db=db
             )
-            await self.user_service.add_experience(user.id, result['rewards']['xp'])
+            await self.user_service.add_experience(user.id, result['rewards']['xp'], db=db)
         else:
             response_text = f"""❌ *Respuesta Incorrecta*
 
@@ -150,7 +151,7 @@ class NarrativeHandlers:
             parse_mode="Markdown"
         )
 
-    async def handle_scene_progression(self, callback: CallbackQuery, user: dict):
+    async def handle_scene_progression(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Manejar progresión entre escenas"""
         await callback.answer()
         
@@ -158,15 +159,15 @@ class NarrativeHandlers:
         
         if action == "scene_next":
             # Avanzar a siguiente escena disponible
-            current_state = await self.narrative_service.get_user_narrative_state(user.id)
+            current_state = await self.narrative_service.get_user_narrative_state(user.id, db=db)
             next_level = current_state["level"]
             next_scene = 1  # Determinar siguiente escena lógicamente
             
-            await self.handle_narrative_scene(callback, user)
+            await self.handle_narrative_scene(callback, user, db=db)
         
         elif action == "scene_menu":
             # Mostrar menú de escenas disponibles
-            available_scenes = await self.narrative_service.get_available_scenes(user.id)
+            available_scenes = await self.narrative_service.get_available_scenes(user.id, db=db)
             
             menu_text = "📚 *Escenas Disponibles*\n\n"
             buttons = []
@@ -48,9 +48,9 @@ No todos llegan con esa misma hambre en los ojos."
 ¿Estás preparado para descubrir más?"""
 
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton("🚪 Descubrir más", callback_data="discover_more")],
-                [InlineKeyboardButton("👤 Mi Perfil", callback_data="user_profile")],
-                [InlineKeyboardButton("🎮 Explorar DianaBot", callback_data="explore")]
+                [InlineKeyboardButton(text="🚪 Descubrir más", callback_data="discover_more")],
+                [InlineKeyboardButton(text="👤 Mi Perfil", callback_data="user_profile")],
+                [InlineKeyboardButton(text="🎮 Explorar DianaBot", callback_data="explore")]
             ])
             
             await message.answer(
@@ -96,10 +96,10 @@ Pero la curiosidad sin acción es solo... voyeurismo pasivo."
 🎯 **¿Qué deseas explorar?**"""
 
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton("📚 Conocer la Historia", callback_data="narrative_1_1")],
-                    [InlineKeyboardButton("🎮 Juegos y Desafíos", callback_data="games_menu")],
-                    [InlineKeyboardButton("🏪 Tienda de Lucien", callback_data="store_menu")],
-                    [InlineKeyboardButton("🔙 Volver", callback_data="main_menu")]
+                    [InlineKeyboardButton(text="📚 Conocer la Historia", callback_data="narrative_1_1")],
+                    [InlineKeyboardButton(text="🎮 Juegos y Desafíos", callback_data="games_menu")],
+                    [InlineKeyboardButton(text="🏪 Tienda de Lucien", callback_data="store_menu")],
+                    [InlineKeyboardButton(text="🔙 Volver", callback_data="main_menu")]
                 ])
 
             elif callback.data == "user_profile":
@@ -123,9 +123,11 @@ Pero la curiosidad sin acción es solo... voyeurismo pasivo."
 *Diana susurra: "Interesante... muy interesante."*"""
 
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton("📈 Ver Progreso Detallado", callback_data="detailed_progress")],
-                    [InlineKeyboardButton("🎒 Mi Mochila", callback_data="user_inventory")],
-                    [InlineKeyboardButton("🔙 Menú Principal", callback_data="main_menu")]
+                    [InlineKeyboardButton(text="📈 Ver Progreso Detallado", callback_data="detailed_progress")],
+                    [InlineKeyboardButton(text="🎒 Mi Mochila", callback_data="user_inventory")],
+                    [InlineKeyboardButton(text="📜 Historial de besitos", callback_data="txh")],
+                    [InlineKeyboardButton(text="🏆 Rankings", callback_data="ranking_xp_weekly_all")],
+                    [InlineKeyboardButton(text="🔙 Menú Principal", callback_data="main_menu")]
                 ])
 
             elif callback.data == "explore":
@@ -154,15 +156,15 @@ Pero la curiosidad sin acción es solo... voyeurismo pasivo."
 • Experiencia única para cada usuario"""
 
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton("🚀 ¡Comenzar Aventura!", callback_data="narrative_1_1")],
-                    [InlineKeyboardButton("❓ Más Información", callback_data="more_info")],
-                    [InlineKeyboardButton("🔙 Volver", callback_data="main_menu")]
+                    [InlineKeyboardButton(text="🚀 ¡Comenzar Aventura!", callback_data="narrative_1_1")],
+                    [InlineKeyboardButton(text="❓ Más Información", callback_data="more_info")],
+                    [InlineKeyboardButton(text="🔙 Volver", callback_data="main_menu")]
                 ])
 
             else:
                 response_text = "🎭 Función en desarrollo..."
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton("🔙 Volver", callback_data="main_menu")]
+                    [InlineKeyboardButton(text="🔙 Volver", callback_data="main_menu")]
                 ])
 
             await callback.message.edit_text(
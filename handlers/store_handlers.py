@@ -1,8 +1,14 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import after_commit
 from services.store_service import StoreService
 from services.user_service import UserService
-from utils.keyboards import create_store_keyboard, create_purchase_keyboard
+from services.flash_sale import flash_sales
+from services.recommendation_engine import recommendation_engine
+from services.media_service import media_service
+from utils.helpers import decode_cursor
+from utils.keyboards import create_store_keyboard, create_purchase_keyboard, create_store_category_keyboard, create_inventory_keyboard
 
 class StoreHandlers:
     def __init__(self):
@@ -13,6 +19,9 @@ class StoreHandlers:
     def register(self, dp):
         """Registrar handlers"""
         dp.include_router(self.router)
+        dp.startup.register(recommendation_engine.start)
+        dp.shutdown.register(recommendation_engine.stop)
+        dp.shutdown.register(flash_sales.stop_all)
         
         self.router.callback_query.register(
             self.handle_store_main,
@@ -22,6 +31,10 @@ class StoreHandlers:
             self.handle_store_category,
             F.data.startswith("store_category_")
         )
+        self.router.callback_query.register(
+            self.handle_store_category,
+            F.data.startswith("store_page_")
+        )
         self.router.callback_query.register(
             self.handle_item_details,
             F.data.startswith("item_")
@@ -30,14 +43,26 @@ class StoreHandlers:
             self.handle_purchase,
             F.data.startswith("purchase_")
         )
+        self.router.callback_query.register(
+            self.handle_inventory,
+            F.data == "user_inventory"
+        )
+        self.router.callback_query.register(
+            self.handle_inventory,
+            F.data.startswith("inv_")
+        )
+        self.router.callback_query.register(
+            self.handle_open_item,
+            F.data.startswith("open_item_")
+        )
 
-    async def handle_store_main(self, callback: CallbackQuery, user: dict):
+    async def handle_store_main(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Manejar menú principal de la tienda"""
         await callback.answer()
         
         # Obtener items destacados y recomendaciones
-        featured_items = await self.store_service.get_featured_items()
-        recommendations = await self.store_service.get_lucien_recommendations(user.id)
+        featured_items = await self.store_service.get_featured_items(db=db)
+        recommendations = await self.store_service.get_lucien_recommendations(user.id, user=user, db=db)
         
         store_text = f"""🏪 *Tienda de Lucien*
 
@@ -66,12 +91,27 @@ class StoreHandlers:
             parse_mode="Markdown"
         )
 
-    async def handle_store_category(self, callback: CallbackQuery, user: dict):
-        """Manejar categorías de la tienda"""
+    async def handle_store_category(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Manejar categorías de la tienda (paginadas)"""
         await callback.answer()
         
-        category = callback.data.replace("store_category_", "")
-        items = await self.store_service.get_store_items(category, user.role)
+        if callback.data.startswith("store_page_"):
+            # store_page_{category}_{page}_{cursor}; datos inválidos muestran la primera página
+            parts = callback.data.replace("store_page_", "").rsplit("_", 2)
+            category, page_number, cursor = parts[0], 1, None
+            if len(parts) == 3:
+                try:
+                    decode_cursor(parts[2])
+                    page_number, cursor = int(parts[1]), parts[2]
+                except ValueError:
+                    pass
+            if page_number < 1:
+                page_number, cursor = 1, None
+        else:
+            category, page_number, cursor = callback.data.replace("store_category_", ""), 1, None
+        
+        page = await self.store_service.get_category_page(category, user.role, page_number, cursor)
+        owned_ids = await self.store_service.get_owned_item_ids(user.id, db=db)
         
         category_names = {
             "premium": "Contenido Premium",
@@ -91,20 +131,18 @@ class StoreHandlers:
 
 📦 **Items disponibles:**"""
 
-        buttons = []
-        
-        for item in items:
-            status = "✅" if user.besitos >= item.price_besitos else "❌"
-            category_text += f"\n{status} **{item.name}**\n   💰 {item.price_besitos} besitos"
-            
-            buttons.append({
-                "text": f"{item.name} ({item.price_besitos}💰)",
-                "callback": f"item_{item.id}"
-            })
+        # La página viene renderizada de caché; solo las marcas dependen del usuario
+        for item_id, price, item_text, _ in page.items:
+            if item_id in owned_ids:
+                status = "🎒"
+            else:
+                status = "✅" if user.besitos >= price else "❌"
+            category_text += f"\n{status} {item_text}"
         
-        buttons.append({"text": "🔙 Volver a Tienda", "callback": "store_main"})
+        if not page.items:
+            category_text += "\nNo hay items en esta categoría."
         
-        keyboard = create_store_keyboard(user, items, [])
+        keyboard = create_store_category_keyboard(page)
         
         await callback.message.edit_text(
             category_text,
@@ -112,12 +150,12 @@ class StoreHandlers:
             parse_mode="Markdown"
         )
 
-    async def handle_item_details(self, callback: CallbackQuery, user: dict):
+    async def handle_item_details(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Mostrar detalles de un item"""
         await callback.answer()
         
         item_id = int(callback.data.replace("item_", ""))
-        item = await self.store_service.get_item_by_id(item_id)
+        item = await self.store_service.get_item_by_id(item_id, db=db)
         
         if not item:
             await callback.answer("Item no encontrado", show_alert=True)
@@ -150,6 +188,53 @@ class StoreHandlers:
             parse_mode="Markdown"
         )
 
+    async def handle_inventory(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Mostrar inventario del usuario paginado"""
+        await callback.answer()
+        
+        # user_inventory (primera página), inv_n_{cursor} (anteriores) o inv_p_{cursor} (recientes)
+        parts = callback.data.split("_", 2)
+        cursor = parts[2] if parts[0] == "inv" else None
+        direction = "prev" if cursor and parts[1] == "p" else "next"
+        
+        page = await self.store_service.get_inventory_page(user.id, cursor, direction, db=db)
+        
+        inventory_text = """📦 *Mi Inventario*
+
+*Lucien revisa su registro...*
+
+"Todo lo que has adquirido queda a tu disposición."
+"""
+        for item in page["items"]:
+            inventory_text += f"\n• **{item.name}** ({item.created_at:%d/%m/%Y}) - {item.price_paid} 💰"
+        
+        if not page["items"]:
+            inventory_text += "\nTodavía no has comprado nada en la tienda."
+        
+        keyboard = create_inventory_keyboard(page["items"], page["next_cursor"], page["prev_cursor"])
+        
+        await callback.message.edit_text(
+            inventory_text,
+            reply_markup=keyboard,
+            parse_mode="Markdown"
+        )
+
+    async def handle_open_item(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Volver a enviar el contenido de un item comprado"""
+        item_id = int(callback.data.replace("open_item_", ""))
+        owned_ids = await self.store_service.get_owned_item_ids(user.id, db=db)
+        item = await self.store_service.get_item_by_id(item_id, db=db)
+        
+        if item_id not in owned_ids or not item:
+            await callback.answer("Este item no está en tu inventario", show_alert=True)
+            return
+        
+        await callback.answer()
+        if not item.content_url:
+            await callback.message.answer(f"📦 {item.name} no tiene contenido descargable.")
+        elif not await media_service.deliver(callback.bot, callback.from_user.id, item, db=db):
+            await callback.message.answer(f"📦 No se pudo enviar {item.name}, inténtalo más tarde.")
+
     def _get_lucien_item_comment(self, item, user):
         """Generar comentario personalizado de Lucien sobre el item"""
         comments_by_category = {
@@ -169,12 +254,12 @@ class StoreHandlers:
         else:
             return base_comment
 
-    async def handle_purchase(self, callback: CallbackQuery, user: dict):
+    async def handle_purchase(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
         """Procesar compra de item"""
         await callback.answer()
         
         item_id = int(callback.data.replace("purchase_", ""))
-        result = await self.store_service.purchase_item(user.id, item_id)
+        result = await self.store_service.purchase_item(user.id, item_id, db=db)
         
         if result["success"]:
             success_text = f"""🎉 *¡Compra Realizada!*
@@ -211,3 +296,10 @@ class StoreHandlers:
             parse_mode="Markdown"
         )
         
+        if result["success"] and result["item"]:
+            # Entregar cuando la compra quede confirmada, fuera de su transacción
+            if db is not None:
+                after_commit(db, media_service.deliver_later, callback.bot, callback.from_user.id, result["item"])
+            else:
+                media_service.deliver_later(callback.bot, callback.from_user.id, result["item"])
+        
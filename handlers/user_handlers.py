@@ -0,0 +1,102 @@
+from aiogram import Router, F
+from aiogram.types import CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.economy_service import EconomyService
+from services.user_service import UserService
+from services.leaderboard_service import METRICS, PERIODS, SEGMENTS
+from utils.keyboards import create_transaction_history_keyboard, create_leaderboard_keyboard
+
+class UserHandlers:
+    def __init__(self):
+        self.router = Router()
+        self.economy_service = EconomyService()
+        self.user_service = UserService()
+
+    def register(self, dp):
+        """Registrar handlers"""
+        dp.include_router(self.router)
+
+        self.router.callback_query.register(
+            self.handle_transaction_history,
+            F.data.startswith("txh")
+        )
+        self.router.callback_query.register(
+            self.handle_leaderboard,
+            F.data.startswith("ranking_")
+        )
+
+    async def handle_transaction_history(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Mostrar historial de besitos paginado"""
+        await callback.answer()
+
+        # txh (primera página), txh_n_{cursor} (anteriores) o txh_p_{cursor} (recientes)
+        parts = callback.data.split("_", 2)
+        cursor = parts[2] if len(parts) == 3 else None
+        direction = "prev" if len(parts) == 3 and parts[1] == "p" else "next"
+
+        try:
+            page = await self.economy_service.get_transaction_page(
+                user.id, cursor, direction, db=db
+            )
+        except ValueError:
+            # Cursor manipulado o corrupto: mostrar la primera página
+            page = await self.economy_service.get_transaction_page(user.id, db=db)
+
+        signs = {"earn": "+", "refund": "+", "spend": "-", "escrow": "-"}
+        history_text = f"""📜 *Historial de besitos*
+
+💰 **Saldo actual:** {user.besitos}
+"""
+        for transaction in page["transactions"]:
+            history_text += (
+                f"\n{transaction.created_at:%d/%m %H:%M} "
+                f"{signs.get(transaction.type, '')}{transaction.amount} 💰 "
+                f"{transaction.description or ''}"
+            )
+
+        if not page["transactions"]:
+            history_text += "\nTodavía no tienes movimientos."
+
+        keyboard = create_transaction_history_keyboard(page["next_cursor"], page["prev_cursor"])
+
+        await callback.message.edit_text(
+            history_text,
+            reply_markup=keyboard,
+            parse_mode="Markdown"
+        )
+
+    async def handle_leaderboard(self, callback: CallbackQuery, user: dict, db: AsyncSession = None):
+        """Mostrar ranking semanal/mensual (general o VIP)"""
+        await callback.answer()
+
+        # ranking_{metric}_{period}_{segment}; datos inválidos muestran el ranking por defecto
+        parts = callback.data.split("_")
+        if (
+            len(parts) == 4
+            and parts[1] in METRICS and parts[2] in PERIODS and parts[3] in SEGMENTS
+        ):
+            _, metric, period, segment = parts
+        else:
+            metric, period, segment = "xp", "weekly", "all"
+        entries = await self.user_service.get_period_leaderboard(
+            metric, period, segment, limit=10, db=db
+        )
+
+        titles = {"xp": "⭐ Experiencia", "besitos": "💰 Besitos ganados"}
+        periods = {"weekly": "esta semana", "monthly": "este mes"}
+        medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+        lines = [
+            f"{medals.get(position, f'{position}.')} {entry['user'].first_name} — {entry['score']}"
+            for position, entry in enumerate(entries, 1)
+        ]
+        ranking_text = f"""🏆 *Ranking {'VIP' if segment == 'vip' else 'General'}*
+{titles[metric]} — {periods[period]}
+
+{chr(10).join(lines) if lines else 'Aún no hay puntuaciones en este periodo.'}"""
+
+        await callback.message.edit_text(
+            ranking_text,
+            reply_markup=create_leaderboard_keyboard(metric, period, segment),
+            parse_mode="Markdown"
+        )
@@ -1,20 +1,113 @@
-from typing import Callable, Dict, Any, Awaitable
-from aiogram import BaseMiddleware
-from aiogram.types import Message, CallbackQuery
-
-class AuthMiddleware(BaseMiddleware):
-    def __init__(self):
-        pass
-
-    async def __call__(
-        self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message | CallbackQuery,
-        data: Dict[str, Any]
-    ) -> Any:
-        # Por ahora solo pasar el evento sin procesamiento adicional
+import asyncio
+import importlib
+import logging
+import sys
+import os
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+# (módulo, clase) de cada grupo de handlers, en orden de registro
+HANDLERS = [
+    ("handlers.start_handler", "StartHandler"),
+    ("handlers.user_handlers", "UserHandlers"),
+    ("handlers.narrative_handlers", "NarrativeHandlers"),
+    ("handlers.store_handlers", "StoreHandlers"),
+    ("handlers.auction_handlers", "AuctionHandlers"),
+    ("handlers.maintenance_handlers", "MaintenanceHandlers"),
+    ("handlers.channel_handlers", "ChannelHandlers"),
+    ("handlers.admin_handlers", "AdminHandlers"),
+    ("handlers.cms_handlers", "CMSHandlers"),
+]
+
+def setup_dispatcher(dp):
+    """Registrar middlewares y handlers en el dispatcher"""
+    from middlewares.database import DatabaseMiddleware
+    from middlewares.auth import AuthMiddleware
+    from middlewares.economy import EconomyMiddleware
+    from middlewares.analytics import AnalyticsMiddleware
+
+    # Orden importante: la sesión de la actualización primero, luego el usuario
+    middlewares = [DatabaseMiddleware(), AuthMiddleware(), EconomyMiddleware(), AnalyticsMiddleware()]
+    for middleware in middlewares:
+        dp.message.middleware(middleware)
+        dp.callback_query.middleware(middleware)
+        # Tareas de fondo: arrancan con el bot y vuelcan lo pendiente al apagar
+        if hasattr(middleware, "register"):
+            middleware.register(dp)
+
+    for module_name, class_name in HANDLERS:
+        # Un módulo de handlers roto no debe impedir que arranque el resto del bot
         try:
-            return await handler(event, data)
+            module = importlib.import_module(module_name)
+        except (ImportError, SyntaxError) as e:
+            logger.warning(f"⚠️ Handlers {class_name} no disponibles: {e}")
+            continue
+        getattr(module, class_name)().register(dp)
+
+async def main():
+    """Función principal del bot"""
+    try:
+        logger.info("🚀 Iniciando DianaBot 2.0...")
+
+        # Verificar BOT_TOKEN
+        bot_token = os.getenv("BOT_TOKEN")
+        if not bot_token:
+            logger.error("❌ BOT_TOKEN no encontrado")
+            return
+
+        logger.info("✅ BOT_TOKEN encontrado")
+
+        # Importar dependencias
+        from aiogram import Bot, Dispatcher
+        from aiogram.fsm.storage.memory import MemoryStorage
+        from aiogram.client.default import DefaultBotProperties
+        from aiogram.enums import ParseMode
+
+        # Inicializar base de datos
+        logger.info("🗄️ Inicializando base de datos...")
+        try:
+            from config.database import init_db
+            db_success = await init_db()
+            if db_success:
+                from database.migrations import run_migrations
+                await run_migrations()
+                logger.info("✅ Base de datos lista")
+            else:
+                logger.warning("⚠️ Base de datos con problemas, continuando...")
         except Exception as e:
-            print(f"Error en middleware: {e}")
-            return await handler(event, data)
+            logger.warning(f"⚠️ Error en base de datos: {e}")
+
+        # Crear bot
+        logger.info("🤖 Creando bot...")
+        bot = Bot(
+            token=bot_token,
+            default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
+        )
+        dp = Dispatcher(storage=MemoryStorage())
+
+        # Configurar handlers
+        logger.info("📡 Configurando handlers...")
+        setup_dispatcher(dp)
+
+        # Los callbacks de dp.shutdown vuelcan cachés y colas al terminar el polling
+        logger.info("✅ DianaBot listo")
+        try:
+            await dp.start_polling(bot)
+        finally:
+            await bot.session.close()
+
+    except Exception as e:
+        logger.error(f"❌ Error crítico: {e}")
+        raise
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("👋 Bot detenido")
@@ -1,12 +1,17 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
-from services.analytics_service import AnalyticsService
+from services.analytics_service import AnalyticsService, analytics_pipeline
 
 class AnalyticsMiddleware(BaseMiddleware):
     def __init__(self):
         self.analytics_service = AnalyticsService()
 
+    def register(self, dp):
+        """Registrar ciclo de vida del escritor de analytics"""
+        dp.startup.register(analytics_pipeline.start)
+        dp.shutdown.register(analytics_pipeline.stop)
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -2,11 +2,17 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from services.user_service import UserService
+from services.user_cache import user_cache
 
 class AuthMiddleware(BaseMiddleware):
     def __init__(self):
         self.user_service = UserService()
 
+    def register(self, dp):
+        """Registrar ciclo de vida de la caché de usuarios"""
+        dp.startup.register(user_cache.start)
+        dp.shutdown.register(user_cache.stop)
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -20,7 +26,7 @@ class AuthMiddleware(BaseMiddleware):
             "last_name": event.from_user.last_name
         }
         
-        user = await self.user_service.get_or_create_user(user_data)
+        user = await self.user_service.get_or_create_user(user_data, db=data.get("db"))
         data["user"] = user
         
         return await handler(event, data)
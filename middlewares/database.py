@@ -0,0 +1,21 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import Message, CallbackQuery
+from database.connection import session_scope
+
+class DatabaseMiddleware(BaseMiddleware):
+    """Una sesión de base de datos por actualización (unidad de trabajo).
+
+    Debe registrarse antes que el resto de middlewares: la sesión viaja en
+    data["db"] y se confirma una sola vez cuando termina el handler.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message | CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with session_scope() as db:
+            data["db"] = db
+            return await handler(event, data)
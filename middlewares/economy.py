@@ -2,11 +2,29 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from services.economy_service import EconomyService
+from services.activity_rewards import activity_rewards
+from services.leaderboard_service import leaderboards
+from services.ledger_compaction import ledger_compactor
+from services.auction_book import auction_books
+from services.auction_scheduler import auction_scheduler
 
 class EconomyMiddleware(BaseMiddleware):
     def __init__(self):
         self.economy_service = EconomyService()
 
+    def register(self, dp):
+        """Registrar tareas de fondo de la economía (vuelcan lo pendiente al apagar)"""
+        dp.startup.register(activity_rewards.start)
+        dp.startup.register(leaderboards.start)
+        dp.startup.register(ledger_compactor.start)
+        dp.startup.register(auction_books.start)
+        dp.startup.register(auction_scheduler.start)
+        dp.shutdown.register(auction_scheduler.stop)
+        dp.shutdown.register(auction_books.stop)
+        dp.shutdown.register(ledger_compactor.stop)
+        dp.shutdown.register(activity_rewards.stop)
+        dp.shutdown.register(leaderboards.stop)
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
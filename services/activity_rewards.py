@@ -0,0 +1,95 @@
+import logging
+from collections import Counter, defaultdict
+from typing import Dict
+from sqlalchemy import update, bindparam
+from config.settings import Settings
+from database.connection import session_scope, after_commit
+from database.models import User
+from services.user_cache import user_cache
+from services.leaderboard_service import leaderboards
+from services.economy_service import EconomyService
+from utils.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class ActivityRewardAccumulator:
+    """Acumula en memoria las recompensas por actividad de cada usuario.
+
+    Cada ventana se vuelca como un UPDATE de saldo y una transacción resumen
+    por usuario, todo en un único commit.
+    """
+
+    def __init__(self, window: float = 60):
+        self.window = window
+        # user_id -> besitos pendientes
+        self._pending: Dict[int, int] = defaultdict(int)
+        # user_id -> eventos por tipo de actividad
+        self._activities: Dict[int, Counter] = defaultdict(Counter)
+        self._flusher = PeriodicTask(self.flush, window, "Error volcando recompensas de actividad")
+
+    def add(self, user_id: int, reward: int, activity_type: str):
+        """Acumular recompensa de una actividad"""
+        self._pending[user_id] += reward
+        self._activities[user_id][activity_type] += 1
+        self._flusher.start()
+
+    async def flush(self) -> int:
+        """Volcar las recompensas pendientes en un solo commit"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, defaultdict(int)
+        activities, self._activities = self._activities, defaultdict(Counter)
+
+        users = User.__table__
+        try:
+            async with session_scope() as db:
+                await db.execute(
+                    update(users)
+                    .where(users.c.id == bindparam("user_id"))
+                    .values(
+                        besitos=users.c.besitos + bindparam("reward"),
+                        total_earned=users.c.total_earned + bindparam("reward")
+                    ),
+                    [
+                        {"user_id": user_id, "reward": reward}
+                        for user_id, reward in pending.items()
+                    ]
+                )
+                await EconomyService().record_transactions(
+                    [
+                        {
+                            "user_id": user_id,
+                            "type": "earn",
+                            "amount": reward,
+                            "description": self._describe(activities[user_id])
+                        }
+                        for user_id, reward in pending.items()
+                    ],
+                    db=db
+                )
+                for user_id, reward in pending.items():
+                    after_commit(db, user_cache.invalidate_user, user_id)
+                    after_commit(db, leaderboards.record, "besitos", user_id, reward)
+        except Exception:
+            # Devolver lo pendiente para el siguiente volcado
+            for user_id, reward in pending.items():
+                self._pending[user_id] += reward
+                self._activities[user_id].update(activities[user_id])
+            raise
+        return len(pending)
+
+    async def start(self):
+        """Iniciar volcado periódico"""
+        self._flusher.start()
+
+    async def stop(self):
+        """Detener volcado periódico y volcar lo pendiente"""
+        await self._flusher.stop()
+        await self.flush()
+
+    def _describe(self, activities: Counter) -> str:
+        detail = ", ".join(f"{activity} x{count}" for activity, count in activities.most_common())
+        return f"Actividad: {detail}"[:500]
+
+activity_rewards = ActivityRewardAccumulator(window=Settings.ACTIVITY_REWARD_WINDOW)
@@ -0,0 +1,31 @@
+import os
+from typing import Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.settings import Settings
+from database.models import Admin
+from database.connection import session_scope
+
+def super_admin_ids() -> Set[int]:
+    """telegram_id de los super admins (SUPER_ADMIN_IDS)"""
+    if Settings.SUPER_ADMIN_IDS is not None:
+        return set(Settings.SUPER_ADMIN_IDS)
+    return {int(admin_id) for admin_id in os.getenv("SUPER_ADMIN_IDS", "").split(",") if admin_id.strip()}
+
+class AdminService:
+
+    async def get_admin(self, user, db: AsyncSession = None) -> Optional[dict]:
+        """Obtener los datos de administrador de un usuario, o None si no lo es"""
+        if user.telegram_id in super_admin_ids():
+            return {"name": user.first_name, "role": "super_admin"}
+        
+        async with session_scope(db) as db:
+            result = await db.execute(
+                select(Admin.name, Admin.role)
+                .where(Admin.user_id == user.id, Admin.is_active == True)
+            )
+            row = result.one_or_none()
+        
+        if row is None:
+            return None
+        return {"name": row.name, "role": row.role}
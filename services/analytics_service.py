@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import random
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert
+from config.settings import Settings
+from database.connection import session_scope
+from database.models import AnalyticsEvent
+from utils.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "block", "sample")
+
+class AnalyticsPipeline:
+    """Cola acotada de eventos de analytics con escritor en segundo plano.
+
+    Encolar no toca la base de datos: un escritor drena la cola por lotes
+    y los inserta con un único INSERT masivo por lote.
+
+    Política al llenarse la cola:
+    - drop_oldest: se descarta el evento más antiguo
+    - block: se espera a que haya espacio (contrapresión)
+    - sample: por encima del 80% solo entra una fracción de eventos
+      (sample_rate); con la cola llena se descarta el evento nuevo
+    """
+
+    def __init__(self, max_size: int = 10000, batch_size: int = 500, flush_interval: float = 2,
+                 overflow_policy: str = "drop_oldest", sample_rate: float = 0.1):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de desbordamiento no válida: {overflow_policy}")
+
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.sample_rate = sample_rate
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer = BackgroundTask(self._writer_loop)
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def enqueue(self, user_id: int, event_type: str, data: str = None):
+        """Encolar evento sin esperar a la base de datos"""
+        queue = self._ensure_writer()
+        event = {
+            "user_id": user_id,
+            "event_type": event_type,
+            "data": data[:500] if data else None,
+            "created_at": datetime.now()
+        }
+
+        if self.overflow_policy == "block":
+            await queue.put(event)
+        elif self.overflow_policy == "sample":
+            if queue.qsize() >= self.max_size * 0.8 and random.random() >= self.sample_rate:
+                self.sampled_out += 1
+                return
+            if queue.full():
+                self.dropped += 1
+                return
+            queue.put_nowait(event)
+        else:
+            if queue.full():
+                queue.get_nowait()
+                queue.task_done()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+        self.enqueued += 1
+
+    def stats(self) -> dict:
+        """Obtener métricas de la cola"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "overflow_policy": self.overflow_policy,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches
+        }
+
+    async def start(self):
+        """Iniciar escritor en segundo plano"""
+        self._ensure_writer()
+
+    async def stop(self):
+        """Detener escritor y escribir lo que quede en la cola"""
+        await self._writer.stop()
+
+        while self._queue and not self._queue.empty():
+            await self._write(self._drain(self.batch_size))
+
+    def _ensure_writer(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._writer.start()
+        return self._queue
+
+    def _drain(self, limit: int) -> List[dict]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            self._queue.task_done()
+        return batch
+
+    async def _writer_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._queue.task_done()
+
+            # Con poco tráfico se espera un poco para juntar un lote mayor
+            try:
+                if self._queue.qsize() < self.batch_size - 1:
+                    await asyncio.sleep(self.flush_interval)
+            except asyncio.CancelledError:
+                await self._write(batch + self._drain(self.batch_size - 1))
+                raise
+
+            batch.extend(self._drain(self.batch_size - 1))
+            # Un lote ya sacado de la cola se escribe aunque se detenga el escritor
+            await asyncio.shield(self._write(batch))
+
+    async def _write(self, batch: List[dict]):
+        if not batch:
+            return
+        try:
+            async with session_scope() as db:
+                await db.execute(insert(AnalyticsEvent), batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            # Analytics no es crítico: se descarta el lote y se sigue
+            self.failed += len(batch)
+            logger.warning(f"⚠️ Error escribiendo lote de analytics ({len(batch)} eventos): {e}")
+
+analytics_pipeline = AnalyticsPipeline(
+    max_size=Settings.ANALYTICS_QUEUE_SIZE,
+    batch_size=Settings.ANALYTICS_BATCH_SIZE,
+    flush_interval=Settings.ANALYTICS_FLUSH_INTERVAL,
+    overflow_policy=Settings.ANALYTICS_OVERFLOW_POLICY,
+    sample_rate=Settings.ANALYTICS_SAMPLE_RATE
+)
+
+class AnalyticsService:
+
+    async def track_message(self, user_id: int, text: str = None):
+        """Registrar mensaje del usuario (encolado, no bloquea al handler)"""
+        await analytics_pipeline.enqueue(user_id, "message", text)
+
+    async def track_callback(self, user_id: int, callback_data: str = None):
+        """Registrar interacción con botón (encolado, no bloquea al handler)"""
+        await analytics_pipeline.enqueue(user_id, "callback", callback_data)
+
+    def get_pipeline_stats(self) -> dict:
+        """Obtener métricas de la cola de analytics"""
+        return analytics_pipeline.stats()
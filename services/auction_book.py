@@ -0,0 +1,284 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select, insert, update, func
+from config.settings import Settings
+from database.connection import session_scope, savepoint
+from database.models import Auction, AuctionBid
+from services.auction_watchers import auction_watchers
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = {"success": False, "message": "Subasta o usuario no encontrado"}
+NOT_STARTED = {"success": False, "message": "La subasta aún no ha comenzado"}
+ENDED = {"success": False, "message": "La subasta ha terminado"}
+INSUFFICIENT = {"success": False, "message": "Besitos insuficientes"}
+
+def too_low(current_price: int) -> dict:
+    return {"success": False, "message": f"La puja debe ser mayor a {current_price} besitos"}
+
+@dataclass
+class AuctionBook:
+    """Estado en vivo de una subasta: precio, líder y besitos retenidos por postor"""
+    auction_id: int
+    title: str
+    starts_at: datetime
+    ends_at: datetime
+    current_price: int
+    leader_id: Optional[int] = None
+    # user_id -> besitos retenidos (su última puja)
+    held: Dict[int, int] = field(default_factory=dict)
+    closed: bool = False
+    queue: "asyncio.Queue[Optional[Tuple[int, int, asyncio.Future]]]" = field(default_factory=asyncio.Queue)
+    task: Optional[asyncio.Task] = None
+
+    bids: int = 0
+    rejected: int = 0
+    batches: int = 0
+
+    def check(self, amount: int, now: datetime) -> Optional[dict]:
+        """Motivo de rechazo de una puja, o None si es válida con el estado actual"""
+        if self.closed or now >= self.ends_at:
+            return ENDED
+        if now < self.starts_at:
+            return NOT_STARTED
+        if amount <= self.current_price:
+            return too_low(self.current_price)
+        return None
+
+class AuctionBookManager:
+    """Libros en memoria de las subastas activas.
+
+    Las pujas se validan contra el libro sin tocar la base de datos; las
+    que pueden ganar se encolan y un único consumidor por subasta las
+    aplica en orden de llegada, por lotes en un solo commit (retención de
+    besitos, filas de auction_bids y precio actual). El libro solo cambia
+    después del commit, y al arrancar se reconstruye desde auction_bids.
+    """
+
+    def __init__(self, batch_size: int = 50):
+        self.batch_size = batch_size
+        self._books: Dict[int, AuctionBook] = {}
+        # Subastas terminadas: sus pujas se rechazan sin consultar la base
+        self._closed: Set[int] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get(self, auction_id: int) -> Optional[AuctionBook]:
+        """Obtener el libro de una subasta, reconstruyéndolo si no está cargado"""
+        book = self._books.get(auction_id)
+        if book is not None or auction_id in self._closed:
+            return book
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if auction_id not in self._books and auction_id not in self._closed:
+                await self._load([auction_id])
+        return self._books.get(auction_id)
+
+    def peek(self, auction_id: int) -> Optional[AuctionBook]:
+        """Libro de la subasta si ya está cargado (sin consultar la base)"""
+        return self._books.get(auction_id)
+
+    async def submit(self, auction_id: int, user_id: int, amount: int) -> dict:
+        """Validar una puja en memoria y, si puede ganar, encolarla"""
+        if auction_id in self._closed:
+            return ENDED
+        book = await self.get(auction_id)
+        if book is None:
+            return ENDED if auction_id in self._closed else NOT_FOUND
+
+        rejection = book.check(amount, datetime.now())
+        if rejection:
+            book.rejected += 1
+            return rejection
+
+        future = asyncio.get_running_loop().create_future()
+        book.queue.put_nowait((user_id, amount, future))
+        return await future
+
+    async def close(self, auction_id: int):
+        """Cerrar el libro: las pujas en cola se rechazan y se espera al lote en curso"""
+        self._closed.add(auction_id)
+        book = self._books.pop(auction_id, None)
+        if book is None:
+            return
+        book.closed = True
+        book.queue.put_nowait(None)
+        if book.task:
+            await book.task
+
+    def reopen(self, auction_id: int):
+        """Olvidar el cierre de una subasta cuya liquidación no se confirmó.
+
+        El libro se reconstruye desde la base en la próxima consulta; si la
+        subasta ya venció, vuelve a quedar cerrado.
+        """
+        self._closed.discard(auction_id)
+
+    async def start(self):
+        """Reconstruir los libros de las subastas activas"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            async with session_scope() as db:
+                result = await db.execute(
+                    select(Auction.id).where(Auction.is_active == True, Auction.ends_at > datetime.now())
+                )
+                auction_ids = [auction_id for auction_id in result.scalars() if auction_id not in self._books]
+            if auction_ids:
+                await self._load(auction_ids)
+        logger.info(f"🏆 Libros de subastas cargados: {len(self._books)}")
+
+    async def stop(self):
+        """Cerrar todos los libros (al apagar) sin perder pujas en curso"""
+        for auction_id in list(self._books):
+            await self.close(auction_id)
+
+    def stats(self) -> Dict[int, dict]:
+        """Obtener métricas de los libros cargados"""
+        return {
+            auction_id: {
+                "current_price": book.current_price,
+                "leader_id": book.leader_id,
+                "bidders": len(book.held),
+                "queue_depth": book.queue.qsize(),
+                "bids": book.bids,
+                "rejected": book.rejected,
+                "batches": book.batches
+            }
+            for auction_id, book in self._books.items()
+        }
+
+    async def _load(self, auction_ids: Iterable[int]):
+        auction_ids = list(auction_ids)
+        async with session_scope() as db:
+            auctions = (await db.execute(
+                select(Auction).where(Auction.id.in_(auction_ids))
+            )).scalars().all()
+            # Lo retenido a cada postor es su última puja, que siempre es su mayor puja
+            held_rows = (await db.execute(
+                select(AuctionBid.auction_id, AuctionBid.user_id, func.max(AuctionBid.amount))
+                .where(AuctionBid.auction_id.in_(auction_ids))
+                .group_by(AuctionBid.auction_id, AuctionBid.user_id)
+            )).all()
+
+        held: Dict[int, Dict[int, int]] = {}
+        for auction_id, user_id, amount in held_rows:
+            held.setdefault(auction_id, {})[user_id] = amount
+
+        now = datetime.now()
+        for auction in auctions:
+            if not auction.is_active or auction.ends_at <= now:
+                self._closed.add(auction.id)
+                continue
+
+            book_held = held.get(auction.id, {})
+            leader_id = max(book_held, key=book_held.get) if book_held else None
+            book = AuctionBook(
+                auction_id=auction.id,
+                title=auction.title,
+                starts_at=auction.starts_at,
+                ends_at=auction.ends_at,
+                current_price=max([auction.current_price or 0, *book_held.values()]),
+                leader_id=leader_id,
+                held=book_held
+            )
+            book.task = asyncio.get_running_loop().create_task(self._run(book))
+            self._books[auction.id] = book
+
+    async def _run(self, book: AuctionBook):
+        while True:
+            item = await book.queue.get()
+            batch = []
+            stop = item is None
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size and not book.queue.empty():
+                item = book.queue.get_nowait()
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                await asyncio.shield(self._process(book, batch))
+            if stop:
+                return
+
+    async def _process(self, book: AuctionBook, batch: List[Tuple[int, int, asyncio.Future]]):
+        results = []
+        rows = []
+        price, leader_id = book.current_price, book.leader_id
+        held: Dict[int, int] = {}
+        try:
+            from services.economy_service import EconomyService
+            economy_service = EconomyService()
+
+            async with session_scope() as db:
+                for user_id, amount, future in batch:
+                    now = datetime.now()
+                    if book.closed or now >= book.ends_at:
+                        results.append(ENDED)
+                        continue
+                    if amount <= price:
+                        results.append(too_low(price))
+                        continue
+
+                    # Retener solo la diferencia con lo que ya tenía retenido
+                    previous = held.get(user_id, book.held.get(user_id, 0))
+                    # Un error en una puja solo afecta a ese postor
+                    try:
+                        async with savepoint(db):
+                            remaining_besitos = await economy_service.change_balance(
+                                user_id, previous - amount, "escrow",
+                                f"Puja subasta: {book.title}", str(book.auction_id), db=db
+                            )
+                    except Exception as e:
+                        logger.warning(f"⚠️ Error en puja de la subasta {book.auction_id} (usuario {user_id}): {e}")
+                        future.set_exception(e)
+                        results.append(None)
+                        continue
+                    if remaining_besitos is None:
+                        results.append(INSUFFICIENT)
+                        continue
+
+                    held[user_id] = amount
+                    price, leader_id = amount, user_id
+                    rows.append({"auction_id": book.auction_id, "user_id": user_id, "amount": amount, "created_at": now})
+                    results.append({
+                        "success": True,
+                        "message": f"¡Puja realizada por {amount} besitos!",
+                        "current_price": amount,
+                        "remaining_besitos": remaining_besitos
+                    })
+
+                if rows:
+                    await db.execute(insert(AuctionBid), rows)
+                    await db.execute(
+                        update(Auction)
+                        .where(Auction.id == book.auction_id)
+                        .values(current_price=price)
+                        .execution_options(synchronize_session=False)
+                    )
+        except Exception as e:
+            logger.warning(f"⚠️ Error en lote de pujas de la subasta {book.auction_id}: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # El libro solo refleja lo que quedó confirmado
+        book.current_price, book.leader_id = price, leader_id
+        book.held.update(held)
+        book.bids += len(rows)
+        book.rejected += len(batch) - len(rows)
+        book.batches += 1
+        if rows:
+            auction_watchers.notify(book.auction_id)
+        for (_, _, future), result in zip(batch, results):
+            if result is not None and not future.done():
+                future.set_result(result)
+
+auction_books = AuctionBookManager(batch_size=Settings.AUCTION_BID_BATCH_SIZE)
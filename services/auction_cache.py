@@ -0,0 +1,115 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+from sqlalchemy import select
+from database.connection import session_scope
+from database.models import Auction
+
+@dataclass(frozen=True)
+class AuctionSummary:
+    """Copia inmutable de una Auction (mismos atributos que usan los handlers)"""
+    id: int
+    title: str
+    description: Optional[str]
+    starting_price: int
+    current_price: int
+    starts_at: datetime
+    ends_at: datetime
+    is_active: bool
+    winner_id: Optional[int]
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, auction: Auction) -> "AuctionSummary":
+        return cls(
+            id=auction.id,
+            title=auction.title,
+            description=auction.description,
+            starting_price=auction.starting_price,
+            current_price=auction.current_price,
+            starts_at=auction.starts_at,
+            ends_at=auction.ends_at,
+            is_active=bool(auction.is_active),
+            winner_id=auction.winner_id,
+            created_at=auction.created_at
+        )
+
+class AuctionListCache:
+    """Listas de subastas activas y próximas, en memoria hasta el próximo límite.
+
+    Las listas solo cambian cuando una subasta empieza o termina, o cuando
+    se crea o cierra una; por eso se guardan hasta el inicio o cierre más
+    próximo de las subastas cargadas, y create_auction/end_auction las
+    invalidan tras el commit.
+    """
+
+    def __init__(self, upcoming_limit: int = 5, clock: Callable[[], datetime] = datetime.now):
+        self.upcoming_limit = upcoming_limit
+        self.clock = clock
+        self._active: Tuple[AuctionSummary, ...] = ()
+        self._upcoming: Tuple[AuctionSummary, ...] = ()
+        self._expires_at: Optional[datetime] = None
+        self._version = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def expires_at(self) -> Optional[datetime]:
+        return self._expires_at
+
+    async def active(self) -> Tuple[AuctionSummary, ...]:
+        """Subastas en curso, de la que termina antes a la que termina después"""
+        await self._refresh()
+        return self._active
+
+    async def upcoming(self) -> Tuple[AuctionSummary, ...]:
+        """Próximas subastas, de la que empieza antes a la que empieza después"""
+        await self._refresh()
+        return self._upcoming
+
+    def invalidate(self):
+        """Descartar las listas (se usa como callback after_commit)"""
+        self._version += 1
+        self._expires_at = None
+
+    async def _refresh(self):
+        if self._expires_at is not None and self.clock() < self._expires_at:
+            self.hits += 1
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Otro lector pudo recargarlas mientras se esperaba el lock
+            while self._expires_at is None or self.clock() >= self._expires_at:
+                self.misses += 1
+                version = self._version
+                now = self.clock()
+                async with session_scope() as db:
+                    result = await db.execute(
+                        select(Auction).where(Auction.is_active == True, Auction.ends_at > now)
+                    )
+                    auctions = [AuctionSummary.from_model(auction) for auction in result.scalars()]
+
+                # Si hubo una invalidación durante la consulta se vuelve a leer
+                if version != self._version:
+                    continue
+
+                self._active = tuple(sorted(
+                    (auction for auction in auctions if auction.starts_at <= now),
+                    key=lambda auction: auction.ends_at
+                ))
+                self._upcoming = tuple(sorted(
+                    (auction for auction in auctions if auction.starts_at > now),
+                    key=lambda auction: auction.starts_at
+                )[:self.upcoming_limit])
+
+                # Próximo límite: el primer inicio o cierre posterior a ahora
+                boundaries = [auction.ends_at for auction in auctions]
+                boundaries += [auction.starts_at for auction in auctions if auction.starts_at > now]
+                self._expires_at = min(boundaries, default=datetime.max)
+
+auction_lists = AuctionListCache()
@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select
+from database.connection import session_scope
+from database.models import Auction
+from services.auction_book import auction_books
+from utils.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+START = "start"
+END = "end"
+
+class AuctionScheduler:
+    """Inicios y cierres de subastas en un min-heap de plazos.
+
+    Una sola tarea duerme exactamente hasta el plazo más próximo y lo
+    ejecuta: al inicio precarga el libro de pujas y al cierre llama a
+    end_auction. No consulta la tabla periódicamente; al arrancar carga
+    las subastas activas con una consulta y cierra las que vencieron
+    mientras el bot estaba apagado. clock se puede inyectar en pruebas.
+    """
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.now):
+        self.clock = clock
+        self._heap: List[Tuple[datetime, int, int, str]] = []
+        self._counter = itertools.count()
+        # (auction_id, tipo) -> plazo vigente; las entradas del heap que no coinciden se descartan
+        self._deadlines: Dict[Tuple[int, str], datetime] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner = BackgroundTask(self._run)
+
+        self.fired = 0
+
+    def schedule(self, auction_id: int, starts_at: datetime, ends_at: datetime):
+        """Programar (o reprogramar) inicio y cierre de una subasta"""
+        if starts_at and starts_at > self.clock():
+            self._push(auction_id, START, starts_at)
+        self._push(auction_id, END, ends_at)
+        self.wake()
+
+    def cancel(self, auction_id: int):
+        """Olvidar los plazos de una subasta"""
+        self._deadlines.pop((auction_id, START), None)
+        self._deadlines.pop((auction_id, END), None)
+
+    def next_deadline(self) -> Optional[datetime]:
+        """Plazo más próximo pendiente"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def wake(self):
+        """Revisar el heap ya (tras programar algo o si el reloj cambió)"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def start(self):
+        """Cargar plazos de las subastas activas e iniciar el programador"""
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Auction.id, Auction.starts_at, Auction.ends_at).where(Auction.is_active == True)
+            )
+            rows = result.all()
+
+        # Las vencidas durante la caída quedan con plazo pasado y se cierran en la primera vuelta
+        for auction_id, starts_at, ends_at in rows:
+            self.schedule(auction_id, starts_at, ends_at)
+        logger.info(f"⏰ Programador de subastas: {len(rows)} subastas activas")
+
+        if self._runner.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._runner.start()
+
+    async def stop(self):
+        """Detener el programador"""
+        await self._runner.stop()
+
+    async def run_due(self) -> int:
+        """Ejecutar todos los plazos vencidos según el reloj"""
+        count = 0
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > self.clock():
+                return count
+            when, _, auction_id, kind = heapq.heappop(self._heap)
+            del self._deadlines[(auction_id, kind)]
+            await self._fire(auction_id, kind)
+            count += 1
+
+    async def _run(self):
+        while True:
+            await self.run_due()
+            deadline = self.next_deadline()
+            timeout = max(0, (deadline - self.clock()).total_seconds()) if deadline else None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, auction_id: int, kind: str):
+        self.fired += 1
+        try:
+            if kind == START:
+                # Precargar el libro para que la primera puja no espere la reconstrucción
+                await auction_books.get(auction_id)
+            else:
+                from services.auction_service import AuctionService
+                result = await AuctionService().end_auction(auction_id)
+                if result["success"]:
+                    logger.info(f"🏁 Subasta {auction_id} cerrada: ganador {result['winner_id']}")
+        except Exception as e:
+            logger.error(f"❌ Error en plazo '{kind}' de la subasta {auction_id}: {e}")
+
+    def _push(self, auction_id: int, kind: str, when: datetime):
+        self._deadlines[(auction_id, kind)] = when
+        heapq.heappush(self._heap, (when, next(self._counter), auction_id, kind))
+
+    def _discard_stale(self):
+        while self._heap:
+            when, _, auction_id, kind = self._heap[0]
+            if self._deadlines.get((auction_id, kind)) == when:
+                return
+            heapq.heappop(self._heap)
+
+auction_scheduler = AuctionScheduler()
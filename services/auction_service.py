@@ -1,163 +1,180 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, desc
+from sqlalchemy import select, update, bindparam, desc, func
 from database.models import Auction, AuctionBid, User
-from config.database import get_db
-from datetime import datetime, timedelta
+from database.connection import session_scope, after_commit
+from services.user_cache import user_cache
+from services.auction_book import auction_books
+from services.auction_scheduler import auction_scheduler
+from services.auction_cache import auction_lists, AuctionSummary
+from services.auction_watchers import auction_watchers
+from dataclasses import replace
+from datetime import timedelta
 from typing import List, Optional
 
+# Espera antes de reintentar una liquidación que falló
+SETTLEMENT_RETRY_DELAY = timedelta(minutes=1)
+
 class AuctionService:
     
-    async def get_active_auctions(self) -> List[Auction]:
-        """Obtener subastas activas"""
-        async for db in get_db():
-            now = datetime.now()
-            result = await db.execute(
-                select(Auction)
-                .where(
-                    and_(
-                        Auction.is_active == True,
-                        Auction.starts_at <= now,
-                        Auction.ends_at > now
-                    )
-                )
-                .order_by(Auction.ends_at.asc())
-            )
-            return result.scalars().all()
+    async def get_active_auctions(self, db: AsyncSession = None) -> List[AuctionSummary]:
+        """Obtener subastas activas (en memoria hasta el próximo inicio o cierre)"""
+        auctions = await auction_lists.active()
+        return [self._with_live_price(auction) for auction in auctions]
 
-    async def get_upcoming_auctions(self) -> List[Auction]:
-        """Obtener subastas próximas"""
-        async for db in get_db():
-            now = datetime.now()
-            result = await db.execute(
-                select(Auction)
-                .where(
-                    and_(
-                        Auction.is_active == True,
-                        Auction.starts_at > now
-                    )
-                )
-                .order_by(Auction.starts_at.asc())
-                .limit(5)
-            )
-            return result.scalars().all()
+    async def get_upcoming_auctions(self, db: AsyncSession = None) -> List[AuctionSummary]:
+        """Obtener subastas próximas (en memoria hasta el próximo inicio o cierre)"""
+        return list(await auction_lists.upcoming())
 
-    async def place_bid(self, auction_id: int, user_id: int, amount: int) -> dict:
-        """Realizar puja en subasta"""
-        async for db in get_db():
+    async def get_auction(self, auction_id: int, db: AsyncSession = None) -> Optional[AuctionSummary]:
+        """Obtener una subasta (de memoria si está activa o próxima)"""
+        for auction in await auction_lists.active():
+            if auction.id == auction_id:
+                return self._with_live_price(auction)
+        for auction in await auction_lists.upcoming():
+            if auction.id == auction_id:
+                return auction
+        
+        async with session_scope(db) as db:
             auction = await db.get(Auction, auction_id)
-            user = await db.get(User, user_id)
-            
-            if not auction or not user:
-                return {"success": False, "message": "Subasta o usuario no encontrado"}
-            
-            now = datetime.now()
-            if now < auction.starts_at:
-                return {"success": False, "message": "La subasta aún no ha comenzado"}
-            
-            if now > auction.ends_at:
-                return {"success": False, "message": "La subasta ha terminado"}
-            
-            if amount <= auction.current_price:
-                return {"success": False, "message": f"La puja debe ser mayor a {auction.current_price} besitos"}
-            
-            if user.besitos < amount:
-                return {"success": False, "message": "Besitos insuficientes"}
-            
-            # Verificar si hay una puja anterior del mismo usuario
-            previous_bid_result = await db.execute(
-                select(AuctionBid)
-                .where(
-                    and_(
-                        AuctionBid.auction_id == auction_id,
-                        AuctionBid.user_id == user_id
-                    )
-                )
-                .order_by(desc(AuctionBid.created_at))
-                .limit(1)
-            )
-            previous_bid = previous_bid_result.scalar_one_or_none()
-            
-            # Devolver besitos de puja anterior
-            if previous_bid:
-                user.besitos += previous_bid.amount
-            
-            # Procesar nueva puja
-            user.besitos -= amount
-            auction.current_price = amount
-            
-            # Crear registro de puja
-            bid = AuctionBid(
-                auction_id=auction_id,
-                user_id=user_id,
-                amount=amount
-            )
-            db.add(bid)
-            
-            await db.commit()
-            
-            return {
-                "success": True,
-                "message": f"¡Puja realizada por {amount} besitos!",
-                "current_price": auction.current_price,
-                "remaining_besitos": user.besitos
-            }
+            return AuctionSummary.from_model(auction) if auction else None
+
+    def get_leader_id(self, auction_id: int) -> Optional[int]:
+        """Obtener quién va ganando una subasta en curso (del libro en vivo)"""
+        book = auction_books.peek(auction_id)
+        return book.leader_id if book else None
+
+    def _with_live_price(self, auction: AuctionSummary) -> AuctionSummary:
+        # El precio cambia con cada puja; el libro en vivo tiene el vigente
+        book = auction_books.peek(auction.id)
+        if book is None or book.current_price == auction.current_price:
+            return auction
+        return replace(auction, current_price=book.current_price)
 
-    async def end_auction(self, auction_id: int) -> dict:
-        """Finalizar subasta y determinar ganador"""
-        async for db in get_db():
+    async def place_bid(self, auction_id: int, user_id: int, amount: int, db: AsyncSession = None) -> dict:
+        """Realizar puja en subasta.
+
+        Se valida contra el libro en memoria de la subasta (los rechazos no
+        tocan la base de datos) y las pujas válidas se confirman por lotes
+        en su propia transacción, en orden de llegada.
+        """
+        return await auction_books.submit(auction_id, user_id, amount)
+
+    async def end_auction(self, auction_id: int, db: AsyncSession = None) -> dict:
+        """Finalizar subasta y determinar ganador.
+
+        La liquidación es por conjuntos y en una sola transacción: una
+        agregación de lo retenido a cada postor (su última puja), un UPDATE
+        masivo de users y un INSERT masivo en el libro mayor. Cerrarla dos
+        veces no devuelve besitos dos veces.
+        """
+        # Cerrar el libro primero: ninguna puja puede confirmarse después del cierre
+        auction_scheduler.cancel(auction_id)
+        await auction_books.close(auction_id)
+        
+        try:
+            return await self._settle_auction(auction_id, db)
+        except Exception:
+            # La liquidación se deshizo y la subasta sigue activa en la base
+            await self._reopen_auction(auction_id)
+            raise
+
+    async def _reopen_auction(self, auction_id: int):
+        """Volver a aceptar pujas y reprogramar el cierre de una subasta sin liquidar"""
+        auction_books.reopen(auction_id)
+        async with session_scope() as db:
             auction = await db.get(Auction, auction_id)
-            if not auction:
-                return {"success": False, "message": "Subasta no encontrada"}
-            
-            # Obtener la puja más alta
-            highest_bid_result = await db.execute(
-                select(AuctionBid)
-                .where(AuctionBid.auction_id == auction_id)
-                .order_by(desc(AuctionBid.amount))
-                .limit(1)
+            if not auction or not auction.is_active:
+                return
+            starts_at, ends_at = auction.starts_at, auction.ends_at
+        
+        # Si ya venció, el libro sigue rechazando pujas y el cierre se reintenta más tarde
+        retry_at = auction_scheduler.clock() + SETTLEMENT_RETRY_DELAY
+        auction_scheduler.schedule(auction_id, starts_at, max(ends_at, retry_at))
+        await auction_books.get(auction_id)
+
+    async def _settle_auction(self, auction_id: int, db: AsyncSession = None) -> dict:
+        async with session_scope(db) as db:
+            result = await db.execute(
+                update(Auction)
+                .where(Auction.id == auction_id, Auction.is_active == True)
+                .values(is_active=False)
+                .returning(Auction.title)
+                .execution_options(synchronize_session=False)
             )
-            highest_bid = highest_bid_result.scalar_one_or_none()
+            title = result.scalar_one_or_none()
+            if title is None:
+                exists = await db.get(Auction, auction_id)
+                return {"success": False, "message": "Subasta ya finalizada" if exists else "Subasta no encontrada"}
+            after_commit(db, auction_lists.invalidate)
+            after_commit(db, auction_watchers.notify, auction_id, True)
             
-            if highest_bid:
-                auction.winner_id = highest_bid.user_id
-                
-                # Devolver besitos a todos los perdedores
-                all_bids_result = await db.execute(
-                    select(AuctionBid)
-                    .where(
-                        and_(
-                            AuctionBid.auction_id == auction_id,
-                            AuctionBid.user_id != highest_bid.user_id
-                        )
-                    )
+            # Lo retenido a cada postor es su última puja, que siempre es su mayor puja
+            held_result = await db.execute(self.held_bids_query(auction_id))
+            held = dict(held_result.all())
+            winner_id = max(held, key=held.get) if held else None
+            winning_amount = held.get(winner_id, 0)
+            
+            if held:
+                # Perdedores recuperan lo retenido; al ganador se le cobra lo que ya tenía retenido
+                users = User.__table__
+                await db.execute(
+                    update(users)
+                    .where(users.c.id == bindparam("user_id"))
+                    .values(
+                        besitos=users.c.besitos + bindparam("refund"),
+                        total_spent=users.c.total_spent + bindparam("spent")
+                    ),
+                    [
+                        {
+                            "user_id": user_id,
+                            "refund": 0 if user_id == winner_id else amount,
+                            "spent": amount if user_id == winner_id else 0
+                        }
+                        for user_id, amount in held.items()
+                    ]
                 )
-                losing_bids = all_bids_result.scalars().all()
-                
-                for bid in losing_bids:
-                    user = await db.get(User, bid.user_id)
-                    if user:
-                        user.besitos += bid.amount
                 
-                # Crear transacción para el ganador
+                # Cada retención se libera con un reembolso; la del ganador se
+                # convierte en el gasto de la subasta
+                entries = [
+                    {
+                        "user_id": user_id,
+                        "type": "refund",
+                        "amount": amount,
+                        "description": f"Reembolso subasta: {title}",
+                        "reference_id": str(auction_id)
+                    }
+                    for user_id, amount in held.items()
+                ]
+                entries.append({
+                    "user_id": winner_id,
+                    "type": "spend",
+                    "amount": winning_amount,
+                    "description": f"Ganador subasta: {title}",
+                    "reference_id": str(auction_id)
+                })
                 from services.economy_service import EconomyService
-                economy_service = EconomyService()
-                await economy_service.create_transaction(
-                    highest_bid.user_id, "spend", highest_bid.amount,
-                    f"Ganador subasta: {auction.title}", str(auction.id)
+                await EconomyService().record_transactions(entries, db)
+                
+                await db.execute(
+                    update(Auction)
+                    .where(Auction.id == auction_id)
+                    .values(winner_id=winner_id, current_price=winning_amount)
+                    .execution_options(synchronize_session=False)
                 )
-            
-            auction.is_active = False
-            await db.commit()
+                for user_id in held:
+                    after_commit(db, user_cache.invalidate_user, user_id)
             
             return {
                 "success": True,
-                "winner_id": auction.winner_id,
-                "winning_amount": highest_bid.amount if highest_bid else 0
+                "winner_id": winner_id,
+                "winning_amount": winning_amount,
+                "refunded_bidders": len(held) - 1 if held else 0
             }
 
-    async def create_auction(self, auction_data: dict) -> Auction:
+    async def create_auction(self, auction_data: dict, db: AsyncSession = None) -> Auction:
         """Crear nueva subasta"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             auction = Auction(
                 title=auction_data["title"],
                 description=auction_data.get("description", ""),
@@ -167,13 +184,15 @@ class AuctionService:
                 ends_at=auction_data["ends_at"]
             )
             db.add(auction)
-            await db.commit()
+            await db.flush()
             await db.refresh(auction)
+            after_commit(db, auction_scheduler.schedule, auction.id, auction.starts_at, auction.ends_at)
+            after_commit(db, auction_lists.invalidate)
             return auction
 
-    async def get_user_bids(self, user_id: int) -> List[AuctionBid]:
+    async def get_user_bids(self, user_id: int, db: AsyncSession = None) -> List[AuctionBid]:
         """Obtener pujas del usuario"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             result = await db.execute(
                 select(AuctionBid)
                 .where(AuctionBid.user_id == user_id)
@@ -181,13 +200,26 @@ class AuctionService:
             )
             return result.scalars().all()
 
-    async def get_auction_bids(self, auction_id: int) -> List[AuctionBid]:
-        """Obtener todas las pujas de una subasta"""
-        async for db in get_db():
-            result = await db.execute(
-                select(AuctionBid)
-                .where(AuctionBid.auction_id == auction_id)
-                .order_by(desc(AuctionBid.amount))
-            )
+    async def get_auction_bids(self, auction_id: int, limit: int = None, db: AsyncSession = None) -> List[AuctionBid]:
+        """Obtener las pujas de una subasta (todas, o las limit más altas)"""
+        async with session_scope(db) as db:
+            result = await db.execute(self.auction_bids_query(auction_id, limit))
             return result.scalars().all()
+
+    def auction_bids_query(self, auction_id: int, limit: int = None):
+        """Consulta de las pujas de una subasta, de mayor a menor"""
+        query = (
+            select(AuctionBid)
+            .where(AuctionBid.auction_id == auction_id)
+            .order_by(desc(AuctionBid.amount))
+        )
+        return query.limit(limit) if limit else query
+
+    def held_bids_query(self, auction_id: int):
+        """Consulta de lo retenido a cada postor de una subasta (su mayor puja)"""
+        return (
+            select(AuctionBid.user_id, func.max(AuctionBid.amount))
+            .where(AuctionBid.auction_id == auction_id)
+            .group_by(AuctionBid.user_id)
+        )
               
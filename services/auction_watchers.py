@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from config.settings import Settings
+from utils.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# (chat_id, message_id) de un mensaje de subasta abierto
+MessageKey = Tuple[int, int]
+LoadFunc = Callable[[int], Awaitable[Any]]
+RenderFunc = Callable[[Any, int], Tuple[str, Any]]
+
+@dataclass
+class Watcher:
+    """Mensaje de subasta abierto por un usuario"""
+    user_id: int
+    last_seen: float
+    shown_text: Optional[str] = None
+
+class AuctionWatchers:
+    """Mensajes de subasta abiertos que se actualizan con cada puja.
+
+    Cada puja confirmada solo marca la subasta como pendiente; una tarea
+    revisa las pendientes cada interval segundos y edita cada mensaje como
+    mucho una vez por vuelta (las ráfagas de pujas se agrupan), espaciando
+    las ediciones para respetar los límites de Telegram. Un mensaje sin
+    actividad durante ttl segundos deja de actualizarse.
+    """
+
+    def __init__(self, interval: float = 3, ttl: float = 300, edits_per_second: float = 20):
+        self.interval = interval
+        self.ttl = ttl
+        self.edits_per_second = edits_per_second
+        self._watchers: Dict[int, Dict[MessageKey, Watcher]] = {}
+        self._dirty: Set[int] = set()
+        # Subastas cerradas: tras la última edición se olvidan sus mensajes
+        self._final: Set[int] = set()
+        self._load: Optional[LoadFunc] = None
+        self._render: Optional[RenderFunc] = None
+        self._bot: Optional[Bot] = None
+        self._updater = PeriodicTask(self.flush, interval, "Error actualizando mensajes de subastas")
+
+        self.edits = 0
+        self.expired = 0
+
+    def configure(self, load: LoadFunc, render: RenderFunc):
+        """Definir cómo se obtiene una subasta y cómo se dibuja para un usuario"""
+        self._load = load
+        self._render = render
+
+    def watch(self, auction_id: int, chat_id: int, message_id: int, user_id: int, shown_text: str = None):
+        """Registrar (o renovar) un mensaje de subasta abierto"""
+        watchers = self._watchers.setdefault(auction_id, {})
+        watcher = watchers.get((chat_id, message_id))
+        if watcher is None:
+            watchers[(chat_id, message_id)] = Watcher(user_id, time.monotonic(), shown_text)
+            return
+        watcher.last_seen = time.monotonic()
+        if shown_text is not None:
+            watcher.shown_text = shown_text
+
+    def notify(self, auction_id: int, final: bool = False):
+        """Marcar que la subasta cambió (precio, líder o estado)"""
+        if auction_id not in self._watchers:
+            return
+        self._dirty.add(auction_id)
+        if final:
+            self._final.add(auction_id)
+
+    def count(self, auction_id: int = None) -> int:
+        """Mensajes registrados (de una subasta o en total)"""
+        if auction_id is not None:
+            return len(self._watchers.get(auction_id, {}))
+        return sum(len(watchers) for watchers in self._watchers.values())
+
+    async def start(self, bot: Bot):
+        """Iniciar las actualizaciones en vivo"""
+        self._bot = bot
+        self._updater.start()
+
+    async def stop(self):
+        """Detener las actualizaciones en vivo"""
+        await self._updater.stop()
+
+    async def flush(self):
+        """Editar los mensajes de las subastas que cambiaron"""
+        self._expire()
+        dirty, self._dirty = self._dirty, set()
+        for auction_id in dirty:
+            done = False
+            try:
+                done = await self._update_auction(auction_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Error actualizando mensajes de la subasta {auction_id}: {e}")
+            # Una subasta cerrada se olvida solo cuando todos sus mensajes muestran el cierre
+            if done and auction_id in self._final:
+                self._final.discard(auction_id)
+                self._watchers.pop(auction_id, None)
+
+    async def _update_auction(self, auction_id: int) -> bool:
+        """Editar los mensajes de una subasta; False si quedaron ediciones pendientes"""
+        auction = await self._load(auction_id)
+        if auction is None:
+            self._watchers.pop(auction_id, None)
+            return True
+
+        for (chat_id, message_id), watcher in list(self._watchers.get(auction_id, {}).items()):
+            text, keyboard = self._render(auction, watcher.user_id)
+            if text == watcher.shown_text:
+                continue
+            try:
+                await self._bot.edit_message_text(
+                    text,
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    reply_markup=keyboard,
+                    parse_mode="Markdown"
+                )
+                watcher.shown_text = text
+                self.edits += 1
+            except TelegramRetryAfter as e:
+                # Se reintenta en la próxima vuelta
+                self._dirty.add(auction_id)
+                await asyncio.sleep(e.retry_after)
+                return False
+            except (TelegramBadRequest, TelegramForbiddenError) as e:
+                if "not modified" in str(e):
+                    watcher.shown_text = text
+                else:
+                    # Mensaje borrado, demasiado antiguo o bot bloqueado
+                    self._watchers.get(auction_id, {}).pop((chat_id, message_id), None)
+            await asyncio.sleep(1 / self.edits_per_second)
+        return True
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for auction_id, watchers in list(self._watchers.items()):
+            for key, watcher in list(watchers.items()):
+                if watcher.last_seen < cutoff:
+                    del watchers[key]
+                    self.expired += 1
+            if not watchers:
+                del self._watchers[auction_id]
+                self._dirty.discard(auction_id)
+                self._final.discard(auction_id)
+
+auction_watchers = AuctionWatchers(
+    interval=Settings.AUCTION_WATCH_INTERVAL,
+    ttl=Settings.AUCTION_WATCH_TTL,
+    edits_per_second=Settings.AUCTION_EDITS_PER_SECOND
+)
@@ -1,28 +1,158 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from database.models import User, Transaction, Purchase, StoreItem
-from config.database import get_db
+from sqlalchemy import select, func, update, insert, delete, case, tuple_, type_coerce, Date
+from database.models import User, Transaction, Purchase, StoreItem, UserEconomyDaily
+from database.connection import session_scope, after_commit, upsert
+from services.user_cache import user_cache
+from services.leaderboard_service import leaderboards
+from utils.helpers import encode_cursor, decode_cursor
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 class EconomyService:
     
-    async def create_transaction(self, user_id: int, transaction_type: str, amount: int, description: str = "", reference_id: str = None):
+    async def change_balance(self, user_id: int, delta: int, transaction_type: str, description: str = "", reference_id: str = None, db: AsyncSession = None) -> Optional[int]:
+        """Mover besitos y registrar la transacción en un solo commit.
+
+        El saldo se actualiza en SQL (besitos = besitos + delta); los débitos
+        solo se aplican si el saldo alcanza. Devuelve el saldo resultante, o
+        None si el usuario no existe o no tiene besitos suficientes.
+        """
+        values = {"besitos": User.besitos + delta}
+        if transaction_type == "earn":
+            values["total_earned"] = User.total_earned + delta
+        elif transaction_type == "spend":
+            values["total_spent"] = User.total_spent - delta
+        
+        query = update(User).where(User.id == user_id)
+        if delta < 0:
+            query = query.where(User.besitos >= -delta)
+        
+        async with session_scope(db) as db:
+            result = await db.execute(
+                query.values(**values).returning(User.besitos, User.is_vip)
+            )
+            row = result.one_or_none()
+            if row is None:
+                return None
+            balance, is_vip = row
+            
+            await self.create_transaction(
+                user_id, transaction_type, abs(delta), description, reference_id, db=db
+            )
+            after_commit(db, user_cache.invalidate_user, user_id)
+            if transaction_type == "earn":
+                after_commit(db, leaderboards.record, "besitos", user_id, delta, is_vip)
+            return balance
+
+    async def create_transaction(self, user_id: int, transaction_type: str, amount: int, description: str = "", reference_id: str = None, db: AsyncSession = None):
         """Crear registro de transacción"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             transaction = Transaction(
                 user_id=user_id,
                 type=transaction_type,
                 amount=amount,
                 description=description,
-                reference_id=reference_id
+                reference_id=reference_id,
+                created_at=datetime.now()
             )
             db.add(transaction)
-            await db.commit()
+            await self._update_daily_rollups([{
+                "user_id": user_id,
+                "type": transaction_type,
+                "amount": amount,
+                "created_at": transaction.created_at
+            }], db)
             return transaction
 
+    async def record_transactions(self, entries: List[dict], db: AsyncSession = None):
+        """Registrar varias transacciones con un INSERT masivo"""
+        if not entries:
+            return
+        
+        now = datetime.now()
+        for entry in entries:
+            entry.setdefault("created_at", now)
+        
+        async with session_scope(db) as db:
+            await db.execute(insert(Transaction), entries)
+            await self._update_daily_rollups(entries, db)
+
+    async def _update_daily_rollups(self, entries: List[dict], db: AsyncSession):
+        """Sumar transacciones al resumen diario por usuario (misma transacción que el libro)"""
+        rollups = {}
+        for entry in entries:
+            key = (entry["user_id"], entry["created_at"].date())
+            rollup = rollups.setdefault(key, {
+                "user_id": key[0], "day": key[1], "earned": 0, "spent": 0, "transactions": 0
+            })
+            if entry["type"] == "earn":
+                rollup["earned"] += entry["amount"]
+            elif entry["type"] == "spend":
+                rollup["spent"] += entry["amount"]
+            rollup["transactions"] += 1
+        
+        stmt = upsert(db, UserEconomyDaily)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={
+                "earned": UserEconomyDaily.earned + stmt.excluded.earned,
+                "spent": UserEconomyDaily.spent + stmt.excluded.spent,
+                "transactions": UserEconomyDaily.transactions + stmt.excluded.transactions
+            }
+        )
+        await db.execute(stmt, list(rollups.values()))
+
+    async def rebuild_daily_rollups(self, chunk_size: int = 500) -> int:
+        """Recalcular el resumen diario desde el libro mayor, por tandas de usuarios"""
+        day = type_coerce(func.date(Transaction.created_at), Date)
+        last_id = 0
+        rebuilt = 0
+        
+        while True:
+            # Cada tanda de usuarios se recalcula y confirma por separado
+            async with session_scope() as db:
+                result = await db.execute(
+                    select(User.id)
+                    .where(User.id > last_id)
+                    .order_by(User.id)
+                    .limit(chunk_size)
+                )
+                user_ids = result.scalars().all()
+                if not user_ids:
+                    return rebuilt
+                first_id, last_id = user_ids[0], user_ids[-1]
+                
+                await db.execute(
+                    delete(UserEconomyDaily)
+                    .where(UserEconomyDaily.user_id.between(first_id, last_id))
+                )
+                result = await db.execute(
+                    select(
+                        Transaction.user_id,
+                        day,
+                        func.sum(case((Transaction.type == "earn", Transaction.amount), else_=0)),
+                        func.sum(case((Transaction.type == "spend", Transaction.amount), else_=0)),
+                        func.count(Transaction.id)
+                    )
+                    .where(Transaction.user_id.between(first_id, last_id))
+                    .group_by(Transaction.user_id, day)
+                )
+                rollups = [
+                    {
+                        "user_id": user_id,
+                        "day": rollup_day,
+                        "earned": earned or 0,
+                        "spent": spent or 0,
+                        "transactions": transactions
+                    }
+                    for user_id, rollup_day, earned, spent, transactions in result
+                ]
+                if rollups:
+                    await db.execute(insert(UserEconomyDaily), rollups)
+                rebuilt += len(rollups)
+
     async def track_activity(self, user_id: int, activity_type: str):
-        """Rastrear actividad del usuario para recompensas"""
+        """Rastrear actividad del usuario para recompensas (se pagan por ventanas)"""
         activity_rewards = {
             "Message": 1,  # 1 besito por mensaje
             "CallbackQuery": 2,  # 2 besitos por interacción
@@ -32,11 +162,10 @@ class EconomyService:
         
         reward = activity_rewards.get(activity_type, 0)
         if reward > 0:
-            from services.user_service import UserService
-            user_service = UserService()
-            await user_service.add_besitos(user_id, reward, f"Actividad: {activity_type}")
+            from services.activity_rewards import activity_rewards as accumulator
+            accumulator.add(user_id, reward, activity_type)
 
-    async def calculate_purchase_cashback(self, user_id: int, purchase_amount: float) -> int:
+    async def calculate_purchase_cashback(self, user_id: int, purchase_amount: float, db: AsyncSession = None) -> int:
         """Calcular cashback por compra externa"""
         from config.settings import Settings
         settings = Settings()
@@ -44,28 +173,24 @@ class EconomyService:
         cashback_besitos = int(purchase_amount * settings.PURCHASE_CASHBACK_RATE)
         
         # Bonus por nivel VIP
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user and user.is_vip:
                 cashback_besitos = int(cashback_besitos * 1.5)  # 50% bonus para VIP
         
         return cashback_besitos
 
-    async def process_external_purchase(self, user_id: int, purchase_data: dict) -> dict:
+    async def process_external_purchase(self, user_id: int, purchase_data: dict, db: AsyncSession = None) -> dict:
         """Procesar compra externa y otorgar cashback"""
         amount = purchase_data.get("amount", 0)
         description = purchase_data.get("description", "Compra externa")
         
-        cashback = await self.calculate_purchase_cashback(user_id, amount)
+        cashback = await self.calculate_purchase_cashback(user_id, amount, db=db)
         
         if cashback > 0:
-            from services.user_service import UserService
-            user_service = UserService()
-            await user_service.add_besitos(user_id, cashback, f"Cashback: {description}")
-            
-            await self.create_transaction(
-                user_id, "earn", cashback, f"Cashback: {description}", 
-                purchase_data.get("reference_id")
+            await self.change_balance(
+                user_id, cashback, "earn", f"Cashback: {description}", 
+                purchase_data.get("reference_id"), db=db
             )
         
         return {
@@ -74,35 +199,17 @@ class EconomyService:
             "message": f"¡Recibiste {cashback} besitos de cashback!"
         }
 
-    async def get_user_economy_stats(self, user_id: int) -> dict:
+    async def get_user_economy_stats(self, user_id: int, db: AsyncSession = None) -> dict:
         """Obtener estadísticas económicas del usuario"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if not user:
                 return {}
             
-            # Transacciones del último mes
-            last_month = datetime.now() - timedelta(days=30)
-            
-            earned_result = await db.execute(
-                select(func.sum(Transaction.amount))
-                .where(
-                    Transaction.user_id == user_id,
-                    Transaction.type == "earn",
-                    Transaction.created_at >= last_month
-                )
-            )
-            earned_month = earned_result.scalar() or 0
-            
-            spent_result = await db.execute(
-                select(func.sum(Transaction.amount))
-                .where(
-                    Transaction.user_id == user_id,
-                    Transaction.type == "spend",
-                    Transaction.created_at >= last_month
-                )
-            )
-            spent_month = spent_result.scalar() or 0
+            result = await db.execute(self.economy_stats_query(user_id))
+            earned_month, spent_month = result.one()
+            earned_month = earned_month or 0
+            spent_month = spent_month or 0
             
             return {
                 "current_besitos": user.besitos,
@@ -113,18 +220,74 @@ class EconomyService:
                 "net_worth": user.total_earned - user.total_spent
             }
 
-    async def get_transaction_history(self, user_id: int, limit: int = 20) -> List[Transaction]:
-        """Obtener historial de transacciones"""
-        async for db in get_db():
-            result = await db.execute(
-                select(Transaction)
-                .where(Transaction.user_id == user_id)
-                .order_by(Transaction.created_at.desc())
-                .limit(limit)
+    def economy_stats_query(self, user_id: int):
+        """Consulta de lo ganado y gastado en los últimos 30 días (como mucho 30 filas del resumen diario)"""
+        last_month = datetime.now().date() - timedelta(days=29)
+        return (
+            select(func.sum(UserEconomyDaily.earned), func.sum(UserEconomyDaily.spent))
+            .where(
+                UserEconomyDaily.user_id == user_id,
+                UserEconomyDaily.day >= last_month
             )
+        )
+
+    async def get_transaction_history(self, user_id: int, limit: int = 20, db: AsyncSession = None) -> List[Transaction]:
+        """Obtener historial de transacciones"""
+        async with session_scope(db) as db:
+            result = await db.execute(self.transaction_history_query(user_id, limit))
             return result.scalars().all()
 
-    async def create_referral_bonus(self, referrer_id: int, referred_id: int) -> dict:
+    def transaction_history_query(self, user_id: int, limit: int = 20):
+        """Consulta de las últimas transacciones del usuario"""
+        return (
+            select(Transaction)
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.created_at.desc())
+            .limit(limit)
+        )
+
+    async def get_transaction_page(self, user_id: int, cursor: str = None, direction: str = "next", limit: int = 10, db: AsyncSession = None) -> dict:
+        """Obtener una página del historial paginando por cursor sobre (created_at, id).
+
+        direction="next" trae movimientos anteriores al cursor y "prev" los
+        posteriores; cada página cuesta lo mismo sin importar su profundidad.
+        """
+        newer = cursor is not None and direction == "prev"
+        
+        async with session_scope(db) as db:
+            result = await db.execute(self.transaction_page_query(user_id, cursor, direction, limit))
+            transactions = result.scalars().all()
+        
+        has_more = len(transactions) > limit
+        transactions = transactions[:limit]
+        if newer:
+            transactions.reverse()
+        has_older = True if newer else has_more
+        has_newer = has_more if newer else cursor is not None
+        
+        return {
+            "transactions": transactions,
+            "next_cursor": encode_cursor(transactions[-1].created_at, transactions[-1].id) if transactions and has_older else None,
+            "prev_cursor": encode_cursor(transactions[0].created_at, transactions[0].id) if transactions and has_newer else None
+        }
+
+    def transaction_page_query(self, user_id: int, cursor: str = None, direction: str = "next", limit: int = 10):
+        """Consulta de una página del historial (trae una fila de más para saber si hay otra página)"""
+        newer = cursor is not None and direction == "prev"
+        position = tuple_(Transaction.created_at, Transaction.id)
+        
+        query = select(Transaction).where(Transaction.user_id == user_id)
+        if cursor:
+            created_at, transaction_id = decode_cursor(cursor)
+            boundary = tuple_(created_at, transaction_id)
+            query = query.where(position > boundary if newer else position < boundary)
+        if newer:
+            query = query.order_by(Transaction.created_at.asc(), Transaction.id.asc())
+        else:
+            query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        return query.limit(limit + 1)
+
+    async def create_referral_bonus(self, referrer_id: int, referred_id: int, db: AsyncSession = None) -> dict:
         """Crear bonus por referido"""
         bonus_amount = 200  # 200 besitos por referido
         
@@ -134,13 +297,13 @@ class EconomyService:
         # Bonus para quien refiere
         await user_service.add_besitos(
             referrer_id, bonus_amount, 
-            f"Bonus por referir usuario {referred_id}"
+            f"Bonus por referir usuario {referred_id}", db=db
         )
         
         # Bonus para el referido
         await user_service.add_besitos(
             referred_id, bonus_amount // 2, 
-            "Bonus de bienvenida por referido"
+            "Bonus de bienvenida por referido", db=db
         )
         
         return {
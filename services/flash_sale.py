@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.settings import Settings
+from database.connection import session_scope, savepoint
+
+logger = logging.getLogger(__name__)
+
+SOLD_OUT = {"success": False, "message": "Item agotado"}
+SALE_ENDED = {"success": False, "message": "La venta flash terminó, inténtalo de nuevo"}
+
+PurchaseFunc = Callable[[int, int, AsyncSession], Awaitable[dict]]
+
+class FlashSale:
+    """Cola de compras de un item limitado con un único consumidor"""
+
+    def __init__(self, item_id: int, stock: int, purchase: PurchaseFunc, batch_size: int):
+        self.item_id = item_id
+        self.remaining = stock
+        self.purchase = purchase
+        self.batch_size = batch_size
+        self.queue: "asyncio.Queue[Tuple[int, asyncio.Future]]" = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+        self.sold = 0
+        self.rejected = 0
+        self.batches = 0
+
+    async def submit(self, user_id: int) -> dict:
+        """Encolar una compra y esperar su resultado"""
+        if self.remaining <= 0:
+            # Agotado: se rechaza en memoria, sin tocar la base de datos
+            self.rejected += 1
+            return SOLD_OUT
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((user_id, future))
+        return await future
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await asyncio.shield(self._process(batch))
+
+    async def _process(self, batch: List[Tuple[int, asyncio.Future]]):
+        results = []
+        sold = 0
+        try:
+            # Todo el lote en un solo commit, en orden de llegada
+            async with session_scope() as db:
+                for user_id, future in batch:
+                    if self.remaining - sold <= 0:
+                        results.append(SOLD_OUT)
+                        continue
+                    # Un error en una compra solo afecta a ese comprador
+                    try:
+                        async with savepoint(db):
+                            result = await self.purchase(user_id, self.item_id, db)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Error en compra flash del item {self.item_id} (usuario {user_id}): {e}")
+                        future.set_exception(e)
+                        results.append(None)
+                        continue
+                    if result["success"]:
+                        sold += 1
+                    results.append(result)
+        except Exception as e:
+            logger.warning(f"⚠️ Error en lote de venta flash del item {self.item_id}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.remaining -= sold
+        self.sold += sold
+        self.rejected += len(batch) - sold
+        self.batches += 1
+        for (_, future), result in zip(batch, results):
+            if result is not None and not future.done():
+                future.set_result(result)
+
+class FlashSaleManager:
+    """Ventas flash activas por item.
+
+    Con una venta activa las compras de ese item no compiten por el lock de
+    escritura: se encolan y un único consumidor las procesa por lotes en
+    orden de llegada. Cuando se acaba el stock, el resto de compradores se
+    rechaza en memoria.
+    """
+
+    def __init__(self, batch_size: int = 50):
+        self.batch_size = batch_size
+        self._sales: Dict[int, FlashSale] = {}
+
+    def is_active(self, item_id: int) -> bool:
+        return item_id in self._sales
+
+    def start(self, item_id: int, stock: int, purchase: PurchaseFunc) -> FlashSale:
+        """Activar venta flash para un item con stock limitado"""
+        sale = self._sales.get(item_id)
+        if sale:
+            return sale
+
+        sale = FlashSale(item_id, stock, purchase, self.batch_size)
+        sale.task = asyncio.get_running_loop().create_task(sale.run())
+        self._sales[item_id] = sale
+        logger.info(f"⚡ Venta flash iniciada para item {item_id} ({stock} unidades)")
+        return sale
+
+    async def submit(self, item_id: int, user_id: int) -> Optional[dict]:
+        """Comprar a través de la venta flash, o None si el item no tiene una activa"""
+        sale = self._sales.get(item_id)
+        if sale is None:
+            return None
+        return await sale.submit(user_id)
+
+    async def stop(self, item_id: int) -> Optional[dict]:
+        """Terminar la venta flash; las compras aún en cola se rechazan"""
+        sale = self._sales.pop(item_id, None)
+        if sale is None:
+            return None
+
+        sale.task.cancel()
+        try:
+            await sale.task
+        except asyncio.CancelledError:
+            pass
+
+        while not sale.queue.empty():
+            _, future = sale.queue.get_nowait()
+            if not future.done():
+                future.set_result(SALE_ENDED)
+        return self._stats(sale)
+
+    async def stop_all(self):
+        """Terminar todas las ventas flash (al apagar)"""
+        for item_id in list(self._sales):
+            await self.stop(item_id)
+
+    def stats(self) -> Dict[int, dict]:
+        """Obtener métricas de las ventas activas"""
+        return {item_id: self._stats(sale) for item_id, sale in self._sales.items()}
+
+    def _stats(self, sale: FlashSale) -> dict:
+        return {
+            "remaining": sale.remaining,
+            "queue_depth": sale.queue.qsize(),
+            "sold": sale.sold,
+            "rejected": sale.rejected,
+            "batches": sale.batches
+        }
+
+flash_sales = FlashSaleManager(batch_size=Settings.FLASH_SALE_BATCH_SIZE)
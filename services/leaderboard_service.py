@@ -0,0 +1,239 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.settings import Settings
+from database.connection import session_scope, upsert
+from database.models import LeaderboardScore, User
+from utils.sorted_index import SortedIndex
+from utils.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("xp", "besitos")
+PERIODS = ("weekly", "monthly")
+SEGMENTS = ("all", "vip")
+
+def period_start(period: str, today: date = None) -> date:
+    """Inicio del periodo (lunes de la semana o día 1 del mes)"""
+    today = today or datetime.now().date()
+    if period == "weekly":
+        return today - timedelta(days=today.weekday())
+    if period == "monthly":
+        return today.replace(day=1)
+    raise ValueError(f"Periodo no válido: {period}")
+
+class LeaderboardService:
+    """Rankings por periodo (semanal/mensual) y segmento (todos/VIP).
+
+    Cada tablero es un SortedIndex en memoria que se actualiza con cada
+    evento de XP o de besitos ganados, así que leer un top-k cuesta O(k) y
+    nunca recorre users ni transactions. Los incrementos se acumulan y se
+    persisten por lotes en leaderboard_scores (un UPSERT por volcado); al
+    arrancar los tableros del periodo actual se siembran desde esa tabla.
+    """
+
+    def __init__(self, flush_interval: float = 30):
+        self.flush_interval = flush_interval
+        # (metric, period, period_start, segment) -> tablero
+        self._boards: Dict[tuple, SortedIndex] = {}
+        # (metric, period, period_start, user_id) -> incremento sin persistir
+        self._pending: Dict[tuple, int] = defaultdict(int)
+        self._vip_ids = set()
+        self._ready = False
+        self._lock: Optional[asyncio.Lock] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self._flusher = PeriodicTask(self.flush, flush_interval, "Error persistiendo rankings por periodo")
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def record(self, metric: str, user_id: int, amount: int, is_vip: bool = None):
+        """Sumar XP o besitos ganados al periodo actual del usuario"""
+        if amount <= 0:
+            return
+        if is_vip is not None:
+            self.set_vip(user_id, is_vip)
+
+        today = datetime.now().date()
+        for period in PERIODS:
+            start = period_start(period, today)
+            self._pending[(metric, period, start, user_id)] += amount
+            if self._ready:
+                self._add(metric, period, start, user_id, amount)
+        self._flusher.start()
+
+    def set_vip(self, user_id: int, is_vip: bool):
+        """Mover al usuario dentro o fuera de los tableros VIP"""
+        if bool(is_vip) == (user_id in self._vip_ids):
+            return
+        if is_vip:
+            self._vip_ids.add(user_id)
+        else:
+            self._vip_ids.discard(user_id)
+        if not self._ready:
+            return
+
+        for (metric, period, start, segment), board in list(self._boards.items()):
+            if segment != "all" or user_id not in board:
+                continue
+            vip_board = self._board(metric, period, start, "vip")
+            if is_vip:
+                vip_board.upsert(user_id, board.score(user_id))
+            else:
+                vip_board.remove(user_id)
+
+    def top(self, metric: str, period: str, segment: str = "all", limit: int = 10) -> Optional[List[Tuple[int, int]]]:
+        """Mejores (user_id, puntuación) del periodo actual, o None si está frío"""
+        if not self._ensure_ready():
+            return None
+        board = self._boards.get(self._key(metric, period, segment))
+        if not board:
+            return []
+        return [(user_id, score[0]) for user_id, score in board.top(limit)]
+
+    def rank(self, metric: str, period: str, user_id: int, segment: str = "all") -> Optional[int]:
+        """Posición del usuario en el periodo actual, o None si no figura"""
+        if not self._ensure_ready():
+            return None
+        board = self._boards.get(self._key(metric, period, segment))
+        return board.rank(user_id) if board else None
+
+    async def load(self, db: AsyncSession = None):
+        """Sembrar los tableros del periodo actual desde leaderboard_scores"""
+        async with self._get_lock():
+            today = datetime.now().date()
+            starts = {period: period_start(period, today) for period in PERIODS}
+            async with session_scope(db) as db:
+                result = await db.execute(
+                    select(
+                        LeaderboardScore.metric,
+                        LeaderboardScore.period,
+                        LeaderboardScore.period_start,
+                        LeaderboardScore.user_id,
+                        LeaderboardScore.score,
+                        User.is_vip
+                    )
+                    .join(User, User.id == LeaderboardScore.user_id)
+                    .where(or_(*(
+                        and_(LeaderboardScore.period == period, LeaderboardScore.period_start == start)
+                        for period, start in starts.items()
+                    )))
+                )
+                rows = result.all()
+
+            scores = defaultdict(int)
+            for metric, period, start, user_id, score, is_vip in rows:
+                scores[(metric, period, start, user_id)] += score or 0
+                if is_vip:
+                    self._vip_ids.add(user_id)
+            # Lo aún no persistido también cuenta
+            for key, amount in self._pending.items():
+                scores[key] += amount
+
+            self._boards = {}
+            self._bulk_load(
+                (key, score) for key, score in scores.items()
+                if starts.get(key[1]) == key[2]
+            )
+            self._ready = True
+            logger.info(f"🏆 Rankings por periodo sembrados con {len(scores)} entradas")
+
+    async def flush(self) -> int:
+        """Persistir los incrementos pendientes con un único UPSERT"""
+        if not self._pending:
+            return 0
+
+        async with self._get_lock():
+            pending, self._pending = self._pending, defaultdict(int)
+            try:
+                async with session_scope() as db:
+                    stmt = upsert(db, LeaderboardScore)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=["metric", "period", "period_start", "user_id"],
+                        set_={"score": LeaderboardScore.score + stmt.excluded.score}
+                    )
+                    await db.execute(stmt, [
+                        {
+                            "metric": metric,
+                            "period": period,
+                            "period_start": start,
+                            "user_id": user_id,
+                            "score": amount
+                        }
+                        for (metric, period, start, user_id), amount in pending.items()
+                    ])
+            except Exception:
+                for key, amount in pending.items():
+                    self._pending[key] += amount
+                raise
+            return len(pending)
+
+    async def start(self):
+        """Sembrar tableros e iniciar volcado periódico"""
+        await self.load()
+        self._flusher.start()
+
+    async def stop(self):
+        """Detener volcado periódico y persistir lo pendiente"""
+        await self._flusher.stop()
+        await self.flush()
+
+    def _key(self, metric: str, period: str, segment: str) -> tuple:
+        if metric not in METRICS or segment not in SEGMENTS:
+            raise ValueError(f"Ranking no válido: {metric}/{segment}")
+        return (metric, period, period_start(period), segment)
+
+    def _board(self, metric: str, period: str, start: date, segment: str) -> SortedIndex:
+        key = (metric, period, start, segment)
+        board = self._boards.get(key)
+        if board is None:
+            # Nuevo periodo: se descartan los tableros del anterior
+            for old in [k for k in self._boards if k[:2] == key[:2] and k[2] != start]:
+                del self._boards[old]
+            board = self._boards[key] = SortedIndex()
+        return board
+
+    def _add(self, metric: str, period: str, start: date, user_id: int, amount: int):
+        segments = ("all", "vip") if user_id in self._vip_ids else ("all",)
+        for segment in segments:
+            board = self._board(metric, period, start, segment)
+            score = board.score(user_id)
+            board.upsert(user_id, ((score[0] if score else 0) + amount,))
+
+    def _bulk_load(self, scores: Iterable[Tuple[tuple, int]]):
+        boards = defaultdict(list)
+        for (metric, period, start, user_id), score in scores:
+            boards[(metric, period, start, "all")].append((user_id, (score,)))
+            if user_id in self._vip_ids:
+                boards[(metric, period, start, "vip")].append((user_id, (score,)))
+        for key, items in boards.items():
+            self._boards[key] = SortedIndex()
+            self._boards[key].bulk_load(items)
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _ensure_ready(self) -> bool:
+        if self._ready:
+            return True
+        if not self._load_task or self._load_task.done():
+            try:
+                self._load_task = asyncio.get_running_loop().create_task(self._load_safely())
+            except RuntimeError:
+                pass
+        return False
+
+    async def _load_safely(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.warning(f"⚠️ Error sembrando rankings por periodo: {e}")
+
+leaderboards = LeaderboardService(flush_interval=Settings.LEADERBOARD_FLUSH_INTERVAL)
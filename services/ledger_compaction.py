@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from datetime import datetime, time, timedelta
+from sqlalchemy import select, insert, delete, func, tuple_, type_coerce, Date
+from config.settings import Settings
+from database.connection import session_scope
+from database.models import Transaction, TransactionArchive
+from utils.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+COMPACTED_REFERENCE = "compactado"
+
+class LedgerCompactor:
+    """Compacta transacciones antiguas en resúmenes por usuario, día y tipo.
+
+    Solo se pliegan movimientos sin reference_id (las recompensas de
+    actividad, la mayoría de filas); los que apuntan a compras o subastas se
+    conservan tal cual. Los originales se mueven a transactions_archive y la
+    suma por usuario y tipo no cambia, así que los saldos siguen cuadrando.
+    Los resúmenes se insertan sin pasar por EconomyService para no volver a
+    sumarse en user_economy_daily.
+
+    Cada lote es una transacción corta de como mucho batch_size filas. Un
+    día puede quedar repartido entre varios lotes: su resumen se rehace
+    desde lo archivado, así que sigue habiendo una sola fila por usuario,
+    tipo y día.
+    """
+
+    def __init__(self, age_days: int = 90, batch_size: int = 1000, interval: float = 3600):
+        self.age_days = age_days
+        self.batch_size = batch_size
+        self.interval = interval
+        # Las filas con id <= _last_id anteriores al corte ya se procesaron
+        self._last_id = 0
+        self._compactor = PeriodicTask(self._compact_and_log, interval, "Error compactando libro mayor", immediate=True)
+
+    def cutoff(self) -> datetime:
+        """Inicio del primer día que no se compacta (solo se pliegan días completos)"""
+        today = datetime.combine(datetime.now().date(), time())
+        return today - timedelta(days=self.age_days)
+
+    async def compact(self) -> int:
+        """Compactar todo lo anterior al corte, lote a lote"""
+        cutoff = self.cutoff()
+        archived = 0
+        while True:
+            count = await self.compact_batch(cutoff)
+            archived += count
+            if count < self.batch_size:
+                return archived
+            # Ceder el turno entre lotes
+            await asyncio.sleep(0)
+
+    async def compact_batch(self, cutoff: datetime) -> int:
+        """Compactar un lote; devuelve cuántas filas se archivaron"""
+        candidates = (
+            Transaction.created_at < cutoff,
+            Transaction.reference_id == None
+        )
+
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Transaction.id)
+                .where(Transaction.id > self._last_id, *candidates)
+                .order_by(Transaction.id)
+                .limit(self.batch_size)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return 0
+
+            in_batch = (Transaction.id > self._last_id, Transaction.id <= ids[-1], *candidates)
+            day = type_coerce(func.date(Transaction.created_at), Date)
+            result = await db.execute(
+                select(Transaction.user_id, Transaction.type, day)
+                .where(*in_batch)
+                .distinct()
+            )
+            groups = [tuple(row) for row in result]
+
+            columns = ["id", "user_id", "type", "amount", "description", "reference_id", "created_at"]
+            await db.execute(
+                insert(TransactionArchive).from_select(
+                    columns,
+                    select(*(getattr(Transaction, column) for column in columns)).where(*in_batch)
+                )
+            )
+            await db.execute(delete(Transaction).where(*in_batch))
+
+            # Rehacer el resumen de cada (usuario, tipo, día) del lote con todo lo
+            # archivado de ese día, incluido lo de lotes o ejecuciones anteriores
+            days = [summary_day for _, _, summary_day in groups]
+            archived_day = type_coerce(func.date(TransactionArchive.created_at), Date)
+            result = await db.execute(
+                select(
+                    TransactionArchive.user_id,
+                    TransactionArchive.type,
+                    archived_day,
+                    func.sum(TransactionArchive.amount),
+                    func.count(TransactionArchive.id)
+                )
+                .where(
+                    TransactionArchive.user_id.in_({user_id for user_id, _, _ in groups}),
+                    TransactionArchive.created_at >= datetime.combine(min(days), time()),
+                    TransactionArchive.created_at < datetime.combine(max(days) + timedelta(days=1), time()),
+                    tuple_(TransactionArchive.user_id, TransactionArchive.type, archived_day).in_(groups)
+                )
+                .group_by(TransactionArchive.user_id, TransactionArchive.type, archived_day)
+            )
+            summaries = [
+                {
+                    "user_id": user_id,
+                    "type": transaction_type,
+                    "amount": amount,
+                    "description": f"Resumen del día: {count} movimientos",
+                    "reference_id": COMPACTED_REFERENCE,
+                    "created_at": datetime.combine(summary_day, time())
+                }
+                for user_id, transaction_type, summary_day, amount, count in result
+            ]
+
+            await db.execute(
+                delete(Transaction).where(
+                    Transaction.reference_id == COMPACTED_REFERENCE,
+                    tuple_(Transaction.user_id, Transaction.type, Transaction.created_at).in_(
+                        [(summary["user_id"], summary["type"], summary["created_at"]) for summary in summaries]
+                    )
+                )
+            )
+            await db.execute(insert(Transaction), summaries)
+
+        self._last_id = ids[-1]
+        return len(ids)
+
+    async def start(self):
+        """Iniciar compactación periódica"""
+        self._compactor.start()
+
+    async def stop(self):
+        """Detener compactación periódica (el lote en curso se confirma o se descarta entero)"""
+        await self._compactor.stop()
+
+    async def _compact_and_log(self):
+        archived = await self.compact()
+        if archived:
+            logger.info(f"🗜️ Libro mayor compactado: {archived} transacciones archivadas")
+
+ledger_compactor = LedgerCompactor(
+    age_days=Settings.LEDGER_COMPACTION_AGE_DAYS,
+    batch_size=Settings.LEDGER_COMPACTION_BATCH_SIZE,
+    interval=Settings.LEDGER_COMPACTION_INTERVAL
+)
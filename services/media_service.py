@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.settings import Settings
+from database.connection import session_scope, after_commit
+from database.models import StoreItem
+from services.store_catalog import store_catalog
+
+logger = logging.getLogger(__name__)
+
+# content_type del item -> (método del bot, atributo del Message enviado)
+MEDIA_METHODS = {
+    "image": ("send_photo", "photo"),
+    "photo": ("send_photo", "photo"),
+    "video": ("send_video", "video"),
+    "animation": ("send_animation", "animation"),
+    "audio": ("send_audio", "audio"),
+    "document": ("send_document", "document"),
+}
+
+# Errores de Telegram que indican un file_id caducado o inválido (no un chat o usuario inaccesible)
+FILE_ID_ERRORS = ("file identifier", "file_id", "file reference")
+
+class MediaService:
+    """Entrega del contenido comprado reutilizando el file_id de Telegram.
+
+    La primera entrega (o la pre-subida en lote) envía el contenido desde
+    content_url y guarda el file_id que devuelve Telegram; las siguientes
+    envían ese file_id sin que Telegram vuelva a descargar ni procesar el
+    archivo. Si el file_id deja de ser válido se descarta y se sube otra vez.
+    """
+
+    def __init__(self, storage_chat_id: int = 0, upload_delay: float = 3):
+        self.storage_chat_id = storage_chat_id
+        self.upload_delay = upload_delay
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # Entregas en segundo plano (se guarda la referencia para que no se recolecten)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def is_media(self, item) -> bool:
+        return item.content_type in MEDIA_METHODS and bool(item.content_url)
+
+    def is_file_id_error(self, error: TelegramBadRequest) -> bool:
+        message = str(error.message).lower()
+        return any(text in message for text in FILE_ID_ERRORS)
+
+    async def deliver(self, bot: Bot, chat_id: int, item, caption: str = None, db: AsyncSession = None) -> bool:
+        """Enviar el contenido de un item; False si no tiene contenido o Telegram no lo aceptó"""
+        try:
+            try:
+                return await self._deliver(bot, chat_id, item, caption, db)
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                return await self._deliver(bot, chat_id, item, caption, db)
+        except TelegramAPIError as e:
+            logger.error(f"❌ Error entregando item {item.id} a {chat_id}: {e}")
+            return False
+
+    def deliver_later(self, bot: Bot, chat_id: int, item, caption: str = None):
+        """Entregar en segundo plano (se usa como callback after_commit de la compra)"""
+        task = asyncio.get_running_loop().create_task(self._deliver_later(bot, chat_id, item, caption))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _deliver_later(self, bot: Bot, chat_id: int, item, caption: str = None):
+        try:
+            await self.deliver(bot, chat_id, item, caption)
+        except Exception as e:
+            logger.error(f"❌ Error entregando item {item.id} a {chat_id}: {e}")
+
+    async def _deliver(self, bot: Bot, chat_id: int, item, caption: str = None, db: AsyncSession = None) -> bool:
+        if not self.is_media(item):
+            if item.content_url:
+                await bot.send_message(chat_id, f"{caption or item.name}\n{item.content_url}")
+                return True
+            return False
+
+        stale = None
+        file_id = item.telegram_file_id
+        if file_id:
+            try:
+                await self._send(bot, chat_id, item.content_type, file_id, caption)
+                return True
+            except TelegramBadRequest as e:
+                if not self.is_file_id_error(e):
+                    raise
+                logger.warning(f"⚠️ file_id inválido para item {item.id}, se vuelve a subir: {e}")
+                await self.forget_file_id(item.id, file_id, db=db)
+                stale = file_id
+
+        async with self._lock(item.id):
+            # Otra entrega simultánea pudo subirlo mientras se esperaba el lock; el snapshot
+            # puede seguir mostrando el file_id descartado hasta que se confirme la transacción
+            current = (await store_catalog.snapshot()).by_id.get(item.id)
+            file_id = current.telegram_file_id if current else None
+            if file_id and file_id != stale:
+                await self._send(bot, chat_id, item.content_type, file_id, caption)
+                return True
+            message = await self._send(bot, chat_id, item.content_type, item.content_url, caption)
+            await self.save_file_id(item.id, self._file_id(message, item.content_type), db=db)
+        return True
+
+    async def preupload(self, bot: Bot, force: bool = False) -> dict:
+        """Subir al chat de almacenamiento el contenido que aún no tiene file_id"""
+        if not self.storage_chat_id:
+            raise ValueError("MEDIA_STORAGE_CHAT_ID no está configurado")
+
+        catalog = await store_catalog.snapshot()
+        pending = [
+            item for item in catalog.by_id.values()
+            if self.is_media(item) and (force or not item.telegram_file_id)
+        ]
+
+        uploaded = failed = 0
+        for item in pending:
+            try:
+                message = await self._upload(bot, item)
+                await self.save_file_id(item.id, self._file_id(message, item.content_type))
+                uploaded += 1
+            except Exception as e:
+                logger.error(f"❌ Error pre-subiendo item {item.id}: {e}")
+                failed += 1
+            # Ritmo constante para no chocar con los límites de envío de Telegram
+            await asyncio.sleep(self.upload_delay)
+
+        logger.info(f"📤 Pre-subida de contenido: {uploaded} subidos, {failed} fallidos")
+        return {"pending": len(pending), "uploaded": uploaded, "failed": failed}
+
+    async def save_file_id(self, item_id: int, file_id: Optional[str], db: AsyncSession = None):
+        """Guardar el file_id de un item"""
+        async with session_scope(db) as db:
+            await db.execute(
+                update(StoreItem)
+                .where(StoreItem.id == item_id)
+                .values(telegram_file_id=file_id)
+                .execution_options(synchronize_session=False)
+            )
+            after_commit(db, store_catalog.invalidate)
+
+    async def forget_file_id(self, item_id: int, stale_file_id: str, db: AsyncSession = None):
+        """Descartar un file_id inválido (solo si nadie lo reemplazó ya)"""
+        async with session_scope(db) as db:
+            await db.execute(
+                update(StoreItem)
+                .where(StoreItem.id == item_id, StoreItem.telegram_file_id == stale_file_id)
+                .values(telegram_file_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            after_commit(db, store_catalog.invalidate)
+
+    async def _upload(self, bot: Bot, item) -> Message:
+        try:
+            return await self._send(bot, self.storage_chat_id, item.content_type, item.content_url, item.name)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            return await self._send(bot, self.storage_chat_id, item.content_type, item.content_url, item.name)
+
+    async def _send(self, bot: Bot, chat_id: int, content_type: str, media: str, caption: str = None) -> Message:
+        method, _ = MEDIA_METHODS[content_type]
+        return await getattr(bot, method)(chat_id, media, caption=caption)
+
+    def _file_id(self, message: Message, content_type: str) -> Optional[str]:
+        media = getattr(message, MEDIA_METHODS[content_type][1], None)
+        if isinstance(media, list):
+            # Fotos: Telegram devuelve varios tamaños, el último es el original
+            media = media[-1] if media else None
+        return media.file_id if media else None
+
+    def _lock(self, item_id: int) -> asyncio.Lock:
+        lock = self._locks.get(item_id)
+        if lock is None:
+            lock = self._locks[item_id] = asyncio.Lock()
+        return lock
+
+media_service = MediaService(
+    storage_chat_id=Settings.MEDIA_STORAGE_CHAT_ID,
+    upload_delay=Settings.MEDIA_UPLOAD_DELAY
+)
@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from database.models import User, NarrativeState, StoryScene
-from config.database import get_db
+from database.connection import session_scope, after_commit
+from services.user_cache import user_cache
 from typing import Dict, List, Optional
 import json
 
@@ -88,9 +89,9 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
         }
     }
 
-    async def get_user_narrative_state(self, user_id: int) -> dict:
+    async def get_user_narrative_state(self, user_id: int, db: AsyncSession = None) -> dict:
         """Obtener estado narrativo actual del usuario"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user:
                 return {
@@ -100,7 +101,7 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
                 }
             return {"level": 1, "state": {}, "archetype": None}
 
-    async def get_scene_content(self, level: int, scene: int, user_id: int) -> dict:
+    async def get_scene_content(self, level: int, scene: int, user_id: int, db: AsyncSession = None) -> dict:
         """Obtener contenido de escena personalizado"""
         base_content = self.NARRATIVE_CONTENT.get(level, {}).get(scene, {})
         
@@ -108,7 +109,7 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
             return None
         
         # Personalizar contenido basado en arquetipo del usuario
-        user_state = await self.get_user_narrative_state(user_id)
+        user_state = await self.get_user_narrative_state(user_id, db=db)
         archetype = user_state.get("archetype")
         
         content = base_content.copy()
@@ -144,9 +145,9 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
         
         return content
 
-    async def advance_narrative(self, user_id: int, scene_data: dict) -> dict:
+    async def advance_narrative(self, user_id: int, scene_data: dict, db: AsyncSession = None) -> dict:
         """Avanzar narrativa del usuario"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user:
                 # Create narrative state record
@@ -154,7 +155,7 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
                     user_id=user_id,
                     level=scene_data.get("level"),
                     scene=scene_data.get("scene"),
-                    state_data=scene_data.get("state_data", {})
+                    state_data=json.dumps(scene_data.get("state_data", {}))
                 )
                 db.add(narrative_state)
                 
@@ -163,11 +164,12 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
                     user.narrative_level = scene_data.get("level")
                 
                 # Update user state
-                current_state = user.narrative_state or {}
+                # narrative_state es JSON guardado como texto
+                current_state = json.loads(user.narrative_state or "{}")
                 current_state.update(scene_data.get("state_data", {}))
-                user.narrative_state = current_state
+                user.narrative_state = json.dumps(current_state)
+                after_commit(db, user_cache.invalidate_user, user_id)
                 
-                await db.commit()
                 return {"success": True}
             return {"success": False}
 
@@ -244,9 +246,9 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
             "rewards": {"besitos": 25, "xp": 50}
         }
 
-    async def get_available_scenes(self, user_id: int) -> List[dict]:
+    async def get_available_scenes(self, user_id: int, db: AsyncSession = None) -> List[dict]:
         """Obtener escenas disponibles para el usuario"""
-        user_state = await self.get_user_narrative_state(user_id)
+        user_state = await self.get_user_narrative_state(user_id, db=db)
         current_level = user_state["level"]
         
         available_scenes = []
@@ -264,13 +266,13 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
         
         return available_scenes
 
-    async def unlock_next_level(self, user_id: int) -> bool:
+    async def unlock_next_level(self, user_id: int, db: AsyncSession = None) -> bool:
         """Desbloquear siguiente nivel narrativo"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user and user.narrative_level < 6:
                 user.narrative_level += 1
-                await db.commit()
+                after_commit(db, user_cache.invalidate_user, user_id)
                 
                 # Reward for level unlock
                 from services.user_service import UserService
@@ -278,7 +280,7 @@ Algo que me dice que empiezas a comprender no solo lo que busco... sino por qué
                 await user_service.add_besitos(
                     user_id, 
                     user.narrative_level * 50, 
-                    f"Desbloqueo Nivel Narrativo {user.narrative_level}"
+                    f"Desbloqueo Nivel Narrativo {user.narrative_level}", db=db
                 )
                 
                 return True
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional, Set
+
+class OwnedItemsCache:
+    """Ids de items comprados por usuario, en memoria (LRU).
+
+    El conjunto se carga con una consulta la primera vez y después se
+    mantiene al día con cada compra confirmada, así que marcar lo ya
+    comprado en la tienda o en las recomendaciones no consulta la base.
+    """
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._owned: "OrderedDict[int, FrozenSet[int]]" = OrderedDict()
+        # Compras confirmadas mientras se carga el conjunto de un usuario
+        self._loading: Dict[int, Set[int]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, user_id: int) -> Optional[FrozenSet[int]]:
+        """Conjunto en caché del usuario, o None si no está cargado"""
+        owned = self._owned.get(user_id)
+        if owned is not None:
+            self._owned.move_to_end(user_id)
+        return owned
+
+    async def get(self, user_id: int, loader: Callable[[int], Awaitable[FrozenSet[int]]]) -> FrozenSet[int]:
+        """Obtener el conjunto del usuario, cargándolo con loader si falta"""
+        owned = self.peek(user_id)
+        if owned is not None:
+            self.hits += 1
+            return owned
+
+        self.misses += 1
+        self._loading.setdefault(user_id, set())
+        try:
+            owned = frozenset(await loader(user_id))
+        finally:
+            added = self._loading.pop(user_id, set())
+        # La consulta pudo no ver compras confirmadas durante la carga
+        current = self._owned.get(user_id)
+        owned = owned.union(added, current or ())
+        self._store(user_id, owned)
+        return owned
+
+    def add(self, user_id: int, item_id: int):
+        """Registrar una compra (se usa como callback after_commit)"""
+        if user_id in self._loading:
+            self._loading[user_id].add(item_id)
+        owned = self._owned.get(user_id)
+        if owned is not None and item_id not in owned:
+            self._store(user_id, owned | {item_id})
+
+    def invalidate(self, user_id: int = None):
+        """Descartar el conjunto de un usuario, o todos"""
+        if user_id is None:
+            self._owned.clear()
+        else:
+            self._owned.pop(user_id, None)
+
+    def _store(self, user_id: int, owned: FrozenSet[int]):
+        self._owned[user_id] = owned
+        self._owned.move_to_end(user_id)
+        if len(self._owned) > self.max_users:
+            self._owned.popitem(last=False)
+
+owned_items = OwnedItemsCache()
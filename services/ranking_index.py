@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import session_scope
+from database.models import User
+from utils.sorted_index import SortedIndex
+
+logger = logging.getLogger(__name__)
+
+class RankingIndex:
+    """Ranking de usuarios activos por (nivel, experiencia) en memoria.
+
+    Se siembra una vez desde la base de datos y después se actualiza con cada
+    cambio de experiencia. Mientras está frío (sin sembrar) las consultas
+    devuelven None y el servicio usa el fallback SQL.
+    """
+
+    def __init__(self):
+        self._index = SortedIndex()
+        self._ready = False
+        self._load_task: Optional[asyncio.Task] = None
+        # Cambios recibidos mientras se siembra, se aplican al terminar
+        self._pending: Dict[int, Tuple[int, int]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def load(self, db: AsyncSession = None):
+        """Sembrar el índice con todos los usuarios activos"""
+        self._pending = {}
+        async with session_scope(db) as db:
+            result = await db.execute(
+                select(User.id, User.level, User.experience)
+                .where(User.is_active == True)
+            )
+            self._index.bulk_load(
+                (user_id, (level or 0, experience or 0))
+                for user_id, level, experience in result
+            )
+
+        for user_id, score in self._pending.items():
+            self._index.upsert(user_id, score)
+        self._pending = {}
+        self._ready = True
+        logger.info(f"🏆 Índice de ranking sembrado con {len(self._index)} usuarios")
+
+    async def start(self):
+        """Sembrar el índice al arrancar"""
+        await self.load()
+
+    def update(self, user_id: int, level: int, experience: int):
+        """Registrar nivel/experiencia actuales del usuario"""
+        score = (level or 0, experience or 0)
+        if self._ready:
+            self._index.upsert(user_id, score)
+        else:
+            self._pending[user_id] = score
+
+    def remove(self, user_id: int):
+        """Quitar usuario del ranking"""
+        self._index.remove(user_id)
+        self._pending.pop(user_id, None)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Posición del usuario, o None si el índice no puede responder"""
+        if not self._ensure_ready():
+            return None
+        return self._index.rank(user_id)
+
+    def top(self, limit: int) -> Optional[List[int]]:
+        """Ids de los mejores usuarios, o None si el índice está frío"""
+        if not self._ensure_ready():
+            return None
+        return [user_id for user_id, _ in self._index.top(limit)]
+
+    def _ensure_ready(self) -> bool:
+        if self._ready:
+            return True
+        # Sembrar en segundo plano; mientras tanto responde SQL
+        if not self._load_task or self._load_task.done():
+            try:
+                self._load_task = asyncio.get_running_loop().create_task(self._load_safely())
+            except RuntimeError:
+                pass
+        return False
+
+    async def _load_safely(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.warning(f"⚠️ Error sembrando índice de ranking: {e}")
+
+ranking_index = RankingIndex()
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from config.settings import Settings
+from database.connection import session_scope
+from database.models import Purchase, User
+from services.store_catalog import store_catalog
+from utils.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# Categorías afines a cada tramo de nivel (las de siempre de Lucien)
+BUCKET_CATEGORIES = {
+    "beginner": ("beginner", "basic"),
+    "intermediate": ("intermediate", "advanced"),
+    "expert": ("expert", "premium"),
+}
+
+LIST_SIZE = 20  # items por lista precalculada (margen para excluir lo ya comprado)
+SEED_ITEMS = 5  # items más populares del segmento usados para co-ocurrencia
+MAX_BASKET = 50  # compradores con más items no cuentan para co-ocurrencia
+
+Segment = Tuple[str, Optional[str]]
+
+def level_bucket(level: int) -> str:
+    """Tramo de nivel del usuario"""
+    if (level or 1) < 5:
+        return "beginner"
+    if level < 10:
+        return "intermediate"
+    return "expert"
+
+def build_recommendations(purchases: Iterable[Tuple[int, int, int, Optional[str]]], items: Sequence) -> Dict[Segment, Tuple[int, ...]]:
+    """Calcular listas ordenadas de item ids por (tramo de nivel, arquetipo).
+
+    purchases son filas (user_id, item_id, nivel, arquetipo); items, los
+    items activos del catálogo. La puntuación combina popularidad en el
+    segmento, co-ocurrencia con los favoritos del segmento, popularidad
+    global y afinidad de categoría (esta última resuelve el arranque en frío).
+    """
+    items_by_id = {item.id: item for item in items}
+    baskets = defaultdict(set)
+    segments_by_user: Dict[int, Segment] = {}
+    for user_id, item_id, level, archetype in purchases:
+        if item_id in items_by_id:
+            baskets[user_id].add(item_id)
+            segments_by_user[user_id] = (level_bucket(level), archetype)
+
+    popularity = Counter()
+    segment_counts: Dict[Segment, Counter] = defaultdict(Counter)
+    co_occurrence: Dict[int, Counter] = defaultdict(Counter)
+    for user_id, basket in baskets.items():
+        segment = segments_by_user[user_id]
+        for item_id in basket:
+            popularity[item_id] += 1
+            segment_counts[segment][item_id] += 1
+            if segment[1] is not None:
+                # El segmento general del tramo también suma a quien tiene arquetipo
+                segment_counts[(segment[0], None)][item_id] += 1
+        if len(basket) <= MAX_BASKET:
+            for item_id in basket:
+                co_occurrence[item_id].update(other for other in basket if other != item_id)
+
+    segments = set(segment_counts) | {(bucket, None) for bucket in BUCKET_CATEGORIES}
+    lists = {}
+    for bucket, archetype in segments:
+        counts = segment_counts.get((bucket, archetype), Counter())
+        scores = Counter()
+        for item_id, count in counts.items():
+            scores[item_id] += 2 * count
+        for seed, _ in counts.most_common(SEED_ITEMS):
+            scores.update(co_occurrence[seed])
+        for item_id, count in popularity.items():
+            scores[item_id] += 0.1 * count
+
+        affinity = set(BUCKET_CATEGORIES[bucket])
+        if archetype:
+            affinity.add(archetype)
+        for item in items:
+            if item.category in affinity:
+                scores[item.id] += 0.5
+
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], -item_id))
+        lists[(bucket, archetype)] = tuple(ranked[:LIST_SIZE])
+    return lists
+
+class RecommendationEngine:
+    """Recomendaciones de Lucien precalculadas por (tramo de nivel, arquetipo).
+
+    Un trabajo periódico recalcula las listas a partir de purchases; servir
+    una recomendación es una búsqueda en memoria que salta lo ya comprado.
+    """
+
+    def __init__(self, refresh_interval: float = 3600):
+        self.refresh_interval = refresh_interval
+        self._lists: Optional[Dict[Segment, Tuple[int, ...]]] = None
+        self._refresher = PeriodicTask(self.refresh, refresh_interval, "Error recalculando recomendaciones", immediate=True)
+        self._load_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._lists is not None
+
+    def recommend(self, level: int, archetype: Optional[str], owned: FrozenSet[int] = frozenset(), limit: int = 3,
+                  available: Callable[[int], bool] = None) -> Optional[List[int]]:
+        """Item ids recomendados, o None si las listas aún no están calculadas.
+
+        Las listas se calculan cada cierto tiempo; available descarta al
+        servir los items que el usuario no puede comprar ahora (desactivados
+        desde el último cálculo, o exclusivos VIP para usuarios free).
+        """
+        lists = self._lists
+        if lists is None:
+            self._ensure_loaded()
+            return None
+
+        bucket = level_bucket(level)
+        ranked = lists.get((bucket, archetype)) or lists.get((bucket, None), ())
+        result = []
+        for item_id in ranked:
+            if item_id not in owned and (available is None or available(item_id)):
+                result.append(item_id)
+                if len(result) >= limit:
+                    break
+        return result
+
+    async def refresh(self):
+        """Recalcular las listas desde purchases y el catálogo vigente"""
+        catalog = await store_catalog.snapshot()
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Purchase.user_id, Purchase.item_id, User.level, User.user_archetype)
+                .join(User, User.id == Purchase.user_id)
+            )
+            purchases = result.all()
+
+        self._lists = build_recommendations(purchases, catalog.active)
+        logger.info(f"💡 Recomendaciones recalculadas: {len(self._lists)} segmentos, {len(purchases)} compras")
+
+    async def start(self):
+        """Calcular listas e iniciar recálculo periódico"""
+        self._refresher.start()
+
+    async def stop(self):
+        """Detener recálculo periódico"""
+        await self._refresher.stop()
+
+    def _ensure_loaded(self):
+        if self._load_task and not self._load_task.done():
+            return
+        try:
+            self._load_task = asyncio.get_running_loop().create_task(self._refresh_safely())
+        except RuntimeError:
+            pass
+
+    async def _refresh_safely(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"⚠️ Error recalculando recomendaciones: {e}")
+
+recommendation_engine = RecommendationEngine(refresh_interval=Settings.RECOMMENDATIONS_REFRESH_INTERVAL)
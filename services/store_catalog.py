@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+from sqlalchemy import select
+from database.connection import session_scope
+from database.models import StoreItem
+
+logger = logging.getLogger(__name__)
+
+FEATURED_CATEGORIES = ("featured", "premium")
+VIP_CATEGORY = "vip_exclusive"
+
+@dataclass(frozen=True)
+class CatalogItem:
+    """Copia inmutable de un StoreItem (mismos atributos que usan los handlers)"""
+    id: int
+    name: str
+    description: Optional[str]
+    price_besitos: int
+    category: Optional[str]
+    content_url: Optional[str]
+    content_type: Optional[str]
+    telegram_file_id: Optional[str]
+    is_active: bool
+    stock: int
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, item: StoreItem) -> "CatalogItem":
+        return cls(
+            id=item.id,
+            name=item.name,
+            description=item.description,
+            price_besitos=item.price_besitos,
+            category=item.category,
+            content_url=item.content_url,
+            content_type=item.content_type,
+            telegram_file_id=item.telegram_file_id,
+            is_active=bool(item.is_active),
+            stock=item.stock if item.stock is not None else -1,
+            created_at=item.created_at
+        )
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Catálogo completo con índices precalculados; nunca se modifica en sitio"""
+    version: int
+    by_id: Mapping[int, CatalogItem]
+    # Solo items activos, del más nuevo al más antiguo
+    active: Tuple[CatalogItem, ...]
+    public: Tuple[CatalogItem, ...]
+    vip: Tuple[CatalogItem, ...]
+    featured: Tuple[CatalogItem, ...]
+    by_category: Mapping[str, Tuple[CatalogItem, ...]]
+
+    @classmethod
+    def build(cls, version: int, items) -> "CatalogSnapshot":
+        items = tuple(items)
+        active = tuple(item for item in items if item.is_active)
+        by_category: Dict[str, list] = {}
+        for item in active:
+            by_category.setdefault(item.category, []).append(item)
+
+        return cls(
+            version=version,
+            by_id=MappingProxyType({item.id: item for item in items}),
+            active=active,
+            public=tuple(item for item in active if item.category != VIP_CATEGORY),
+            vip=tuple(item for item in active if item.category == VIP_CATEGORY),
+            featured=tuple(item for item in active if item.category in FEATURED_CATEGORIES),
+            by_category=MappingProxyType({
+                category: tuple(category_items) for category, category_items in by_category.items()
+            })
+        )
+
+class StoreCatalog:
+    """Instantánea en memoria del catálogo de la tienda.
+
+    Navegar la tienda no consulta la base de datos: se lee la instantánea
+    vigente. Crear o editar items la invalida tras el commit y la siguiente
+    lectura construye una nueva con una sola consulta, que reemplaza a la
+    anterior de una vez.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    async def snapshot(self) -> CatalogSnapshot:
+        """Obtener la instantánea vigente, construyéndola si hace falta"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Otro lector pudo construirla mientras se esperaba el lock
+            while self._snapshot is None:
+                version = self._version
+                async with session_scope() as db:
+                    result = await db.execute(
+                        select(StoreItem).order_by(StoreItem.created_at.desc(), StoreItem.id.desc())
+                    )
+                    items = [CatalogItem.from_model(item) for item in result.scalars()]
+                # Si hubo una invalidación durante la consulta se vuelve a leer
+                if version == self._version:
+                    self._snapshot = CatalogSnapshot.build(version, items)
+                    logger.info(f"🏪 Catálogo cargado: {len(items)} items (versión {version})")
+            return self._snapshot
+
+    def invalidate(self):
+        """Descartar la instantánea (se usa como callback after_commit)"""
+        self._version += 1
+        self._snapshot = None
+
+    def update_stock(self, item_id: int, stock: int):
+        """Reflejar un cambio de stock sin recargar el catálogo"""
+        snapshot = self._snapshot
+        if snapshot is None or item_id not in snapshot.by_id:
+            return
+        item = replace(snapshot.by_id[item_id], stock=stock)
+        self._version += 1
+        self._snapshot = CatalogSnapshot.build(
+            self._version,
+            (item if existing.id == item_id else existing for existing in snapshot.by_id.values())
+        )
+
+store_catalog = StoreCatalog()
@@ -0,0 +1,102 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from config.settings import Settings
+from services.store_catalog import store_catalog, CatalogSnapshot, VIP_CATEGORY
+from utils.helpers import encode_cursor, decode_cursor
+
+@dataclass(frozen=True)
+class CategoryPage:
+    """Página de una categoría ya renderizada (igual para todos los usuarios del rol)"""
+    category: str
+    page: int
+    # (item_id, precio, texto del item, texto del botón)
+    items: Tuple[Tuple[int, int, str, str], ...]
+    next_cursor: Optional[str]
+    # Cursor de inicio de la página anterior (None si la anterior es la primera)
+    prev_cursor: Optional[str]
+    has_prev: bool
+
+class StorePageCache:
+    """Páginas de categorías de la tienda, paginadas por cursor y cacheadas.
+
+    El cursor es (created_at, id) del último item mostrado y se resuelve con
+    búsqueda binaria sobre la instantánea del catálogo. Las páginas
+    renderizadas se guardan por (versión del catálogo, categoría, rol,
+    página); al cambiar el catálogo cambia la versión y se descartan.
+    """
+
+    def __init__(self, page_size: int = 8, max_pages: int = 500):
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._version: Optional[int] = None
+        self._pages: "OrderedDict[tuple, CategoryPage]" = OrderedDict()
+        # (categoría, rol) -> (items, claves ascendentes para bisect)
+        self._listings: Dict[tuple, tuple] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, category: str, user_role: str = "free", page: int = 1, cursor: str = None) -> CategoryPage:
+        """Obtener una página de la categoría"""
+        catalog = await store_catalog.snapshot()
+        if catalog.version != self._version:
+            self._version = catalog.version
+            self._pages.clear()
+            self._listings.clear()
+
+        key = (catalog.version, category, user_role, page)
+        cached = self._pages.get(key)
+        if cached is not None:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        items, ascending_keys = self._listing(catalog, category, user_role)
+        start = 0
+        if cursor:
+            # Items en orden descendente: los siguientes son los de clave menor al cursor
+            start = len(items) - bisect_left(ascending_keys, decode_cursor(cursor))
+        end = start + self.page_size
+        prev_start = max(0, start - self.page_size)
+
+        result = CategoryPage(
+            category=category,
+            page=page,
+            items=tuple(
+                (
+                    item.id,
+                    item.price_besitos,
+                    f"**{item.name}**\n   💰 {item.price_besitos} besitos",
+                    f"{item.name} ({item.price_besitos}💰)"
+                )
+                for item in items[start:end]
+            ),
+            next_cursor=self._cursor(items[end - 1]) if end < len(items) else None,
+            prev_cursor=self._cursor(items[prev_start - 1]) if prev_start > 0 else None,
+            has_prev=start > 0
+        )
+
+        # Solo se cachea si el cursor corresponde de verdad a ese número de página
+        if start == (page - 1) * self.page_size:
+            self._pages[key] = result
+            if len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return result
+
+    def _listing(self, catalog: CatalogSnapshot, category: str, user_role: str) -> tuple:
+        listing = self._listings.get((category, user_role))
+        if listing is None:
+            items = catalog.by_category.get(category, ())
+            if user_role == "free":
+                items = tuple(item for item in items if item.category != VIP_CATEGORY)
+            ascending_keys = [(item.created_at, item.id) for item in reversed(items)]
+            listing = self._listings[(category, user_role)] = (items, ascending_keys)
+        return listing
+
+    def _cursor(self, item) -> str:
+        return encode_cursor(item.created_at, item.id)
+
+store_pages = StorePageCache(page_size=Settings.STORE_PAGE_SIZE)
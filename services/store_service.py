@@ -1,96 +1,216 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, case, or_, tuple_
 from database.models import StoreItem, Purchase, User
-from config.database import get_db
+from database.connection import session_scope, after_commit
+from services.store_catalog import store_catalog, CatalogItem, VIP_CATEGORY
+from services.store_pages import store_pages, CategoryPage
+from services.owned_items import owned_items
+from services.flash_sale import flash_sales
+from services.recommendation_engine import recommendation_engine, BUCKET_CATEGORIES, level_bucket
+from utils.helpers import encode_cursor, decode_cursor
+from dataclasses import replace
 from typing import List, Optional
 
 class StoreService:
     
-    async def get_store_items(self, category: str = None, user_role: str = "free") -> List[StoreItem]:
+    async def get_store_items(self, category: str = None, user_role: str = "free", db: AsyncSession = None) -> List[CatalogItem]:
         """Obtener items de la tienda"""
-        async for db in get_db():
-            query = select(StoreItem).where(StoreItem.is_active == True)
-            
-            if category:
-                query = query.where(StoreItem.category == category)
-            
-            # Filtrar por rol de usuario
-            if user_role == "free":
-                query = query.where(StoreItem.category != "vip_exclusive")
-            
-            result = await db.execute(query.order
-            result = await db.execute(query.order_by(StoreItem.created_at.desc()))
-            return result.scalars().all()
+        catalog = await store_catalog.snapshot()
+        
+        if category:
+            items = catalog.by_category.get(category, ())
+        else:
+            items = catalog.public if user_role == "free" else catalog.active
+        
+        # Filtrar por rol de usuario
+        if user_role == "free":
+            items = [item for item in items if item.category != "vip_exclusive"]
+        
+        return list(items)
 
-    async def get_item_by_id(self, item_id: int) -> Optional[StoreItem]:
+    async def get_category_page(self, category: str, user_role: str = "free", page: int = 1, cursor: str = None) -> CategoryPage:
+        """Obtener página renderizada de una categoría (paginada por cursor)"""
+        return await store_pages.get(category, user_role, page, cursor)
+
+    async def get_item_by_id(self, item_id: int, db: AsyncSession = None) -> Optional[CatalogItem]:
         """Obtener item por ID"""
-        async for db in get_db():
-            return await db.get(StoreItem, item_id)
+        catalog = await store_catalog.snapshot()
+        return catalog.by_id.get(item_id)
+
+    async def purchase_item(self, user_id: int, item_id: int, db: AsyncSession = None) -> dict:
+        """Procesar compra de item (por la cola de venta flash si el item tiene una activa)"""
+        result = await flash_sales.submit(item_id, user_id)
+        if result is not None:
+            return result
+        return await self._purchase_item(user_id, item_id, db)
 
-    async def purchase_item(self, user_id: int, item_id: int) -> dict:
-        """Procesar compra de item"""
-        async for db in get_db():
+    async def start_flash_sale(self, item_id: int, db: AsyncSession = None) -> dict:
+        """Activar venta flash para un item con stock limitado"""
+        async with session_scope(db) as db:
             item = await db.get(StoreItem, item_id)
-            user = await db.get(User, user_id)
-            
-            if not item or not user:
-                return {"success": False, "message": "Item o usuario no encontrado"}
-            
-            if not item.is_active:
-                return {"success": False, "message": "Item no disponible"}
+            if not item or not item.is_active or item.stock <= 0:
+                return {"success": False, "message": "La venta flash requiere un item activo con stock limitado"}
+            name, stock = item.name, item.stock
+        
+        flash_sales.start(item_id, stock, self._purchase_item)
+        return {"success": True, "message": f"⚡ Venta flash activa: {name} ({stock} unidades)"}
+
+    async def stop_flash_sale(self, item_id: int) -> dict:
+        """Terminar venta flash de un item"""
+        stats = await flash_sales.stop(item_id)
+        if stats is None:
+            return {"success": False, "message": "El item no tiene venta flash activa"}
+        return {"success": True, "message": f"Venta flash terminada: {stats['sold']} vendidos, {stats['rejected']} rechazados"}
+
+    async def _purchase_item(self, user_id: int, item_id: int, db: AsyncSession = None) -> dict:
+        """Procesar compra de item.
+
+        Stock y saldo se descuentan con UPDATEs condicionales en la misma
+        transacción que la compra y su transacción, así que dos compradores
+        simultáneos nunca pueden llevarse la misma última unidad.
+        """
+        # Leer el catálogo antes de abrir la transacción: si hay que recargarlo
+        # usa otra conexión, que no debe esperar el lock de escritura de esta
+        catalog = await store_catalog.snapshot()
+        
+        async with session_scope(db) as db:
+            # Reservar una unidad: el stock nunca baja de 0 y -1 (ilimitado) no cambia
+            result = await db.execute(
+                update(StoreItem)
+                .where(
+                    StoreItem.id == item_id,
+                    StoreItem.is_active == True,
+                    or_(StoreItem.stock > 0, StoreItem.stock == -1)
+                )
+                .values(stock=case((StoreItem.stock > 0, StoreItem.stock - 1), else_=StoreItem.stock))
+                .returning(StoreItem.name, StoreItem.price_besitos, StoreItem.stock)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.one_or_none()
             
-            if item.stock == 0:
+            if row is None:
+                item = catalog.by_id.get(item_id)
+                if not item:
+                    return {"success": False, "message": "Item o usuario no encontrado"}
+                if not item.is_active:
+                    return {"success": False, "message": "Item no disponible"}
                 return {"success": False, "message": "Item agotado"}
             
-            if user.besitos < item.price_besitos:
-                return {"success": False, "message": "Besitos insuficientes"}
-            
-            # Procesar compra
-            user.besitos -= item.price_besitos
-            user.total_spent += item.price_besitos
-            
-            # Reducir stock si no es ilimitado
-            if item.stock > 0:
-                item.stock -= 1
+            name, price, stock = row
             
             # Crear registro de compra
             purchase = Purchase(
                 user_id=user_id,
                 item_id=item_id,
-                price_paid=item.price_besitos
+                price_paid=price
             )
             db.add(purchase)
+            await db.flush()
             
-            await db.commit()
-            
-            # Crear transacción
+            # Cobrar (solo si el saldo alcanza) y registrar la transacción en el mismo commit
             from services.economy_service import EconomyService
             economy_service = EconomyService()
-            await economy_service.create_transaction(
-                user_id, "spend", item.price_besitos, 
-                f"Compra: {item.name}", str(purchase.id)
+            remaining_besitos = await economy_service.change_balance(
+                user_id, -price, "spend", 
+                f"Compra: {name}", str(purchase.id), db=db
             )
             
+            if remaining_besitos is None:
+                # Compensar dentro de la misma transacción: nadie llegó a ver la reserva
+                await db.delete(purchase)
+                if stock >= 0:
+                    await db.execute(
+                        update(StoreItem)
+                        .where(StoreItem.id == item_id)
+                        .values(stock=StoreItem.stock + 1)
+                        .execution_options(synchronize_session=False)
+                    )
+                return {"success": False, "message": "Besitos insuficientes"}
+            
+            if stock >= 0:
+                after_commit(db, store_catalog.update_stock, item_id, stock)
+            after_commit(db, owned_items.add, user_id, item_id)
+            
+            item = catalog.by_id.get(item_id)
             return {
                 "success": True,
-                "message": f"¡Compraste {item.name}!",
-                "item": item,
-                "remaining_besitos": user.besitos
+                "message": f"¡Compraste {name}!",
+                "item": replace(item, stock=stock) if item else None,
+                "remaining_besitos": remaining_besitos
             }
 
-    async def get_user_purchases(self, user_id: int) -> List[Purchase]:
+    async def get_user_purchases(self, user_id: int, db: AsyncSession = None) -> List[Purchase]:
         """Obtener compras del usuario"""
-        async for db in get_db():
-            result = await db.execute(
-                select(Purchase)
-                .where(Purchase.user_id == user_id)
-                .order_by(Purchase.created_at.desc())
-            )
+        async with session_scope(db) as db:
+            result = await db.execute(self.user_purchases_query(user_id))
             return result.scalars().all()
 
-    async def create_store_item(self, item_data: dict) -> StoreItem:
+    def user_purchases_query(self, user_id: int):
+        """Consulta de las compras del usuario, de la más reciente a la más antigua"""
+        return (
+            select(Purchase)
+            .where(Purchase.user_id == user_id)
+            .order_by(Purchase.created_at.desc())
+        )
+
+    async def get_inventory_page(self, user_id: int, cursor: str = None, direction: str = "next", limit: int = 8, db: AsyncSession = None) -> dict:
+        """Obtener una página del inventario con los datos del item (una sola consulta con join).
+
+        Pagina por cursor sobre (created_at, id) de la compra igual que el
+        historial de besitos: direction="next" trae compras anteriores al
+        cursor y "prev" las posteriores.
+        """
+        newer = cursor is not None and direction == "prev"
+        
+        async with session_scope(db) as db:
+            result = await db.execute(self.inventory_page_query(user_id, cursor, direction, limit))
+            items = result.all()
+        
+        has_more = len(items) > limit
+        items = items[:limit]
+        if newer:
+            items.reverse()
+        has_older = True if newer else has_more
+        has_newer = has_more if newer else cursor is not None
+        
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(items[-1].created_at, items[-1].id) if items and has_older else None,
+            "prev_cursor": encode_cursor(items[0].created_at, items[0].id) if items and has_newer else None
+        }
+
+    def inventory_page_query(self, user_id: int, cursor: str = None, direction: str = "next", limit: int = 8):
+        """Consulta de una página del inventario (trae una fila de más para saber si hay otra página)"""
+        newer = cursor is not None and direction == "prev"
+        position = tuple_(Purchase.created_at, Purchase.id)
+        
+        query = (
+            select(
+                Purchase.id,
+                Purchase.created_at,
+                Purchase.price_paid,
+                StoreItem.id.label("item_id"),
+                StoreItem.name,
+                StoreItem.category,
+                StoreItem.content_type,
+                StoreItem.content_url
+            )
+            .join(StoreItem, StoreItem.id == Purchase.item_id)
+            .where(Purchase.user_id == user_id)
+        )
+        if cursor:
+            created_at, purchase_id = decode_cursor(cursor)
+            boundary = tuple_(created_at, purchase_id)
+            query = query.where(position > boundary if newer else position < boundary)
+        if newer:
+            query = query.order_by(Purchase.created_at.asc(), Purchase.id.asc())
+        else:
+            query = query.order_by(Purchase.created_at.desc(), Purchase.id.desc())
+        return query.limit(limit + 1)
+
+    async def create_store_item(self, item_data: dict, db: AsyncSession = None) -> StoreItem:
         """Crear nuevo item en la tienda"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             item = StoreItem(
                 name=item_data["name"],
                 description=item_data.get("description", ""),
@@ -101,55 +221,82 @@ class StoreService:
                 stock=item_data.get("stock", -1)
             )
             db.add(item)
-            await db.commit()
+            await db.flush()
             await db.refresh(item)
+            after_commit(db, store_catalog.invalidate)
             return item
 
-    async def get_featured_items(self, limit: int = 5) -> List[StoreItem]:
-        """Obtener items destacados"""
-        async for db in get_db():
-            result = await db.execute(
-                select(StoreItem)
-                .where(
-                    and_(
-                        StoreItem.is_active == True,
-                        StoreItem.category.in_(["featured", "premium"])
-                    )
-                )
-                .order_by(StoreItem.created_at.desc())
-                .limit(limit)
-            )
-            return result.scalars().all()
-
-    async def get_lucien_recommendations(self, user_id: int) -> List[StoreItem]:
-        """Obtener recomendaciones personalizadas de Lucien"""
-        async for db in get_db():
-            user = await db.get(User, user_id)
-            if not user:
-                return []
-            
-            # Lógica de recomendación basada en nivel y arquetipo
-            recommended_categories = []
+    async def update_store_item(self, item_id: int, changes: dict, db: AsyncSession = None) -> Optional[StoreItem]:
+        """Editar item de la tienda (precio, stock, categoría, activo...)"""
+        editable = {
+            "name", "description", "price_besitos", "category",
+            "content_url", "content_type", "is_active", "stock"
+        }
+        async with session_scope(db) as db:
+            item = await db.get(StoreItem, item_id)
+            if not item:
+                return None
             
-            if user.level < 5:
-                recommended_categories.extend(["beginner", "basic"])
-            elif user.level < 10:
-                recommended_categories.extend(["intermediate", "advanced"])
-            else:
-                recommended_categories.extend(["expert", "premium"])
+            if "content_url" in changes and changes["content_url"] != item.content_url:
+                # El file_id guardado corresponde al contenido anterior
+                item.telegram_file_id = None
             
-            if user.user_archetype:
-                recommended_categories.append(user.user_archetype)
+            for field, value in changes.items():
+                if field in editable:
+                    setattr(item, field, value)
             
-            result = await db.execute(
-                select(StoreItem)
-                .where(
-                    and_(
-                        StoreItem.is_active == True,
-                        StoreItem.category.in_(recommended_categories)
-                    )
-                )
-                .limit(3)
-            )
-            return result.scalars().all()
+            after_commit(db, store_catalog.invalidate)
+            return item
+
+    async def get_featured_items(self, limit: int = 5, db: AsyncSession = None) -> List[CatalogItem]:
+        """Obtener items destacados"""
+        catalog = await store_catalog.snapshot()
+        return list(catalog.featured[:limit])
+
+    async def get_owned_item_ids(self, user_id: int, db: AsyncSession = None) -> frozenset:
+        """Obtener ids de los items que el usuario ya compró (cacheados en memoria)"""
+        async def load(user_id: int) -> frozenset:
+            async with session_scope(db) as session:
+                result = await session.execute(self.owned_item_ids_query(user_id))
+                return frozenset(result.scalars())
+        
+        return await owned_items.get(user_id, load)
+
+    def owned_item_ids_query(self, user_id: int):
+        """Consulta de los ids de los items que compró el usuario"""
+        return select(Purchase.item_id).where(Purchase.user_id == user_id)
+
+    async def get_lucien_recommendations(self, user_id: int, user: User = None, owned_ids: frozenset = None, db: AsyncSession = None) -> List[CatalogItem]:
+        """Obtener recomendaciones personalizadas de Lucien (listas precalculadas por segmento)"""
+        if user is None:
+            async with session_scope(db) as db:
+                user = await db.get(User, user_id)
+        if not user:
+            return []
+        
+        if owned_ids is None:
+            owned_ids = await self.get_owned_item_ids(user_id, db=db)
+        
+        catalog = await store_catalog.snapshot()
+        vip_allowed = user.role != "free"
+        
+        def available(item_id: int) -> bool:
+            item = catalog.by_id.get(item_id)
+            return item is not None and item.is_active and (vip_allowed or item.category != VIP_CATEGORY)
+        
+        item_ids = recommendation_engine.recommend(user.level, user.user_archetype, owned_ids, available=available)
+        if item_ids is not None:
+            return [catalog.by_id[item_id] for item_id in item_ids]
+        
+        # Listas aún sin calcular: categorías afines al nivel y arquetipo
+        recommended_categories = list(BUCKET_CATEGORIES[level_bucket(user.level)])
+        if user.user_archetype:
+            recommended_categories.append(user.user_archetype)
+        
+        items = [
+            item for category in recommended_categories
+            for item in catalog.by_category.get(category, ())
+            if item.id not in owned_ids and available(item.id)
+        ]
+        return items[:3]
             
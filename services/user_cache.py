@@ -0,0 +1,134 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import update
+from database.connection import session_scope
+from config.settings import Settings
+from database.models import User
+from utils.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """Caché LRU con TTL de usuarios por telegram_id.
+
+    La última actividad no se escribe en cada evento: se acumula en memoria
+    y se vuelca periódicamente en un único UPDATE masivo.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300, flush_interval: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+
+        # telegram_id -> (expira_en, usuario), en orden de uso (LRU)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # user_id -> telegram_id, para invalidar desde los servicios
+        self._telegram_ids: Dict[int, int] = {}
+        # user_id -> última actividad pendiente de escribir
+        self._pending_activity: Dict[int, datetime] = {}
+        self._flusher = PeriodicTask(self.flush, flush_interval, "Error volcando actividad de usuarios")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, telegram_id: int) -> Optional[User]:
+        """Obtener usuario cacheado si sigue vigente"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            self._remove(telegram_id)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(telegram_id)
+        self.hits += 1
+        return user
+
+    def set(self, user: User):
+        """Guardar usuario en caché"""
+        self._entries[user.telegram_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.telegram_id)
+        self._telegram_ids[user.id] = user.telegram_id
+
+        while len(self._entries) > self.max_size:
+            _, (_, old_user) = self._entries.popitem(last=False)
+            self._telegram_ids.pop(old_user.id, None)
+            self.evictions += 1
+
+    def invalidate(self, telegram_id: int):
+        """Descartar usuario por telegram_id"""
+        self._remove(telegram_id)
+
+    def invalidate_user(self, user_id: int):
+        """Descartar usuario por id interno (tras cambios de saldo, nivel, etc.)"""
+        telegram_id = self._telegram_ids.get(user_id)
+        if telegram_id is not None:
+            self._remove(telegram_id)
+
+    def touch(self, user_id: int, when: datetime = None):
+        """Registrar actividad del usuario para el próximo volcado"""
+        self._pending_activity[user_id] = when or datetime.now()
+        self._flusher.start()
+
+    async def flush(self) -> int:
+        """Escribir la actividad pendiente en un único UPDATE masivo"""
+        if not self._pending_activity:
+            return 0
+
+        pending, self._pending_activity = self._pending_activity, {}
+        try:
+            async with session_scope() as db:
+                await db.execute(
+                    update(User),
+                    [
+                        {"id": user_id, "last_activity": last_activity}
+                        for user_id, last_activity in pending.items()
+                    ]
+                )
+        except Exception:
+            # Conservar lo pendiente sin pisar actividad más reciente
+            for user_id, last_activity in pending.items():
+                self._pending_activity.setdefault(user_id, last_activity)
+            raise
+        return len(pending)
+
+    def stats(self) -> dict:
+        """Obtener métricas de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) * 100 if lookups else 0.0,
+            "evictions": self.evictions,
+            "pending_activity": len(self._pending_activity)
+        }
+
+    async def start(self):
+        """Iniciar volcado periódico de actividad"""
+        self._flusher.start()
+
+    async def stop(self):
+        """Detener volcado periódico y escribir lo pendiente"""
+        await self._flusher.stop()
+        await self.flush()
+
+    def _remove(self, telegram_id: int):
+        entry = self._entries.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_ids.pop(entry[1].id, None)
+
+user_cache = UserCache(
+    max_size=Settings.USER_CACHE_MAX_SIZE,
+    ttl=Settings.USER_CACHE_TTL,
+    flush_interval=Settings.USER_ACTIVITY_FLUSH_INTERVAL
+)
@@ -1,20 +1,52 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from database.models import User, UserRole
-from config.database import get_db
+from sqlalchemy import select, update, bindparam, case, or_, func
+from database.models import User, UserRole, LeaderboardScore
+from database.connection import session_scope, after_commit
+from services.user_cache import user_cache
+from services.ranking_index import ranking_index
+from services.leaderboard_service import leaderboards, period_start
 from datetime import datetime, timedelta
+from bisect import bisect_right
+from math import isqrt
+from typing import Dict
 import asyncio
 
+# XP total necesaria para cada nivel (índice = nivel)
+LEVEL_THRESHOLDS = [level * level * 100 for level in range(1001)]
+
+def level_for_experience(experience: int) -> int:
+    """Nivel máximo alcanzable con esa experiencia"""
+    if experience >= LEVEL_THRESHOLDS[-1]:
+        return isqrt(experience // 100)
+    return bisect_right(LEVEL_THRESHOLDS, experience) - 1
+
+def level_up_bonus(old_level: int, new_level: int) -> int:
+    """Besitos de bonus por subir de old_level a new_level (10 por nivel alcanzado)"""
+    if new_level <= old_level:
+        return 0
+    return 10 * (new_level * (new_level + 1) - old_level * (old_level + 1)) // 2
+
+def level_up_description(old_level: int, new_level: int) -> str:
+    if new_level == old_level + 1:
+        return f"Bonus nivel {new_level}"
+    return f"Bonus niveles {old_level + 1}-{new_level}"
+
 class UserService:
-    async def get_or_create_user(self, user_data: dict) -> User:
+    async def get_or_create_user(self, user_data: dict, db: AsyncSession = None) -> User:
         """Obtener o crear usuario"""
-        async for db in get_db():
+        user = user_cache.get(user_data["telegram_id"])
+        if user:
+            user_cache.touch(user.id)
+            return user
+        
+        async with session_scope(db) as db:
             result = await db.execute(
                 select(User).where(User.telegram_id == user_data["telegram_id"])
             )
             user = result.scalar_one_or_none()
+            is_new = user is None
             
-            if not user:
+            if is_new:
                 user = User(
                     telegram_id=user_data["telegram_id"],
                     username=user_data.get("username"),
@@ -25,66 +57,49 @@ class UserService:
                     narrative_level=1
                 )
                 db.add(user)
-                await db.commit()
+                await db.flush()
                 await db.refresh(user)
+                after_commit(db, ranking_index.update, user.id, user.level, user.experience)
             else:
-                # Update last activity
-                user.last_activity = datetime.now()
-                await db.commit()
+                # Update last activity (se escribe en lote desde la caché)
+                user_cache.touch(user.id)
             
+            # La copia cacheada no debe quedar ligada a la sesión de la actualización
+            db.expunge(user)
+            if is_new:
+                # Un usuario nuevo solo existe si la actualización se confirma
+                after_commit(db, leaderboards.set_vip, user.id, user.is_vip)
+                after_commit(db, user_cache.set, user)
+            else:
+                leaderboards.set_vip(user.id, user.is_vip)
+                user_cache.set(user)
             return user
 
     async def update_user_activity(self, user_id: int):
         """Actualizar última actividad del usuario"""
-        async for db in get_db():
-            await db.execute(
-                update(User)
-                .where(User.id == user_id)
-                .values(last_activity=datetime.now())
-            )
-            await db.commit()
+        user_cache.touch(user_id)
 
-    async def add_besitos(self, user_id: int, amount: int, description: str = ""):
+    async def add_besitos(self, user_id: int, amount: int, description: str = "", db: AsyncSession = None):
         """Agregar besitos al usuario"""
-        async for db in get_db():
-            user = await db.get(User, user_id)
-            if user:
-                user.besitos += amount
-                user.total_earned += amount
-                await db.commit()
-                
-                # Record transaction
-                from services.economy_service import EconomyService
-                economy_service = EconomyService()
-                await economy_service.create_transaction(
-                    user_id, "earn", amount, description
-                )
-                
-                return user.besitos
-            return 0
+        from services.economy_service import EconomyService
+        economy_service = EconomyService()
+        balance = await economy_service.change_balance(
+            user_id, amount, "earn", description, db=db
+        )
+        return balance if balance is not None else 0
 
-    async def spend_besitos(self, user_id: int, amount: int, description: str = "") -> bool:
+    async def spend_besitos(self, user_id: int, amount: int, description: str = "", db: AsyncSession = None) -> bool:
         """Gastar besitos del usuario"""
-        async for db in get_db():
-            user = await db.get(User, user_id)
-            if user and user.besitos >= amount:
-                user.besitos -= amount
-                user.total_spent += amount
-                await db.commit()
-                
-                # Record transaction
-                from services.economy_service import EconomyService
-                economy_service = EconomyService()
-                await economy_service.create_transaction(
-                    user_id, "spend", amount, description
-                )
-                
-                return True
-            return False
+        from services.economy_service import EconomyService
+        economy_service = EconomyService()
+        balance = await economy_service.change_balance(
+            user_id, -amount, "spend", description, db=db
+        )
+        return balance is not None
 
-    async def get_user_profile(self, user_id: int) -> dict:
+    async def get_user_profile(self, user_id: int, db: AsyncSession = None) -> dict:
         """Obtener perfil completo del usuario"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user:
                 next_level_xp = self.calculate_xp_for_level(user.level + 1)
@@ -100,27 +115,105 @@ class UserService:
 
     def calculate_xp_for_level(self, level: int) -> int:
         """Calcular XP necesaria para un nivel"""
+        if 0 <= level < len(LEVEL_THRESHOLDS):
+            return LEVEL_THRESHOLDS[level]
         return level * level * 100
 
-    async def add_experience(self, user_id: int, xp: int):
+    async def add_experience(self, user_id: int, xp: int, db: AsyncSession = None):
         """Agregar experiencia y verificar subida de nivel"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user:
                 user.experience += xp
                 
-                # Check level up
-                while user.experience >= self.calculate_xp_for_level(user.level + 1):
-                    user.level += 1
-                    # Level up bonus
-                    await self.add_besitos(user_id, user.level * 10, f"Bonus nivel {user.level}")
+                # Check level up: todos los niveles ganados se pagan en un solo movimiento
+                new_level = max(user.level, level_for_experience(user.experience))
+                if new_level > user.level:
+                    bonus = level_up_bonus(user.level, new_level)
+                    description = level_up_description(user.level, new_level)
+                    user.level = new_level
+                    await self.add_besitos(user_id, bonus, description, db=db)
                 
-                await db.commit()
+                after_commit(db, user_cache.invalidate_user, user_id)
+                after_commit(db, ranking_index.update, user_id, user.level, user.experience)
+                after_commit(db, leaderboards.record, "xp", user_id, xp, user.is_vip)
                 return user.level
 
-    async def get_leaderboard(self, limit: int = 10):
+    async def add_experience_bulk(self, grants: Dict[int, int], db: AsyncSession = None) -> Dict[int, int]:
+        """Agregar experiencia a muchos usuarios a la vez (user_id -> xp).
+
+        Un SELECT, un UPDATE por lotes y un INSERT masivo con los bonus de
+        nivel, todo en la misma transacción. Devuelve user_id -> nivel.
+        Las filas se bloquean al leerlas: el nivel y el bonus se calculan
+        sobre la experiencia que el UPDATE va a sumar.
+        """
+        grants = {user_id: xp for user_id, xp in grants.items() if xp > 0}
+        if not grants:
+            return {}
+        
+        async with session_scope(db) as db:
+            # Orden fijo de bloqueo para que dos lotes simultáneos no se bloqueen entre sí
+            result = await db.execute(
+                select(User.id, User.level, User.experience, User.is_vip)
+                .where(User.id.in_(list(grants)))
+                .order_by(User.id)
+                .with_for_update()
+            )
+            rows = []
+            bonuses = []
+            levels = {}
+            for user_id, level, experience, is_vip in result:
+                level = level or 1
+                experience = (experience or 0) + grants[user_id]
+                new_level = max(level, level_for_experience(experience))
+                bonus = level_up_bonus(level, new_level)
+                rows.append({"user_id": user_id, "xp": grants[user_id], "level": new_level, "bonus": bonus})
+                if bonus:
+                    bonuses.append({
+                        "user_id": user_id,
+                        "type": "earn",
+                        "amount": bonus,
+                        "description": level_up_description(level, new_level)
+                    })
+                levels[user_id] = new_level
+                
+                after_commit(db, user_cache.invalidate_user, user_id)
+                after_commit(db, ranking_index.update, user_id, new_level, experience)
+                after_commit(db, leaderboards.record, "xp", user_id, grants[user_id], is_vip)
+                after_commit(db, leaderboards.record, "besitos", user_id, bonus, is_vip)
+            
+            if not rows:
+                return {}
+            
+            users = User.__table__
+            await db.execute(
+                update(users)
+                .where(users.c.id == bindparam("user_id"))
+                .values(
+                    experience=users.c.experience + bindparam("xp"),
+                    level=bindparam("level"),
+                    besitos=users.c.besitos + bindparam("bonus"),
+                    total_earned=users.c.total_earned + bindparam("bonus")
+                ),
+                rows
+            )
+            if bonuses:
+                from services.economy_service import EconomyService
+                await EconomyService().record_transactions(bonuses, db=db)
+            return levels
+
+    async def get_leaderboard(self, limit: int = 10, db: AsyncSession = None):
         """Obtener ranking de usuarios"""
-        async for db in get_db():
+        async with session_scope(db) as db:
+            top_ids = ranking_index.top(limit)
+            if top_ids is not None:
+                # Solo se leen por clave primaria los usuarios del top
+                if not top_ids:
+                    return []
+                result = await db.execute(select(User).where(User.id.in_(top_ids)))
+                users = {user.id: user for user in result.scalars()}
+                return [users[user_id] for user_id in top_ids if user_id in users]
+            
             result = await db.execute(
                 select(User)
                 .where(User.is_active == True)
@@ -129,24 +222,60 @@ class UserService:
             )
             return result.scalars().all()
 
-    async def get_user_rank(self, user_id: int) -> int:
+    async def get_period_leaderboard(self, metric: str = "xp", period: str = "weekly", segment: str = "all", limit: int = 10, db: AsyncSession = None) -> list:
+        """Obtener ranking semanal/mensual de XP o besitos ganados (todos o VIP)"""
+        async with session_scope(db) as db:
+            top = leaderboards.top(metric, period, segment, limit)
+            if top is None:
+                # Rankings fríos: leer la tabla de puntuaciones del periodo
+                query = (
+                    select(LeaderboardScore.user_id, LeaderboardScore.score)
+                    .join(User, User.id == LeaderboardScore.user_id)
+                    .where(
+                        LeaderboardScore.metric == metric,
+                        LeaderboardScore.period == period,
+                        LeaderboardScore.period_start == period_start(period)
+                    )
+                    .order_by(LeaderboardScore.score.desc(), LeaderboardScore.user_id.desc())
+                    .limit(limit)
+                )
+                if segment == "vip":
+                    query = query.where(User.is_vip == True)
+                top = (await db.execute(query)).all()
+            
+            if not top:
+                return []
+            result = await db.execute(select(User).where(User.id.in_([user_id for user_id, _ in top])))
+            users = {user.id: user for user in result.scalars()}
+            return [
+                {"user": users[user_id], "score": score}
+                for user_id, score in top if user_id in users
+            ]
+
+    async def get_user_rank(self, user_id: int, db: AsyncSession = None) -> int:
         """Obtener posición del usuario en ranking"""
-        async for db in get_db():
+        rank = ranking_index.rank(user_id)
+        if rank is not None:
+            return rank
+        
+        # Índice frío (o usuario fuera de él): contar en SQL sin traer filas
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user:
                 result = await db.execute(
-                    select(User.id)
+                    select(func.count(User.id))
                     .where(
+                        User.is_active == True,
                         (User.level > user.level) |
                         ((User.level == user.level) & (User.experience > user.experience))
                     )
                 )
-                return len(result.scalars().all()) + 1
+                return result.scalar() + 1
             return 999
 
-    async def can_claim_daily_gift(self, user_id: int) -> bool:
+    async def can_claim_daily_gift(self, user_id: int, db: AsyncSession = None) -> bool:
         """Verificar si puede reclamar regalo diario"""
-        async for db in get_db():
+        async with session_scope(db) as db:
             user = await db.get(User, user_id)
             if user:
                 if not user.last_daily_claim:
@@ -154,29 +283,45 @@ class UserService:
                 return user.last_daily_claim.date() < datetime.now().date()
             return False
 
-    async def claim_daily_gift(self, user_id: int) -> dict:
-        """Reclamar regalo diario"""
-        if not await self.can_claim_daily_gift(user_id):
-            return {"success": False, "message": "Ya reclamaste tu regalo hoy"}
+    async def claim_daily_gift(self, user_id: int, db: AsyncSession = None) -> dict:
+        """Reclamar regalo diario (un único UPDATE condicional)"""
+        base_reward = 50
+        now = datetime.now()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        level_bonus = User.level * 10
+        vip_multiplier = case((User.is_vip == True, 2), else_=1)
         
-        async for db in get_db():
-            user = await db.get(User, user_id)
-            if user:
-                base_reward = 50
-                level_bonus = user.level * 10
-                vip_multiplier = 2 if user.is_vip else 1
-                total_besitos = (base_reward + level_bonus) * vip_multiplier
-                
-                user.besitos += total_besitos
-                user.last_daily_claim = datetime.now()
-                await db.commit()
-                
-                return {
-                    "success": True,
-                    "besitos": total_besitos,
-                    "base": base_reward,
-                    "bonus": level_bonus,
-                    "multiplier": vip_multiplier
-                }
-            return {"success": False, "message": "Usuario no encontrado"}
+        async with session_scope(db) as db:
+            # La condición sobre last_daily_claim evita cobrar dos veces con toques simultáneos;
+            # la recompensa se calcula en SQL con los datos de la fila reclamada
+            result = await db.execute(
+                update(User)
+                .where(
+                    User.id == user_id,
+                    or_(User.last_daily_claim == None, User.last_daily_claim < today)
+                )
+                .values(last_daily_claim=now)
+                .returning((base_reward + level_bonus) * vip_multiplier, level_bonus, vip_multiplier)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.one_or_none()
+            if row is None:
+                if await db.get(User, user_id) is None:
+                    return {"success": False, "message": "Usuario no encontrado"}
+                return {"success": False, "message": "Ya reclamaste tu regalo hoy"}
+            
+            total_besitos, level_bonus, vip_multiplier = row
+            
+            from services.economy_service import EconomyService
+            await EconomyService().change_balance(
+                user_id, total_besitos, "earn", "Regalo diario", db=db
+            )
+            
+            return {
+                "success": True,
+                "besitos": total_besitos,
+                "base": base_reward,
+                "bonus": level_bonus,
+                "multiplier": vip_multiplier
+            }
                   
@@ -0,0 +1,28 @@
+import asyncio
+import pytest
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """Base SQLite temporal; session_scope() abre sus sesiones en ella"""
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    import database.connection
+    from config.database import Base
+    import database.models
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_db():
+        async with factory() as session:
+            yield session
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    monkeypatch.setattr(database.connection, "get_db", get_db)
+    asyncio.run(create_tables())
+    yield factory
+    asyncio.run(engine.dispose())
@@ -0,0 +1,60 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+# "SCAN transactions" (o "SCAN TABLE transactions" en SQLite antiguo) = recorrido completo
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+
+def hot_queries():
+    """Consultas frecuentes de los servicios que deben resolverse con índice"""
+    from services.economy_service import EconomyService
+    from services.store_service import StoreService
+    from services.auction_service import AuctionService
+    from utils.helpers import encode_cursor
+
+    economy, store, auctions = EconomyService(), StoreService(), AuctionService()
+    cursor = encode_cursor(datetime.now() - timedelta(days=30), 100)
+    return {
+        "economy_stats": economy.economy_stats_query(1),
+        "transaction_history": economy.transaction_history_query(1),
+        "transaction_page": economy.transaction_page_query(1, cursor),
+        "transaction_page_newer": economy.transaction_page_query(1, cursor, "prev"),
+        "auction_bids": auctions.auction_bids_query(1),
+        "held_bids": auctions.held_bids_query(1),
+        "user_purchases": store.user_purchases_query(1),
+        "owned_item_ids": store.owned_item_ids_query(1),
+        "inventory_page": store.inventory_page_query(1, cursor),
+    }
+
+def test_run_migrations_is_idempotent(session_factory):
+    from database.migrations import MIGRATIONS, run_migrations, get_applied_versions
+
+    async def run():
+        first = await run_migrations()
+        second = await run_migrations()
+        applied = await get_applied_versions()
+        return first, second, applied
+
+    first, second, applied = asyncio.run(run())
+    assert first == len(MIGRATIONS)
+    assert second == 0
+    assert applied == {migration.version for migration in MIGRATIONS}
+
+def test_hot_queries_use_indexes(session_factory):
+    from sqlalchemy import text
+    from sqlalchemy.dialects import sqlite
+    from database.migrations import run_migrations
+
+    async def explain():
+        plans = {}
+        async with session_factory() as db:
+            await run_migrations()
+            for name, query in hot_queries().items():
+                sql = query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
+                result = await db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+                plans[name] = [row[-1] for row in result]
+        return plans
+
+    for name, plan in asyncio.run(explain()).items():
+        scans = [step for step in plan if FULL_SCAN.match(step)]
+        assert not scans, f"{name} recorre la tabla completa: {plan}"
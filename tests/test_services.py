@@ -0,0 +1,727 @@
+import asyncio
+import random
+from types import SimpleNamespace
+import pytest
+
+def test_concurrent_purchases_never_oversell(session_factory):
+    from sqlalchemy import select, func
+    from database.models import User, StoreItem, Purchase, Transaction
+    from services.store_service import StoreService
+    from services.store_catalog import store_catalog
+
+    stock = 5
+    buyers = 40
+    price = 50
+
+    async def run():
+        async with session_factory() as db:
+            # La mitad de los compradores no tiene besitos suficientes
+            db.add_all(
+                User(telegram_id=i, first_name=f"user{i}", besitos=price if i % 2 else price - 1)
+                for i in range(buyers)
+            )
+            item = StoreItem(name="Edición limitada", price_besitos=price, category="premium", stock=stock)
+            db.add(item)
+            await db.commit()
+            user_ids = (await db.execute(select(User.id))).scalars().all()
+            item_id = item.id
+
+        store_catalog.invalidate()
+        store_service = StoreService()
+        results = await asyncio.gather(*(
+            store_service.purchase_item(user_id, item_id) for user_id in user_ids
+        ))
+
+        async with session_factory() as db:
+            final_stock = (await db.execute(select(StoreItem.stock).where(StoreItem.id == item_id))).scalar()
+            purchases = (await db.execute(select(func.count(Purchase.id)))).scalar()
+            spends = (await db.execute(
+                select(func.count(Transaction.id)).where(Transaction.type == "spend")
+            )).scalar()
+            total_besitos = (await db.execute(select(func.sum(User.besitos)))).scalar()
+        return results, final_stock, purchases, spends, total_besitos
+
+    results, final_stock, purchases, spends, total_besitos = asyncio.run(run())
+
+    sold = sum(1 for result in results if result["success"])
+    assert sold == stock
+    assert final_stock == 0
+    assert purchases == stock
+    assert spends == stock
+    initial_besitos = sum(price if i % 2 else price - 1 for i in range(buyers))
+    assert total_besitos == initial_besitos - stock * price
+    assert all(
+        result["message"] in ("Item agotado", "Besitos insuficientes")
+        for result in results if not result["success"]
+    )
+
+def test_recommendations_count_each_buyer_once_per_segment():
+    pytest.importorskip("sqlalchemy")
+    from services.recommendation_engine import build_recommendations
+
+    items = [SimpleNamespace(id=1, category="misc"), SimpleNamespace(id=2, category="misc")]
+    # Dos compradores sin arquetipo eligen el item 1 y tres románticos el item 2
+    purchases = [(user_id, 1, 1, None) for user_id in range(2)]
+    purchases += [(user_id, 2, 1, "romantic") for user_id in range(2, 5)]
+
+    lists = build_recommendations(purchases, items)
+
+    assert lists[("beginner", "romantic")] == (2, 1)
+    # La lista general del tramo cuenta a cada comprador una sola vez
+    assert lists[("beginner", None)] == (2, 1)
+    assert set(lists) >= {("intermediate", None), ("expert", None)}
+
+def test_recommendations_skip_inactive_and_vip_items_for_free_users(session_factory, monkeypatch):
+    from database.models import StoreItem, User, Purchase
+    import services.store_service
+    from services.store_service import StoreService
+    from services.store_catalog import store_catalog
+    from services.recommendation_engine import RecommendationEngine
+
+    async def run():
+        async with session_factory() as db:
+            items = [
+                StoreItem(name="Exclusivo", price_besitos=10, category="vip_exclusive"),
+                StoreItem(name="Retirado", price_besitos=10, category="beginner"),
+                StoreItem(name="Básico 1", price_besitos=10, category="basic"),
+                StoreItem(name="Básico 2", price_besitos=10, category="basic"),
+                StoreItem(name="Básico 3", price_besitos=10, category="basic"),
+            ]
+            db.add_all(items)
+            await db.commit()
+            ids = [item.id for item in items]
+
+            # Listas calculadas cuando todo estaba activo: los dos primeros son los más populares
+            users = [User(telegram_id=i, first_name=f"user{i}") for i in range(11)]
+            db.add_all(users)
+            await db.flush()
+            db.add_all(
+                Purchase(user_id=user.id, item_id=item_id, price_paid=10)
+                for user in users[:10] for item_id in ids[:2]
+            )
+            db.add(Purchase(user_id=users[10].id, item_id=ids[2], price_paid=10))
+            await db.commit()
+            store_catalog.invalidate()
+            engine = RecommendationEngine()
+            await engine.refresh()
+
+            items[1].is_active = False
+            await db.commit()
+
+        monkeypatch.setattr(services.store_service, "recommendation_engine", engine)
+        store_catalog.invalidate()
+        store_service = StoreService()
+        free = SimpleNamespace(level=1, user_archetype=None, role="free")
+        vip = SimpleNamespace(level=1, user_archetype=None, role="vip")
+        free_items = await store_service.get_lucien_recommendations(1, user=free, owned_ids=frozenset())
+        vip_items = await store_service.get_lucien_recommendations(2, user=vip, owned_ids=frozenset())
+        owner_items = await store_service.get_lucien_recommendations(3, user=vip, owned_ids=frozenset(ids[:1]))
+        return ids, [item.id for item in free_items], [item.id for item in vip_items], [item.id for item in owner_items]
+
+    ids, free_ids, vip_ids, owner_ids = asyncio.run(run())
+    exclusive, retired = ids[0], ids[1]
+    assert sorted(free_ids) == ids[2:5]
+    assert vip_ids[0] == exclusive
+    assert retired not in vip_ids
+    assert len(vip_ids) == 3
+    # Lo ya comprado se salta y se completa con el siguiente de la lista
+    assert sorted(owner_ids) == ids[2:5]
+
+def test_auction_settlement_is_set_based(session_factory):
+    from datetime import datetime, timedelta
+    from sqlalchemy import event, insert, select, func
+    from database.models import User, Auction, AuctionBid, Transaction
+    from services.auction_service import AuctionService
+    from database.migrations import run_migrations
+
+    bidders = 2000
+    bids = 10000
+    initial = 100000
+    rng = random.Random(3)
+    statements = []
+
+    async def run():
+        now = datetime.now()
+        async with session_factory() as db:
+            db.add_all(User(telegram_id=i, first_name=f"user{i}", besitos=initial) for i in range(bidders))
+            auction = Auction(
+                title="Noche con Diana", starting_price=10, current_price=10,
+                starts_at=now - timedelta(hours=1), ends_at=now - timedelta(seconds=1)
+            )
+            db.add(auction)
+            await db.commit()
+            auction_id = auction.id
+            user_ids = (await db.execute(select(User.id))).scalars().all()
+
+            # Pujas crecientes; cada postor tiene retenida su última puja
+            held = {}
+            rows = []
+            for amount in range(11, 11 + bids):
+                user_id = rng.choice(user_ids)
+                held[user_id] = amount
+                rows.append({"auction_id": auction_id, "user_id": user_id, "amount": amount, "created_at": now})
+            await db.execute(insert(AuctionBid), rows)
+            for user_id, amount in held.items():
+                (await db.get(User, user_id)).besitos = initial - amount
+            await db.commit()
+            await run_migrations()
+
+        engine = session_factory.kw["bind"].sync_engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        result = await AuctionService().end_auction(auction_id)
+        event.remove(engine, "before_cursor_execute", listener)
+        again = await AuctionService().end_auction(auction_id)
+
+        async with session_factory() as db:
+            balances = dict((await db.execute(select(User.id, User.besitos))).all())
+            refunds = (await db.execute(
+                select(func.count(Transaction.id)).where(Transaction.type == "refund")
+            )).scalar()
+        return held, result, again, balances, refunds
+
+    held, result, again, balances, refunds = asyncio.run(run())
+
+    winner_id = max(held, key=held.get)
+    assert result["winner_id"] == winner_id
+    assert result["winning_amount"] == bids + 10
+    assert not again["success"]
+    assert balances[winner_id] == initial - held[winner_id]
+    assert all(balance == initial for user_id, balance in balances.items() if user_id != winner_id)
+    assert refunds == len(held)
+    # Número de sentencias constante, sin importar cuántas pujas o postores haya
+    assert len(statements) < 12
+
+def test_auction_scheduler_closes_at_deadlines_with_fake_clock(session_factory, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import select
+    from database.models import Auction
+    import services.auction_service
+    from services.auction_service import AuctionService
+    from services.auction_scheduler import AuctionScheduler
+
+    class FakeClock:
+        def __init__(self, now):
+            self.now = now
+
+        def __call__(self):
+            return self.now
+
+    base = datetime.now()
+    clock = FakeClock(base)
+    scheduler = AuctionScheduler(clock=clock)
+    monkeypatch.setattr(services.auction_service, "auction_scheduler", scheduler)
+
+    async def active_ids():
+        async with session_factory() as db:
+            result = await db.execute(select(Auction.id).where(Auction.is_active == True))
+            return set(result.scalars())
+
+    async def settle(expected):
+        # El programador corre en su propia tarea; se le da tiempo real para actuar
+        for _ in range(200):
+            if await active_ids() == expected:
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    async def run():
+        async with session_factory() as db:
+            # Venció mientras el bot estaba apagado
+            missed = Auction(
+                title="Olvidada", starting_price=10, current_price=10,
+                starts_at=base - timedelta(hours=2), ends_at=base - timedelta(hours=1)
+            )
+            db.add(missed)
+            await db.commit()
+
+        await scheduler.start()
+        assert await settle(set())
+
+        service = AuctionService()
+        first = await service.create_auction({
+            "title": "Primera", "starting_price": 10,
+            "starts_at": base + timedelta(minutes=1), "ends_at": base + timedelta(minutes=5)
+        })
+        second = await service.create_auction({
+            "title": "Segunda", "starting_price": 10,
+            "starts_at": base + timedelta(minutes=1), "ends_at": base + timedelta(minutes=10)
+        })
+        assert scheduler.next_deadline() == base + timedelta(minutes=1)
+
+        # Un segundo antes del cierre no pasa nada
+        clock.now = base + timedelta(minutes=5, seconds=-1)
+        scheduler.wake()
+        await asyncio.sleep(0.1)
+        assert await active_ids() == {first.id, second.id}
+
+        clock.now = base + timedelta(minutes=5)
+        scheduler.wake()
+        assert await settle({second.id})
+        assert scheduler.next_deadline() == base + timedelta(minutes=10)
+
+        clock.now = base + timedelta(hours=1)
+        scheduler.wake()
+        assert await settle(set())
+        assert scheduler.next_deadline() is None
+        await scheduler.stop()
+        # Cierre de las tres subastas e inicio de las dos nuevas
+        return scheduler.fired
+
+    assert asyncio.run(run()) == 5
+
+def test_failed_settlement_reopens_and_reschedules_auction(session_factory, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, select
+    from database.models import User, Auction, AuctionBid
+    import services.auction_service
+    from services.auction_service import AuctionService, SETTLEMENT_RETRY_DELAY
+    from services.auction_scheduler import AuctionScheduler
+    from services.auction_book import auction_books
+    from services.economy_service import EconomyService
+
+    base = datetime.now()
+    scheduler = AuctionScheduler(clock=lambda: base)
+    monkeypatch.setattr(services.auction_service, "auction_scheduler", scheduler)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("fallo de liquidación")
+
+    async def run():
+        async with session_factory() as db:
+            user = User(telegram_id=1, first_name="user1", besitos=80)
+            auction = Auction(
+                title="Noche con Diana", starting_price=10, current_price=20,
+                starts_at=base - timedelta(hours=1), ends_at=base + timedelta(hours=1)
+            )
+            db.add_all([user, auction])
+            await db.commit()
+            await db.execute(insert(AuctionBid), [{"auction_id": auction.id, "user_id": user.id, "amount": 20}])
+            await db.commit()
+            auction_id, user_id = auction.id, user.id
+
+        # Cierre anticipado (p. ej. por un admin) cuya liquidación falla
+        service = AuctionService()
+        with monkeypatch.context() as patch:
+            patch.setattr(EconomyService, "record_transactions", fail)
+            with pytest.raises(RuntimeError):
+                await service.end_auction(auction_id)
+
+        async with session_factory() as db:
+            still_active = (await db.execute(select(Auction.is_active).where(Auction.id == auction_id))).scalar()
+        bid = await auction_books.submit(auction_id, user_id, 30)
+        retry_at = scheduler.next_deadline()
+
+        scheduler.clock = lambda: retry_at
+        fired = await scheduler.run_due()
+        async with session_factory() as db:
+            auction = await db.get(Auction, auction_id)
+            besitos = (await db.execute(select(User.besitos).where(User.id == user_id))).scalar()
+        return still_active, bid, retry_at, fired, auction, user_id, besitos
+
+    still_active, bid, retry_at, fired, auction, user_id, besitos = asyncio.run(run())
+    assert still_active
+    # El libro vuelve a aceptar pujas y el cierre sigue programado
+    assert bid["success"]
+    assert retry_at == base + timedelta(hours=1)
+    assert fired == 1
+    assert not auction.is_active
+    assert auction.winner_id == user_id
+    assert auction.current_price == 30
+    assert besitos == 70
+
+def test_failed_settlement_after_deadline_is_retried_later(session_factory, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, select
+    from database.models import User, Auction, AuctionBid
+    import services.auction_service
+    from services.auction_service import AuctionService, SETTLEMENT_RETRY_DELAY
+    from services.auction_scheduler import AuctionScheduler
+    from services.auction_book import auction_books
+    from services.economy_service import EconomyService
+
+    base = datetime.now()
+    scheduler = AuctionScheduler(clock=lambda: base)
+    monkeypatch.setattr(services.auction_service, "auction_scheduler", scheduler)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("fallo de liquidación")
+
+    async def run():
+        async with session_factory() as db:
+            user = User(telegram_id=1, first_name="user1", besitos=80)
+            auction = Auction(
+                title="Vencida", starting_price=10, current_price=20,
+                starts_at=base - timedelta(hours=1), ends_at=base - timedelta(seconds=1)
+            )
+            db.add_all([user, auction])
+            await db.commit()
+            await db.execute(insert(AuctionBid), [{"auction_id": auction.id, "user_id": user.id, "amount": 20}])
+            await db.commit()
+            auction_id = auction.id
+
+        with monkeypatch.context() as patch:
+            patch.setattr(EconomyService, "record_transactions", fail)
+            with pytest.raises(RuntimeError):
+                await AuctionService().end_auction(auction_id)
+
+        async with session_factory() as db:
+            still_active = (await db.execute(select(Auction.is_active).where(Auction.id == auction_id))).scalar()
+        bid = await auction_books.submit(auction_id, 1, 50)
+        return still_active, bid, scheduler.next_deadline()
+
+    still_active, bid, retry_at = asyncio.run(run())
+    assert still_active
+    # Vencida: se siguen rechazando pujas, pero el cierre se reintenta
+    assert not bid["success"]
+    assert retry_at == base + SETTLEMENT_RETRY_DELAY
+
+def test_narrative_progress_invalidates_cached_user(session_factory):
+    from database.models import User
+    from services.narrative_service import NarrativeService
+    from services.user_cache import user_cache
+
+    async def run():
+        async with session_factory() as db:
+            user = User(telegram_id=4242, first_name="user", narrative_level=1)
+            db.add(user)
+            await db.commit()
+
+        user_cache.set(user)
+        await NarrativeService().advance_narrative(user.id, {"level": 2, "scene": "1", "state_data": {}})
+        advanced = user_cache.get(user.telegram_id)
+
+        user_cache.set(user)
+        await NarrativeService().unlock_next_level(user.id)
+        unlocked = user_cache.get(user.telegram_id)
+        return advanced, unlocked
+
+    advanced, unlocked = asyncio.run(run())
+    assert advanced is None
+    assert unlocked is None
+
+def test_daily_gift_is_claimed_once_and_reports_unknown_users(session_factory):
+    from sqlalchemy import select
+    from database.models import User, Transaction
+    from services.user_service import UserService
+
+    async def run():
+        async with session_factory() as db:
+            user = User(telegram_id=7, first_name="user7", level=3, is_vip=True, besitos=100, total_earned=100)
+            db.add(user)
+            await db.commit()
+
+        user_service = UserService()
+        first = await user_service.claim_daily_gift(user.id)
+        second = await user_service.claim_daily_gift(user.id)
+        missing = await user_service.claim_daily_gift(user.id + 1000)
+
+        async with session_factory() as db:
+            saved = await db.get(User, user.id)
+            amounts = (await db.execute(
+                select(Transaction.amount).where(Transaction.user_id == user.id, Transaction.type == "earn")
+            )).scalars().all()
+        return first, second, missing, saved, amounts
+
+    first, second, missing, saved, amounts = asyncio.run(run())
+    assert first["success"]
+    assert (first["besitos"], first["bonus"], first["multiplier"]) == (160, 30, 2)
+    assert saved.besitos == saved.total_earned == 260
+    assert amounts == [160]
+    assert second["message"] == "Ya reclamaste tu regalo hoy"
+    assert missing["message"] == "Usuario no encontrado"
+
+def test_ledger_compaction_keeps_one_summary_per_day_across_batches(session_factory):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, select, func
+    from database.models import User, Transaction
+    from services.ledger_compaction import LedgerCompactor, COMPACTED_REFERENCE
+
+    compactor = LedgerCompactor(age_days=90, batch_size=3)
+    old_day = compactor.cutoff() - timedelta(days=10)
+
+    async def run():
+        async with session_factory() as db:
+            user = User(telegram_id=90, first_name="user90")
+            db.add(user)
+            await db.commit()
+            # 7 movimientos del mismo día (tres lotes) y 2 del día siguiente
+            rows = [
+                {"user_id": user.id, "type": "earn", "amount": 10, "created_at": old_day + timedelta(hours=i)}
+                for i in range(7)
+            ] + [
+                {"user_id": user.id, "type": "earn", "amount": 5, "created_at": old_day + timedelta(days=1, hours=i)}
+                for i in range(2)
+            ]
+            await db.execute(insert(Transaction), rows)
+            await db.commit()
+
+        archived = await compactor.compact()
+
+        async with session_factory() as db:
+            summaries = (await db.execute(
+                select(Transaction.created_at, Transaction.amount, Transaction.description)
+                .where(Transaction.reference_id == COMPACTED_REFERENCE)
+                .order_by(Transaction.created_at)
+            )).all()
+            total = (await db.execute(select(func.sum(Transaction.amount)))).scalar()
+        return archived, summaries, total
+
+    archived, summaries, total = asyncio.run(run())
+    assert archived == 9
+    assert [(amount, description) for _, amount, description in summaries] == [
+        (70, "Resumen del día: 7 movimientos"),
+        (10, "Resumen del día: 2 movimientos"),
+    ]
+    assert total == 80
+
+def test_flash_sale_serializes_buyers_and_isolates_failures(session_factory):
+    from sqlalchemy import select, func
+    from database.models import User, StoreItem, Purchase
+    from services.store_service import StoreService
+    from services.store_catalog import store_catalog
+    from services.flash_sale import FlashSaleManager
+
+    stock = 5
+    buyers = 40
+    price = 50
+
+    async def run():
+        async with session_factory() as db:
+            db.add_all(
+                User(telegram_id=i, first_name=f"user{i}", besitos=price if i % 2 else price - 1)
+                for i in range(buyers)
+            )
+            item = StoreItem(name="Edición flash", price_besitos=price, category="premium", stock=stock)
+            db.add(item)
+            await db.commit()
+            user_ids = (await db.execute(select(User.id).order_by(User.id))).scalars().all()
+            item_id = item.id
+
+        store_catalog.invalidate()
+        store_service = StoreService()
+        # El primer comprador con saldo falla después de escribir: solo se deshace su compra
+        failing_user = user_ids[1]
+
+        async def purchase(user_id, item_id, db):
+            result = await store_service._purchase_item(user_id, item_id, db)
+            if user_id == failing_user:
+                raise RuntimeError("fallo en una compra")
+            return result
+
+        sales = FlashSaleManager(batch_size=8)
+        sale = sales.start(item_id, stock, purchase)
+        results = await asyncio.gather(
+            *(sales.submit(item_id, user_id) for user_id in user_ids),
+            return_exceptions=True
+        )
+        stats = await sales.stop(item_id)
+
+        async with session_factory() as db:
+            final_stock = (await db.execute(select(StoreItem.stock).where(StoreItem.id == item_id))).scalar()
+            purchases = (await db.execute(select(func.count(Purchase.id)))).scalar()
+            failing_besitos = (await db.execute(select(User.besitos).where(User.id == failing_user))).scalar()
+        return results, stats, final_stock, purchases, failing_besitos, user_ids.index(failing_user)
+
+    results, stats, final_stock, purchases, failing_besitos, failing_index = asyncio.run(run())
+
+    assert isinstance(results[failing_index], RuntimeError)
+    outcomes = [result for result in results if not isinstance(result, Exception)]
+    assert len(outcomes) == len(results) - 1
+    assert sum(1 for result in outcomes if result["success"]) == stock
+    assert all(
+        result["message"] in ("Item agotado", "Besitos insuficientes")
+        for result in outcomes if not result["success"]
+    )
+    assert final_stock == 0
+    assert purchases == stock
+    assert failing_besitos == 50
+    assert stats["sold"] == stock
+    # Los compradores se atendieron por lotes, no uno por transacción
+    assert stats["batches"] < len(results)
+
+def test_new_user_is_cached_only_after_commit(session_factory):
+    from services.user_service import UserService
+    from services.user_cache import user_cache
+
+    user_data = {"telegram_id": 5150, "first_name": "nuevo"}
+
+    async def run():
+        async with session_factory() as db:
+            await UserService().get_or_create_user(user_data, db=db)
+            cached_before_commit = user_cache.get(5150)
+            await db.rollback()
+        rolled_back = user_cache.get(5150)
+
+        async with session_factory() as db:
+            user = await UserService().get_or_create_user(user_data, db=db)
+            await db.commit()
+        return cached_before_commit, rolled_back, user, user_cache.get(5150)
+
+    cached_before_commit, rolled_back, user, cached = asyncio.run(run())
+    assert cached_before_commit is None
+    assert rolled_back is None
+    assert cached is user
+
+def test_stale_file_id_is_reuploaded_inside_the_update_session(session_factory):
+    pytest.importorskip("aiogram")
+    from aiogram.exceptions import TelegramBadRequest
+    from sqlalchemy import select
+    from database.models import StoreItem
+    from services.store_catalog import store_catalog
+    from services.media_service import MediaService
+
+    class Bot:
+        def __init__(self):
+            self.sent = []
+
+        async def send_photo(self, chat_id, media, caption=None):
+            self.sent.append((chat_id, media))
+            if chat_id == 666:
+                raise TelegramBadRequest(None, "Bad Request: chat not found")
+            if media == "OLD":
+                raise TelegramBadRequest(None, "Bad Request: wrong file identifier/HTTP URL specified")
+            return SimpleNamespace(photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id="NEW")])
+
+    async def file_id(item_id):
+        async with session_factory() as db:
+            return (await db.execute(select(StoreItem.telegram_file_id).where(StoreItem.id == item_id))).scalar()
+
+    async def run():
+        async with session_factory() as db:
+            item = StoreItem(
+                name="Foto", price_besitos=10, category="premium",
+                content_type="photo", content_url="https://example.com/foto.jpg", telegram_file_id="OLD"
+            )
+            db.add(item)
+            await db.commit()
+        store_catalog.invalidate()
+        media, bot = MediaService(), Bot()
+
+        # Un chat inaccesible no invalida el file_id
+        unreachable = await media.deliver(bot, 666, item)
+        kept = await file_id(item.id)
+
+        # Como en open_item_: la entrega usa la sesión de la actualización, sin confirmar aún
+        async with session_factory() as db:
+            delivered = await media.deliver(bot, 42, item, db=db)
+            await db.commit()
+        return unreachable, kept, delivered, bot.sent, await file_id(item.id)
+
+    unreachable, kept, delivered, sent, saved = asyncio.run(run())
+    assert unreachable is False
+    assert kept == "OLD"
+    assert delivered is True
+    assert sent[1:] == [(42, "OLD"), (42, "https://example.com/foto.jpg")]
+    assert saved == "NEW"
+
+def test_closed_auction_watchers_survive_a_rate_limited_flush():
+    pytest.importorskip("aiogram")
+    from aiogram.exceptions import TelegramRetryAfter
+    from services.auction_watchers import AuctionWatchers
+
+    class Bot:
+        def __init__(self):
+            self.limited = True
+            self.edited = []
+
+        async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+            if self.limited:
+                self.limited = False
+                raise TelegramRetryAfter(None, "Too Many Requests", retry_after=0)
+            self.edited.append((chat_id, message_id, text))
+
+    async def load(auction_id):
+        return SimpleNamespace(id=auction_id, is_active=False)
+
+    async def run():
+        # La vuelta periódica no llega a correr: las vueltas se fuerzan con flush()
+        watchers = AuctionWatchers(interval=3600, edits_per_second=1000)
+        watchers.configure(load, lambda auction, user_id: ("🏁 Subasta finalizada", None))
+        bot = Bot()
+        await watchers.start(bot)
+        watchers.watch(1, chat_id=10, message_id=100, user_id=1, shown_text="abierta")
+        watchers.watch(1, chat_id=20, message_id=200, user_id=2, shown_text="abierta")
+
+        watchers.notify(1, final=True)
+        await watchers.flush()
+        pending = watchers.count(1)
+        await watchers.flush()
+        await watchers.stop()
+        return bot.edited, pending, watchers.count(1)
+
+    edited, pending, remaining = asyncio.run(run())
+    # El primer envío choca con el límite: los mensajes siguen registrados hasta editarse
+    assert pending == 2
+    assert sorted(edited) == [(10, 100, "🏁 Subasta finalizada"), (20, 200, "🏁 Subasta finalizada")]
+    assert remaining == 0
+
+def test_auction_book_is_rebuilt_from_persisted_bids_and_isolates_failed_bids(session_factory, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, select
+    from database.models import User, Auction, AuctionBid
+    from services.auction_book import AuctionBookManager
+    from services.economy_service import EconomyService
+
+    initial = 1000
+
+    async def run():
+        now = datetime.now()
+        async with session_factory() as db:
+            users = [User(telegram_id=i, first_name=f"user{i}", besitos=initial) for i in range(4)]
+            auction = Auction(
+                title="Carta de Diana", starting_price=10, current_price=10,
+                starts_at=now - timedelta(hours=1), ends_at=now + timedelta(hours=1)
+            )
+            db.add_all([*users, auction])
+            await db.flush()
+            # Pujas persistidas antes de un reinicio: a cada postor se le retuvo su última puja
+            await db.execute(insert(AuctionBid), [
+                {"auction_id": auction.id, "user_id": users[0].id, "amount": 20, "created_at": now},
+                {"auction_id": auction.id, "user_id": users[1].id, "amount": 30, "created_at": now},
+                {"auction_id": auction.id, "user_id": users[0].id, "amount": 40, "created_at": now},
+            ])
+            users[0].besitos, users[1].besitos = initial - 40, initial - 30
+            auction.current_price = 40
+            await db.commit()
+            user_ids = [user.id for user in users]
+
+        change_balance = EconomyService.change_balance
+
+        async def failing_change_balance(self, user_id, *args, **kwargs):
+            if user_id == user_ids[2]:
+                raise RuntimeError("fallo al retener")
+            return await change_balance(self, user_id, *args, **kwargs)
+
+        monkeypatch.setattr(EconomyService, "change_balance", failing_change_balance)
+
+        books = AuctionBookManager()
+        book = await books.get(auction.id)
+        rebuilt = (book.current_price, book.leader_id, dict(book.held))
+
+        # Las tres pujas entran en el mismo lote; la que falla no arrastra a las demás
+        results = await asyncio.gather(
+            books.submit(auction.id, user_ids[1], 50),
+            books.submit(auction.id, user_ids[2], 60),
+            books.submit(auction.id, user_ids[3], 70),
+            return_exceptions=True
+        )
+        await books.stop()
+
+        async with session_factory() as db:
+            balances = dict((await db.execute(select(User.id, User.besitos))).all())
+            bids = (await db.execute(
+                select(AuctionBid.user_id, AuctionBid.amount).where(AuctionBid.amount > 40)
+            )).all()
+        return user_ids, rebuilt, results, balances, sorted(bids)
+
+    user_ids, rebuilt, results, balances, bids = asyncio.run(run())
+
+    assert rebuilt == (40, user_ids[0], {user_ids[0]: 40, user_ids[1]: 30})
+    assert results[0]["success"] and results[2]["success"]
+    assert isinstance(results[1], RuntimeError)
+    assert bids == [(user_ids[1], 50), (user_ids[3], 70)]
+    # Con el libro reconstruido solo se retiene la diferencia con la puja anterior
+    assert balances[user_ids[1]] == initial - 50
+    assert balances[user_ids[2]] == initial
+    assert balances[user_ids[3]] == initial - 70
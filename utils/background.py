@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class BackgroundTask:
+    """Tarea de fondo de un servicio; como mucho una en marcha a la vez"""
+
+    def __init__(self, run: Callable[[], Awaitable[None]]):
+        self._run = run
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> bool:
+        """Arrancar la tarea si no está en marcha; False si no hay event loop"""
+        if self.running:
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._task = loop.create_task(self._run())
+        return True
+
+    async def stop(self):
+        """Cancelar la tarea y esperar a que termine"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class PeriodicTask(BackgroundTask):
+    """Ejecutar action cada interval segundos.
+
+    Un error en una vuelta se registra y la tarea sigue con la siguiente.
+    Con immediate=True la primera vuelta se ejecuta al arrancar en lugar
+    de esperar el primer intervalo.
+    """
+
+    def __init__(self, action: Callable[[], Awaitable], interval: float, error_message: str, immediate: bool = False):
+        super().__init__(self._loop)
+        self.action = action
+        self.interval = interval
+        self.error_message = error_message
+        self.immediate = immediate
+
+    async def _loop(self):
+        if not self.immediate:
+            await asyncio.sleep(self.interval)
+        while True:
+            try:
+                await self.action()
+            except Exception as e:
+                logger.warning(f"⚠️ {self.error_message}: {e}")
+            await asyncio.sleep(self.interval)
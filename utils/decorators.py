@@ -0,0 +1,32 @@
+import functools
+from aiogram.types import CallbackQuery
+from services.admin_service import AdminService
+
+NOT_ALLOWED = "⛔ No tienes permiso para hacer esto"
+
+def admin_required(handler):
+    """Solo administradores; el handler recibe los datos del admin como admin"""
+    return _require(handler, super_admin=False)
+
+def super_admin_required(handler):
+    """Solo super administradores"""
+    return _require(handler, super_admin=True)
+
+def _require(handler, super_admin: bool):
+    admin_service = AdminService()
+
+    @functools.wraps(handler)
+    async def wrapper(self, event, user, db=None, **kwargs):
+        admin = await admin_service.get_admin(user, db=db)
+        if admin is None or (super_admin and admin["role"] != "super_admin"):
+            if isinstance(event, CallbackQuery):
+                await event.answer(NOT_ALLOWED, show_alert=True)
+            else:
+                await event.answer(NOT_ALLOWED)
+            return
+        return await handler(self, event, user, admin)
+
+    # aiogram elige qué datos pasar mirando la firma: debe ver la del wrapper
+    # (que acepta db y el resto), no la del handler envuelto
+    del wrapper.__wrapped__
+    return wrapper
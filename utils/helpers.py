@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+from typing import Tuple
+
+_CURSOR_EPOCH = datetime(1970, 1, 1)
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def to_base36(number: int) -> str:
+    """Representar un entero no negativo en base 36"""
+    digits = []
+    while True:
+        number, remainder = divmod(number, 36)
+        digits.append(_BASE36[remainder])
+        if not number:
+            return "".join(reversed(digits))
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Cursor opaco para paginar por (created_at, id); cabe en callback_data"""
+    micros = (created_at - _CURSOR_EPOCH) // timedelta(microseconds=1)
+    return f"{to_base36(micros)}.{to_base36(row_id)}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Recuperar (created_at, id) de un cursor; ValueError si no es válido"""
+    try:
+        micros, row_id = (int(part, 36) for part in cursor.split("."))
+        return _CURSOR_EPOCH + timedelta(microseconds=micros), row_id
+    except OverflowError as e:
+        raise ValueError(f"Cursor fuera de rango: {cursor}") from e
@@ -7,32 +7,32 @@ def create_start_keyboard(user, is_new: bool = False) -> InlineKeyboardMarkup:
     
     if is_new:
         buttons.extend([
-            [InlineKeyboardButton("✨ Conocer a Diana", callback_data="narrative_1_1")],
-            [InlineKeyboardButton("🎭 ¿Quién es Lucien?", callback_data="intro_lucien")],
-            [InlineKeyboardButton("🔥 Explorar DianaBot", callback_data="intro_bot")]
+            [InlineKeyboardButton(text="✨ Conocer a Diana", callback_data="narrative_1_1")],
+            [InlineKeyboardButton(text="🎭 ¿Quién es Lucien?", callback_data="intro_lucien")],
+            [InlineKeyboardButton(text="🔥 Explorar DianaBot", callback_data="intro_bot")]
         ])
     else:
         buttons.extend([
             [
-                InlineKeyboardButton("👤 Mi Perfil", callback_data="user_profile"),
-                InlineKeyboardButton("🎯 Misiones", callback_data="user_missions")
+                InlineKeyboardButton(text="👤 Mi Perfil", callback_data="user_profile"),
+                InlineKeyboardButton(text="🎯 Misiones", callback_data="user_missions")
             ],
             [
-                InlineKeyboardButton("🎮 Juegos", callback_data="user_games"),
-                InlineKeyboardButton("🎒 Mochila", callback_data="user_backpack")
+                InlineKeyboardButton(text="🎮 Juegos", callback_data="user_games"),
+                InlineKeyboardButton(text="🎒 Mochila", callback_data="user_backpack")
             ],
             [
-                InlineKeyboardButton("🏪 Tienda de Lucien", callback_data="store_main"),
-                InlineKeyboardButton("🏆 Subastas", callback_data="auction_main")
+                InlineKeyboardButton(text="🏪 Tienda de Lucien", callback_data="store_main"),
+                InlineKeyboardButton(text="🏆 Subastas", callback_data="auction_main")
             ]
         ])
         
         if user.is_vip or user.level >= 5:
-            buttons.append([InlineKeyboardButton("👑 Contenido VIP", callback_data="vip_content")])
+            buttons.append([InlineKeyboardButton(text="👑 Contenido VIP", callback_data="vip_content")])
     
     # Administradores
     if hasattr(user, 'is_admin') and user.is_admin:
-        buttons.append([InlineKeyboardButton("🏛️ Panel Admin", callback_data="admin_panel")])
+        buttons.append([InlineKeyboardButton(text="🏛️ Panel Admin", callback_data="admin_panel")])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -42,21 +42,21 @@ def create_narrative_keyboard(buttons_config: List[Dict]) -> InlineKeyboardMarku
         # Casos especiales
         if buttons_config == "vip_promotion":
             return InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton("💎 Obtener VIP", callback_data="vip_info")],
-                [InlineKeyboardButton("🔙 Volver", callback_data="narrative_menu")]
+                [InlineKeyboardButton(text="💎 Obtener VIP", callback_data="vip_info")],
+                [InlineKeyboardButton(text="🔙 Volver", callback_data="narrative_menu")]
             ])
     
     buttons = []
     for button_config in buttons_config:
         if isinstance(button_config, dict):
             buttons.append([InlineKeyboardButton(
-                button_config["text"], 
+                text=button_config["text"], 
                 callback_data=button_config["callback"]
             )])
     
     # Siempre agregar navegación
-    buttons.append([InlineKeyboardButton("📚 Menú Narrativa", callback_data="narrative_menu")])
-    buttons.append([InlineKeyboardButton("🏠 Menú Principal", callback_data="main_menu")])
+    buttons.append([InlineKeyboardButton(text="📚 Menú Narrativa", callback_data="narrative_menu")])
+    buttons.append([InlineKeyboardButton(text="🏠 Menú Principal", callback_data="main_menu")])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -66,33 +66,33 @@ def create_store_keyboard(user, featured_items: List = None, recommendations: Li
     
     if purchase_success is True:
         buttons.extend([
-            [InlineKeyboardButton("📦 Mi Inventario", callback_data="user_inventory")],
-            [InlineKeyboardButton("🛒 Seguir Comprando", callback_data="store_main")]
+            [InlineKeyboardButton(text="📦 Mi Inventario", callback_data="user_inventory")],
+            [InlineKeyboardButton(text="🛒 Seguir Comprando", callback_data="store_main")]
         ])
     elif purchase_success is False:
         buttons.extend([
-            [InlineKeyboardButton("💰 Ganar Besitos", callback_data="earn_besitos")],
-            [InlineKeyboardButton("🔙 Volver a Tienda", callback_data="store_main")]
+            [InlineKeyboardButton(text="💰 Ganar Besitos", callback_data="earn_besitos")],
+            [InlineKeyboardButton(text="🔙 Volver a Tienda", callback_data="store_main")]
         ])
     else:
         # Menú principal de tienda
         buttons.extend([
             [
-                InlineKeyboardButton("🔥 Destacados", callback_data="store_category_premium"),
-                InlineKeyboardButton("🎬 Videos", callback_data="store_category_videos")
+                InlineKeyboardButton(text="🔥 Destacados", callback_data="store_category_premium"),
+                InlineKeyboardButton(text="🎬 Videos", callback_data="store_category_videos")
             ],
             [
-                InlineKeyboardButton("📚 Guías", callback_data="store_category_guides"),
-                InlineKeyboardButton("🌟 Experiencias", callback_data="store_category_experiences")
+                InlineKeyboardButton(text="📚 Guías", callback_data="store_category_guides"),
+                InlineKeyboardButton(text="🌟 Experiencias", callback_data="store_category_experiences")
             ]
         ])
         
         if user.is_vip:
-            buttons.append([InlineKeyboardButton("👑 Solo VIP", callback_data="store_category_vip_exclusive")])
+            buttons.append([InlineKeyboardButton(text="👑 Solo VIP", callback_data="store_category_vip_exclusive")])
         
-        buttons.append([InlineKeyboardButton("📦 Mi Inventario", callback_data="user_inventory")])
+        buttons.append([InlineKeyboardButton(text="📦 Mi Inventario", callback_data="user_inventory")])
     
-    buttons.append([InlineKeyboardButton("🏠 Menú Principal", callback_data="main_menu")])
+    buttons.append([InlineKeyboardButton(text="🏠 Menú Principal", callback_data="main_menu")])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -102,13 +102,13 @@ def create_purchase_keyboard(item, user, can_afford: bool) -> InlineKeyboardMark
     
     if can_afford and item.stock != 0:
         buttons.append([InlineKeyboardButton(
-            f"💳 Comprar por {item.price_besitos} 💰", 
+            text=f"💳 Comprar por {item.price_besitos} 💰", 
             callback_data=f"purchase_{item.id}"
         )])
     
     buttons.extend([
-        [InlineKeyboardButton("🔙 Volver", callback_data="store_main")],
-        [InlineKeyboardButton("💰 ¿Cómo ganar besitos?", callback_data="earn_besitos_info")]
+        [InlineKeyboardButton(text="🔙 Volver", callback_data="store_main")],
+        [InlineKeyboardButton(text="💰 ¿Cómo ganar besitos?", callback_data="earn_besitos_info")]
     ])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -119,13 +119,13 @@ def create_trivia_keyboard(question_data: Dict) -> InlineKeyboardMarkup:
     
     for i, option in enumerate(question_data["options"]):
         buttons.append([InlineKeyboardButton(
-            f"{chr(65+i)}. {option}", 
+            text=f"{chr(65+i)}. {option}", 
             callback_data=f"trivia_answer_{question_data['id']}_{i}"
         )])
     
     buttons.extend([
-        [InlineKeyboardButton("💡 Pista", callback_data=f"trivia_hint_{question_data['id']}")],
-        [InlineKeyboardButton("❌ Salir", callback_data="narrative_menu")]
+        [InlineKeyboardButton(text="💡 Pista", callback_data=f"trivia_hint_{question_data['id']}")],
+        [InlineKeyboardButton(text="❌ Salir", callback_data="narrative_menu")]
     ])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -137,14 +137,109 @@ def create_auction_keyboard(auction, user_bids: List = None) -> InlineKeyboardMa
     if auction.is_active:
         min_bid = auction.current_price + 10
         buttons.extend([
-            [InlineKeyboardButton(f"💰 Pujar {min_bid} besitos", callback_data=f"bid_{auction.id}_{min_bid}")],
-            [InlineKeyboardButton("💎 Puja personalizada", callback_data=f"custom_bid_{auction.id}")]
+            [InlineKeyboardButton(text=f"💰 Pujar {min_bid} besitos", callback_data=f"bid_{auction.id}_{min_bid}")]
         ])
     
     buttons.extend([
-        [InlineKeyboardButton("📊 Ver historial", callback_data=f"auction_history_{auction.id}")],
-        [InlineKeyboardButton("🔙 Volver", callback_data="auction_main")]
+        [InlineKeyboardButton(text="📊 Ver historial", callback_data=f"auction_history_{auction.id}")],
+        [InlineKeyboardButton(text="🔙 Volver", callback_data="auction_main")]
     ])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def create_leaderboard_keyboard(metric: str, period: str, segment: str) -> InlineKeyboardMarkup:
+    """Crear teclado para cambiar de ranking (métrica, periodo y segmento)"""
+    def option(text, new_metric=metric, new_period=period, new_segment=segment):
+        selected = (new_metric, new_period, new_segment) == (metric, period, segment)
+        return InlineKeyboardButton(
+            text=f"• {text} •" if selected else text,
+            callback_data=f"ranking_{new_metric}_{new_period}_{new_segment}"
+        )
+    
+    buttons = [
+        [option("⭐ Experiencia", new_metric="xp"), option("💰 Besitos", new_metric="besitos")],
+        [option("📅 Semanal", new_period="weekly"), option("🗓️ Mensual", new_period="monthly")],
+        [option("🌍 General", new_segment="all"), option("👑 VIP", new_segment="vip")],
+        [InlineKeyboardButton(text="🏠 Menú Principal", callback_data="main_menu")]
+    ]
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def create_transaction_history_keyboard(next_cursor: str = None, prev_cursor: str = None) -> InlineKeyboardMarkup:
+    """Crear teclado de navegación del historial de besitos"""
+    buttons = []
+    
+    navigation = []
+    if prev_cursor:
+        navigation.append(InlineKeyboardButton(text="⬅️ Recientes", callback_data=f"txh_p_{prev_cursor}"))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(text="Anteriores ➡️", callback_data=f"txh_n_{next_cursor}"))
+    if navigation:
+        buttons.append(navigation)
+    
+    buttons.append([InlineKeyboardButton(text="🏠 Menú Principal", callback_data="main_menu")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def create_store_category_keyboard(page) -> InlineKeyboardMarkup:
+    """Crear teclado de una página de categoría de la tienda"""
+    buttons = [
+        [InlineKeyboardButton(text=button_text, callback_data=f"item_{item_id}")]
+        for item_id, _, _, button_text in page.items
+    ]
+    
+    navigation = []
+    if page.has_prev:
+        if page.prev_cursor:
+            callback = f"store_page_{page.category}_{page.page - 1}_{page.prev_cursor}"
+        else:
+            callback = f"store_category_{page.category}"
+        navigation.append(InlineKeyboardButton(text="⬅️ Anterior", callback_data=callback))
+    if page.next_cursor:
+        navigation.append(InlineKeyboardButton(
+            text="Siguiente ➡️",
+            callback_data=f"store_page_{page.category}_{page.page + 1}_{page.next_cursor}"
+        ))
+    if navigation:
+        buttons.append(navigation)
+    
+    buttons.append([InlineKeyboardButton(text="🔙 Volver a Tienda", callback_data="store_main")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def create_inventory_keyboard(items: List = None, next_cursor: str = None, prev_cursor: str = None) -> InlineKeyboardMarkup:
+    """Crear teclado del inventario paginado"""
+    buttons = [
+        [InlineKeyboardButton(text=f"📦 {item.name}", callback_data=f"open_item_{item.item_id}")]
+        for item in items or []
+    ]
+    
+    navigation = []
+    if prev_cursor:
+        navigation.append(InlineKeyboardButton(text="⬅️ Recientes", callback_data=f"inv_p_{prev_cursor}"))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(text="Anteriores ➡️", callback_data=f"inv_n_{next_cursor}"))
+    if navigation:
+        buttons.append(navigation)
+    
+    buttons.append([InlineKeyboardButton(text="🔙 Volver a Tienda", callback_data="store_main")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def create_auction_history_keyboard(auction_id: int) -> InlineKeyboardMarkup:
+    """Crear teclado del historial de pujas de una subasta"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Volver a la subasta", callback_data=f"auction_{auction_id}")]
+    ])
+
+def create_auction_list_keyboard(auctions: List = None) -> InlineKeyboardMarkup:
+    """Crear teclado con las subastas en curso"""
+    buttons = [
+        [InlineKeyboardButton(text=f"🏆 {auction.title} ({auction.current_price}💰)", callback_data=f"auction_{auction.id}")]
+        for auction in auctions or []
+    ]
+    
+    buttons.append([InlineKeyboardButton(text="🏠 Menú Principal", callback_data="main_menu")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
   
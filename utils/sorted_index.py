@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+_MAX_MEMBER = float("inf")
+
+class SortedIndex:
+    """Índice ordenado con estadísticos de orden (posición y top-N).
+
+    Guarda pares (puntuación, miembro) en cubetas ordenadas de tamaño acotado
+    y un árbol de Fenwick con el tamaño de cada cubeta, de modo que insertar,
+    borrar y calcular la posición de un miembro cuestan O(log n) (más el
+    desplazamiento dentro de una cubeta pequeña) y el top-N cuesta O(N).
+
+    La puntuación es cualquier tupla comparable, p. ej. (nivel, experiencia);
+    mayor puntuación = mejor posición. Los miembros deben ser comparables
+    entre sí (ids enteros) para desempatar de forma estable.
+    """
+
+    def __init__(self, load: int = 512):
+        self._load = load
+        self._buckets: List[List[tuple]] = []
+        self._maxes: List[tuple] = []
+        self._tree: List[int] = []
+        self._scores: Dict[Hashable, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, member: Hashable) -> bool:
+        return member in self._scores
+
+    def score(self, member: Hashable) -> Optional[tuple]:
+        """Puntuación actual de un miembro"""
+        return self._scores.get(member)
+
+    def bulk_load(self, items: Iterable[Tuple[Hashable, tuple]]):
+        """Reemplazar el contenido completo (más rápido que insertar uno a uno)"""
+        self._scores = {member: tuple(score) for member, score in items}
+        entries = sorted((score, member) for member, score in self._scores.items())
+        self._buckets = [
+            entries[i:i + self._load] for i in range(0, len(entries), self._load)
+        ]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._rebuild_tree()
+
+    def upsert(self, member: Hashable, score: tuple):
+        """Insertar o actualizar la puntuación de un miembro"""
+        score = tuple(score)
+        previous = self._scores.get(member)
+        if previous == score:
+            return
+        if previous is not None:
+            self._discard((previous, member))
+        self._scores[member] = score
+        self._insert((score, member))
+
+    def remove(self, member: Hashable):
+        """Quitar un miembro del índice"""
+        score = self._scores.pop(member, None)
+        if score is not None:
+            self._discard((score, member))
+
+    def count_above(self, score: tuple) -> int:
+        """Cantidad de miembros con puntuación estrictamente mayor"""
+        return len(self._scores) - self._count_at_most((tuple(score), _MAX_MEMBER))
+
+    def rank(self, member: Hashable) -> Optional[int]:
+        """Posición (1 = primero); los empates comparten posición"""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return self.count_above(score) + 1
+
+    def top(self, n: int) -> List[Tuple[Hashable, tuple]]:
+        """Los n mejores como (miembro, puntuación), de mayor a menor"""
+        result = []
+        for score, member in self._iter_descending():
+            if len(result) >= n:
+                break
+            result.append((member, score))
+        return result
+
+    def _iter_descending(self) -> Iterator[tuple]:
+        for bucket in reversed(self._buckets):
+            yield from reversed(bucket)
+
+    def _insert(self, entry: tuple):
+        if not self._buckets:
+            self._buckets.append([entry])
+            self._maxes.append(entry)
+            self._rebuild_tree()
+            return
+
+        i = bisect_left(self._maxes, entry)
+        if i == len(self._buckets):
+            i -= 1
+        bucket = self._buckets[i]
+        insort(bucket, entry)
+        self._maxes[i] = bucket[-1]
+        self._tree_add(i, 1)
+
+        if len(bucket) > 2 * self._load:
+            half = len(bucket) // 2
+            self._buckets[i:i + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[i:i + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild_tree()
+
+    def _discard(self, entry: tuple):
+        i = bisect_left(self._maxes, entry)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, entry)]
+
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    def _count_at_most(self, key: tuple) -> int:
+        i = bisect_right(self._maxes, key)
+        count = self._tree_prefix(i)
+        if i < len(self._buckets):
+            count += bisect_right(self._buckets[i], key)
+        return count
+
+    def _rebuild_tree(self):
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int):
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, i: int) -> int:
+        """Suma de los tamaños de las primeras i cubetas"""
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total